@@ -0,0 +1,100 @@
+"""
+Checkout latency benchmark: POST /api/orders under concurrency
+
+Sends valid orders to a running backend from a number of concurrent
+clients and reports throughput and latency percentiles (p50/p90/p99).
+Every request creates a real order (tagged utmSource=benchmark), so run it
+against a test database.
+
+Usage (from the backend directory):
+    python benchmarks/bench_checkout.py [--url http://localhost:8001] [--requests 1000] [--concurrency 20]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import List
+
+import httpx
+
+ORDER = {
+    "name": "Maria da Silva",
+    "email": "maria.silva@gmail.com",
+    "phone": "(11) 98765-4321",
+    "cep": "01310-100",
+    "address": "Avenida Paulista",
+    "number": "1000",
+    "complement": "Apto 12",
+    "neighborhood": "Bela Vista",
+    "city": "São Paulo",
+    "state": "SP",
+    "quantity": 1,
+    "productPrice": 197.0,
+    "shippingPrice": 25.0,
+    "totalPrice": 222.0,
+    "utmSource": "benchmark",
+}
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted samples"""
+    index = max(0, min(len(samples) - 1, round(fraction * len(samples)) - 1))
+    return samples[index]
+
+
+async def worker(client: httpx.AsyncClient, queue: asyncio.Queue, latencies: List[float], errors: List[str]):
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        started = time.perf_counter()
+        try:
+            response = await client.post("/api/orders", json=ORDER)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        elapsed = time.perf_counter() - started
+        if response.status_code == 200:
+            latencies.append(elapsed)
+        else:
+            errors.append(f"HTTP {response.status_code}")
+
+
+async def run(url: str, requests: int, concurrency: int, warmup: int):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+        for _ in range(warmup):
+            await client.post("/api/orders", json=ORDER)
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for i in range(requests):
+            queue.put_nowait(i)
+        latencies: List[float] = []
+        errors: List[str] = []
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client, queue, latencies, errors) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    print(f"POST {url}/api/orders: {requests} requests, {concurrency} concurrent")
+    print(f"  {'throughput':<12} {len(latencies) / elapsed:9.1f} req/s")
+    if latencies:
+        latencies.sort()
+        print(f"  {'mean':<12} {statistics.mean(latencies) * 1e3:9.2f} ms")
+        for label, fraction in (("p50", 0.50), ("p90", 0.90), ("p99", 0.99)):
+            print(f"  {label:<12} {percentile(latencies, fraction) * 1e3:9.2f} ms")
+        print(f"  {'max':<12} {latencies[-1] * 1e3:9.2f} ms")
+    if errors:
+        print(f"  {'errors':<12} {len(errors):9d}   (first: {errors[0]})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.environ.get("REACT_APP_BACKEND_URL", "http://localhost:8001").rstrip("/"))
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.requests, args.concurrency, args.warmup))
@@ -0,0 +1,124 @@
+"""
+Serialization microbenchmarks for the settings and order-list endpoints
+
+Compares the stock FastAPI path (jsonable_encoder + json.dumps) with the
+orjson response class and the pre-encoded cache bodies.
+
+Usage (from the backend directory):
+    python benchmarks/bench_serialization.py [--repeat 2000]
+"""
+import argparse
+import json
+import sys
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from models import SettingsBase, OrderResponse, OrderStatus, public_settings
+from utils.cache import DocumentCache
+from utils.serialization import dumps
+
+
+def json_response_render(content) -> bytes:
+    """What FastAPI's default JSONResponse.render does"""
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def stdlib_dumps(content) -> bytes:
+    """Stock FastAPI path for a route without response_model"""
+    return json_response_render(jsonable_encoder(content))
+
+
+def settings_document() -> dict:
+    doc = SettingsBase().model_dump()
+    doc["_id"] = "default"
+    doc["updatedAt"] = datetime.utcnow()
+    return doc
+
+
+def order_documents(count: int = 100) -> List[dict]:
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": ObjectId(),
+            "orderNumber": f"NV-20260101-{i:06d}",
+            "name": "Maria da Silva",
+            "email": "maria.silva@gmail.com",
+            "phone": "(11) 98765-4321",
+            "cep": "01310-100",
+            "address": "Avenida Paulista",
+            "number": str(1000 + i),
+            "complement": "Apto 12",
+            "neighborhood": "Bela Vista",
+            "city": "São Paulo",
+            "state": "SP",
+            "quantity": 1 + i % 3,
+            "productPrice": 197.0,
+            "shippingPrice": 25.0,
+            "totalPrice": 222.0,
+            "status": OrderStatus.PENDING,
+            "utmSource": "facebook",
+            "createdAt": now - timedelta(minutes=i),
+            "updatedAt": now - timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+
+def bench(label: str, fn, repeat: int):
+    seconds = timeit.timeit(fn, number=repeat) / repeat
+    size = len(fn())
+    print(f"  {label:<48} {seconds * 1e6:9.1f} us   {size:7d} bytes")
+    return seconds
+
+
+def run(repeat: int):
+    print(f"GET /api/settings ({repeat} iterations)")
+    doc = settings_document()
+    cache = DocumentCache("settings", views={"public": public_settings})
+    entry = cache.set(doc)
+    bench("jsonable_encoder + json.dumps (full document)", lambda: stdlib_dumps(doc), repeat)
+    bench("orjson (full document)", lambda: dumps(doc), repeat)
+    bench("orjson (public projection)", lambda: dumps(public_settings(doc)), repeat)
+    bench("cache hit, pre-encoded public body", lambda: entry.view("public").body, repeat)
+
+    print(f"\nGET /api/orders, 100 orders ({max(repeat // 20, 10)} iterations)")
+    repeat = max(repeat // 20, 10)
+    orders = order_documents()
+    for order in orders:
+        order["_id"] = str(order["_id"])
+    adapter = TypeAdapter(List[OrderResponse])
+    bench(
+        "validate + json.dumps (stock response_model path)",
+        lambda: json_response_render(adapter.dump_python(adapter.validate_python(orders), mode="json", by_alias=True)),
+        repeat,
+    )
+    bench(
+        "validate + orjson",
+        lambda: dumps(adapter.dump_python(adapter.validate_python(orders), by_alias=True)),
+        repeat,
+    )
+    bench(
+        "validate + pydantic-core dump_json",
+        lambda: adapter.dump_json(adapter.validate_python(orders), by_alias=True),
+        repeat,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000)
+    run(parser.parse_args().repeat)
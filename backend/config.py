@@ -0,0 +1,172 @@
+"""
+Application configuration
+Read from the environment (and backend/.env) once and validated; request
+handlers use the loaded AppConfig and never touch os.environ or files.
+reload_config() picks up changed values without a restart.
+"""
+import logging
+import os
+from pathlib import Path
+from typing import FrozenSet, Literal, Mapping, Optional, Tuple
+
+from dotenv import dotenv_values, load_dotenv
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+ENV_FILE = ROOT_DIR / ".env"
+# REACT_APP_BACKEND_URL there is the public API URL when EXTERNAL_URL is unset
+FRONTEND_ENV_FILE = ROOT_DIR.parent / "frontend" / ".env"
+
+DEFAULT_EXTERNAL_URL = "http://localhost:8001"
+
+
+def _split(value) -> list:
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(",") if item.strip()]
+    return list(value)
+
+
+class AppConfig(BaseModel):
+    """
+    Settings of one backend process; fields are filled from the environment
+    variable named by their alias.
+
+    Connection, CORS, cache size and worker settings are applied at startup
+    only; the rest takes effect on reload.
+    """
+    # Errors must not echo the environment, which holds secrets
+    model_config = ConfigDict(frozen=True, populate_by_name=True, hide_input_in_errors=True)
+
+    mongo_url: str = Field(alias="MONGO_URL", min_length=1)
+    db_name: str = Field(alias="DB_NAME", min_length=1)
+    external_url: str = Field(DEFAULT_EXTERNAL_URL, alias="EXTERNAL_URL")
+    cors_origins: Tuple[str, ...] = Field(("*",), alias="CORS_ORIGINS")
+
+    orionpay_api_key: str = Field("", alias="ORIONPAY_API_KEY")
+    orionpay_webhook_secret: str = Field("", alias="ORIONPAY_WEBHOOK_SECRET")
+
+    tenant_cache_size: int = Field(64, alias="TENANT_CACHE_SIZE", ge=1)
+    cache_sync_interval: float = Field(2.0, alias="CACHE_SYNC_INTERVAL", gt=0)
+    snapshot_dir: Optional[Path] = Field(None, alias="SNAPSHOT_DIR")
+    storefront_template: str = Field("", alias="STOREFRONT_TEMPLATE")
+    # Internal nginx location aliased to the upload directory (e.g. /_uploads/);
+    # when set, nginx sends the image files instead of Python
+    uploads_accel_redirect: str = Field("", alias="UPLOADS_ACCEL_REDIRECT")
+
+    # Where uploads are kept: the local upload directory, or an S3-compatible
+    # bucket shared by all instances (clients download from it directly)
+    storage_backend: Literal["local", "s3"] = Field("local", alias="STORAGE_BACKEND")
+    s3_bucket: str = Field("", alias="S3_BUCKET")
+    s3_prefix: str = Field("", alias="S3_PREFIX")
+    s3_endpoint_url: str = Field("", alias="S3_ENDPOINT_URL")
+    s3_region: str = Field("", alias="S3_REGION")
+    s3_access_key_id: str = Field("", alias="S3_ACCESS_KEY_ID")
+    s3_secret_access_key: str = Field("", alias="S3_SECRET_ACCESS_KEY")
+    s3_public_url: str = Field("", alias="S3_PUBLIC_URL")
+    s3_url_expires: int = Field(3600, alias="S3_URL_EXPIRES", ge=60, le=7 * 24 * 3600)
+
+    image_workers: int = Field(0, alias="IMAGE_WORKERS", ge=0)
+    image_variant_widths: Tuple[int, ...] = Field((320, 640, 1024, 1600), alias="IMAGE_VARIANT_WIDTHS")
+    image_variant_formats: Tuple[str, ...] = Field(("avif", "webp"), alias="IMAGE_VARIANT_FORMATS")
+    image_transform_sizes: FrozenSet[int] = Field(
+        frozenset({64, 128, 256, 320, 480, 640, 768, 1024, 1280, 1600, 1920}), alias="IMAGE_TRANSFORM_SIZES"
+    )
+    image_transform_qualities: FrozenSet[int] = Field(
+        frozenset({50, 60, 70, 80, 90}), alias="IMAGE_TRANSFORM_QUALITIES"
+    )
+    image_cache_max_bytes: int = Field(512 * 1024 * 1024, alias="IMAGE_CACHE_MAX_BYTES", ge=0)
+    # Strip metadata and recompress uploads (lossless / visually lossless)
+    image_optimize: bool = Field(True, alias="IMAGE_OPTIMIZE")
+    # Remote product images are copied into upload storage and revalidated
+    # this often (seconds); 0 leaves them on their original host
+    image_mirror_interval: float = Field(3600.0, alias="IMAGE_MIRROR_INTERVAL", ge=0)
+    # Let image URLs point at private/loopback hosts (local test setups only)
+    remote_fetch_allow_private: bool = Field(False, alias="REMOTE_FETCH_ALLOW_PRIVATE")
+    # Files of one batch upload (POST /api/uploads/images) processed at a time
+    upload_batch_concurrency: int = Field(4, alias="UPLOAD_BATCH_CONCURRENCY", ge=1)
+
+    @field_validator(
+        "cors_origins", "image_variant_widths", "image_variant_formats",
+        "image_transform_sizes", "image_transform_qualities", mode="before"
+    )
+    @classmethod
+    def split_lists(cls, value):
+        """Comma-separated environment values become sequences"""
+        return _split(value)
+
+    @field_validator("image_variant_widths")
+    @classmethod
+    def sort_widths(cls, value):
+        if any(width <= 0 for width in value):
+            raise ValueError("widths must be positive")
+        return tuple(sorted(set(value)))
+
+    @field_validator("image_variant_formats")
+    @classmethod
+    def lower_formats(cls, value):
+        return tuple(fmt.lower() for fmt in value)
+
+    @field_validator("external_url")
+    @classmethod
+    def strip_slash(cls, value):
+        return value.rstrip("/") or DEFAULT_EXTERNAL_URL
+
+    @field_validator("snapshot_dir", mode="before")
+    @classmethod
+    def empty_is_none(cls, value):
+        return value or None
+
+    @model_validator(mode="after")
+    def check_storage(self):
+        if self.storage_backend == "s3" and not self.s3_bucket:
+            raise ValueError("S3_BUCKET is required when STORAGE_BACKEND=s3")
+        return self
+
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None) -> "AppConfig":
+        """
+        Build the configuration from environment variables.
+
+        Args:
+            environ: Variables to read (os.environ by default)
+
+        Returns:
+            Validated AppConfig; raises pydantic.ValidationError listing
+            every missing or malformed variable
+        """
+        environ = os.environ if environ is None else environ
+        names = {field.alias for field in cls.model_fields.values()}
+        # Unset and empty variables both mean "use the default"
+        values = {name: environ[name] for name in names if environ.get(name, "") != ""}
+        if "EXTERNAL_URL" not in values and FRONTEND_ENV_FILE.exists():
+            frontend_url = dotenv_values(FRONTEND_ENV_FILE).get("REACT_APP_BACKEND_URL")
+            if frontend_url:
+                values["EXTERNAL_URL"] = frontend_url
+        return cls.model_validate(values)
+
+
+_config: Optional[AppConfig] = None
+
+
+def get_config() -> AppConfig:
+    """The loaded configuration (loaded on first use); also a FastAPI dependency"""
+    global _config
+    if _config is None:
+        load_dotenv(ENV_FILE)
+        _config = AppConfig.from_env()
+    return _config
+
+
+def reload_config() -> AppConfig:
+    """
+    Re-read backend/.env (its values override the current environment) and
+    the environment. If the new values are invalid the current
+    configuration stays in place and the error is raised.
+    """
+    global _config
+    load_dotenv(ENV_FILE, override=True)
+    _config = AppConfig.from_env()
+    logger.info("Configuration reloaded")
+    return _config
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 from enum import Enum
 
@@ -150,6 +150,24 @@ class SettingsBase(BaseModel):
     paymentTestMode: bool = True  # Enable test mode for payments
     pixExpirationMinutes: int = 30  # PIX expiration time in minutes
 
+# Fields rendered by the storefront. Everything else (payment gateway
+# credentials and options) is only served through the admin route.
+PUBLIC_SETTINGS_FIELDS = (
+    "siteName", "tagline", "description", "logoUrl", "faviconUrl",
+    "primaryColor", "primaryColorLight", "primaryColorDark", "secondaryColor", "accentColor",
+    "phone", "email", "instagram", "whatsapp",
+    "productName", "productSubtitle", "productDescription", "originalPrice",
+    "productOptions", "hero", "benefits", "testimonials", "faq",
+    "aboutMission", "aboutVision", "aboutHistory", "aboutValues",
+    "metaPixelId", "googleAnalyticsId",
+    "ogTitle", "ogDescription", "ogImage",
+    "metaTitle", "metaDescription", "metaKeywords",
+)
+
+def public_settings(settings: dict) -> dict:
+    """Project a settings document onto the storefront fields"""
+    return {key: settings[key] for key in PUBLIC_SETTINGS_FIELDS if key in settings}
+
 class SettingsUpdate(BaseModel):
     siteName: Optional[str] = None
     tagline: Optional[str] = None
@@ -221,9 +239,18 @@ class ProductImagesUpdate(BaseModel):
     logo: Optional[str] = None
     favicon: Optional[str] = None
 
+class ImagePlaceholder(BaseModel):
+    url: str  # image the placeholder was made from
+    src: Optional[str] = None  # tiny data: URI
+    width: Optional[int] = None
+    height: Optional[int] = None
+    failedAt: Optional[datetime] = None  # set when the image could not be read
+
 class ProductImagesResponse(ProductImagesBase):
     id: str = Field(alias="_id")
     updatedAt: datetime
+    placeholders: Dict[str, ImagePlaceholder] = {}
+    sources: Dict[str, str] = {}  # remote URL of images served from a local copy
 
     class Config:
         populate_by_name = True
@@ -277,5 +304,21 @@ class OrderResponse(BaseModel):
     class Config:
         populate_by_name = True
 
+class OrderPage(BaseModel):
+    """One page of the order listing"""
+    orders: List[OrderResponse]
+    count: int
+    # Pass back as ?cursor= for the next page; None on the last page
+    nextCursor: Optional[str] = None
+    # Orders matching the filters (?include_total=true), counted up to a cap
+    total: Optional[int] = None
+    totalCapped: Optional[bool] = None
+
+class OrderSummary(BaseModel):
+    total: int
+    byStatus: Dict[OrderStatus, int]
+    # Sum of totalPrice over paid orders
+    paidTotal: float
+
 class OrderStatusUpdate(BaseModel):
     status: OrderStatus
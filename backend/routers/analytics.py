@@ -1,18 +1,17 @@
-from fastapi import APIRouter, Request, HTTPException
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import APIRouter, Request, HTTPException, Depends
 from datetime import datetime, timezone, timedelta
 from pydantic import BaseModel
 from typing import Optional, List
-import os
 import hashlib
 import json
 
+from utils.database import get_database
+from utils.tenancy import get_tenant
+
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
 
 def get_db():
-    mongo_url = os.environ.get('MONGO_URL')
-    client = AsyncIOMotorClient(mongo_url)
-    return client[os.environ.get('DB_NAME')]
+    return get_database()
 
 # Models
 class PageViewEvent(BaseModel):
@@ -110,7 +109,7 @@ def get_date_range(period: str, start_date: str = None, end_date: str = None):
         return today_start - timedelta(days=7), now
 
 @router.post("/track/pageview")
-async def track_pageview(event: PageViewEvent, request: Request):
+async def track_pageview(event: PageViewEvent, request: Request, tenant: str = Depends(get_tenant)):
     """Track a page view"""
     db = get_db()
     
@@ -122,6 +121,7 @@ async def track_pageview(event: PageViewEvent, request: Request):
     ip = request.client.host if request.client else "unknown"
     
     pageview = {
+        "tenantId": tenant,
         "visitor_id": visitor_id,
         "page": event.page,
         "referrer": event.referrer,
@@ -143,6 +143,7 @@ async def track_pageview(event: PageViewEvent, request: Request):
     # Update/create session
     session_timeout = datetime.now(timezone.utc) - timedelta(minutes=30)
     existing_session = await db.sessions.find_one({
+        "tenantId": tenant,
         "visitor_id": visitor_id,
         "last_activity": {"$gte": session_timeout}
     })
@@ -158,6 +159,7 @@ async def track_pageview(event: PageViewEvent, request: Request):
         )
     else:
         new_session = {
+            "tenantId": tenant,
             "visitor_id": visitor_id,
             "started_at": datetime.now(timezone.utc),
             "last_activity": datetime.now(timezone.utc),
@@ -174,13 +176,14 @@ async def track_pageview(event: PageViewEvent, request: Request):
     return {"status": "tracked"}
 
 @router.post("/track/action")
-async def track_action(event: ActionEvent, request: Request):
+async def track_action(event: ActionEvent, request: Request, tenant: str = Depends(get_tenant)):
     """Track a user action (click, checkout, etc.)"""
     db = get_db()
     
     visitor_id = get_visitor_id(request)
     
     action = {
+        "tenantId": tenant,
         "visitor_id": visitor_id,
         "action": event.action,
         "page": event.page,
@@ -193,7 +196,7 @@ async def track_action(event: ActionEvent, request: Request):
     return {"status": "tracked"}
 
 @router.get("/stats/overview")
-async def get_overview_stats(period: str = "7d", start_date: str = None, end_date: str = None):
+async def get_overview_stats(period: str = "7d", start_date: str = None, end_date: str = None, tenant: str = Depends(get_tenant)):
     """Get overview statistics"""
     db = get_db()
     
@@ -201,28 +204,32 @@ async def get_overview_stats(period: str = "7d", start_date: str = None, end_dat
     
     # Total pageviews
     total_pageviews = await db.pageviews.count_documents({
+        "tenantId": tenant,
         "timestamp": {"$gte": start, "$lte": end}
     })
     
     # Unique visitors
     unique_visitors = len(await db.pageviews.distinct("visitor_id", {
+        "tenantId": tenant,
         "timestamp": {"$gte": start, "$lte": end}
     }))
     
     # Sessions
     total_sessions = await db.sessions.count_documents({
+        "tenantId": tenant,
         "started_at": {"$gte": start, "$lte": end}
     })
     
     # Online now (active in last 5 minutes)
     five_minutes_ago = datetime.now(timezone.utc) - timedelta(minutes=5)
     online_now = await db.sessions.count_documents({
+        "tenantId": tenant,
         "last_activity": {"$gte": five_minutes_ago}
     })
     
     # Actions count
     actions_pipeline = [
-        {"$match": {"timestamp": {"$gte": start, "$lte": end}}},
+        {"$match": {"tenantId": tenant, "timestamp": {"$gte": start, "$lte": end}}},
         {"$group": {"_id": "$action", "count": {"$sum": 1}}}
     ]
     actions_result = await db.actions.aggregate(actions_pipeline).to_list(100)
@@ -241,14 +248,14 @@ async def get_overview_stats(period: str = "7d", start_date: str = None, end_dat
     }
 
 @router.get("/stats/pageviews")
-async def get_pageview_stats(period: str = "7d", start_date: str = None, end_date: str = None):
+async def get_pageview_stats(period: str = "7d", start_date: str = None, end_date: str = None, tenant: str = Depends(get_tenant)):
     """Get pageview statistics by page"""
     db = get_db()
     
     start, end = get_date_range(period, start_date, end_date)
     
     pipeline = [
-        {"$match": {"timestamp": {"$gte": start, "$lte": end}}},
+        {"$match": {"tenantId": tenant, "timestamp": {"$gte": start, "$lte": end}}},
         {"$group": {
             "_id": "$page",
             "views": {"$sum": 1},
@@ -266,7 +273,7 @@ async def get_pageview_stats(period: str = "7d", start_date: str = None, end_dat
     return {"pages": result}
 
 @router.get("/stats/timeline")
-async def get_timeline_stats(period: str = "7d", start_date: str = None, end_date: str = None, granularity: str = "day"):
+async def get_timeline_stats(period: str = "7d", start_date: str = None, end_date: str = None, granularity: str = "day", tenant: str = Depends(get_tenant)):
     """Get pageviews over time"""
     db = get_db()
     
@@ -290,7 +297,7 @@ async def get_timeline_stats(period: str = "7d", start_date: str = None, end_dat
         }
     
     pipeline = [
-        {"$match": {"timestamp": {"$gte": start, "$lte": end}}},
+        {"$match": {"tenantId": tenant, "timestamp": {"$gte": start, "$lte": end}}},
         {"$group": {
             "_id": group_id,
             "pageviews": {"$sum": 1},
@@ -321,7 +328,7 @@ async def get_timeline_stats(period: str = "7d", start_date: str = None, end_dat
     return {"timeline": result}
 
 @router.get("/stats/devices")
-async def get_device_stats(period: str = "7d", start_date: str = None, end_date: str = None):
+async def get_device_stats(period: str = "7d", start_date: str = None, end_date: str = None, tenant: str = Depends(get_tenant)):
     """Get device statistics"""
     db = get_db()
     
@@ -329,21 +336,21 @@ async def get_device_stats(period: str = "7d", start_date: str = None, end_date:
     
     # Device types
     device_pipeline = [
-        {"$match": {"timestamp": {"$gte": start, "$lte": end}}},
+        {"$match": {"tenantId": tenant, "timestamp": {"$gte": start, "$lte": end}}},
         {"$group": {"_id": "$device_type", "count": {"$sum": 1}}},
         {"$sort": {"count": -1}}
     ]
     
     # Browsers
     browser_pipeline = [
-        {"$match": {"timestamp": {"$gte": start, "$lte": end}}},
+        {"$match": {"tenantId": tenant, "timestamp": {"$gte": start, "$lte": end}}},
         {"$group": {"_id": "$browser", "count": {"$sum": 1}}},
         {"$sort": {"count": -1}}
     ]
     
     # OS
     os_pipeline = [
-        {"$match": {"timestamp": {"$gte": start, "$lte": end}}},
+        {"$match": {"tenantId": tenant, "timestamp": {"$gte": start, "$lte": end}}},
         {"$group": {"_id": "$os", "count": {"$sum": 1}}},
         {"$sort": {"count": -1}}
     ]
@@ -359,7 +366,7 @@ async def get_device_stats(period: str = "7d", start_date: str = None, end_date:
     }
 
 @router.get("/stats/traffic-sources")
-async def get_traffic_sources(period: str = "7d", start_date: str = None, end_date: str = None):
+async def get_traffic_sources(period: str = "7d", start_date: str = None, end_date: str = None, tenant: str = Depends(get_tenant)):
     """Get traffic source statistics"""
     db = get_db()
     
@@ -367,7 +374,7 @@ async def get_traffic_sources(period: str = "7d", start_date: str = None, end_da
     
     # UTM Sources
     source_pipeline = [
-        {"$match": {"timestamp": {"$gte": start, "$lte": end}, "utm_source": {"$ne": None}}},
+        {"$match": {"tenantId": tenant, "timestamp": {"$gte": start, "$lte": end}, "utm_source": {"$ne": None}}},
         {"$group": {"_id": "$utm_source", "count": {"$sum": 1}}},
         {"$sort": {"count": -1}},
         {"$limit": 10}
@@ -375,7 +382,7 @@ async def get_traffic_sources(period: str = "7d", start_date: str = None, end_da
     
     # UTM Campaigns
     campaign_pipeline = [
-        {"$match": {"timestamp": {"$gte": start, "$lte": end}, "utm_campaign": {"$ne": None}}},
+        {"$match": {"tenantId": tenant, "timestamp": {"$gte": start, "$lte": end}, "utm_campaign": {"$ne": None}}},
         {"$group": {"_id": "$utm_campaign", "count": {"$sum": 1}}},
         {"$sort": {"count": -1}},
         {"$limit": 10}
@@ -383,7 +390,7 @@ async def get_traffic_sources(period: str = "7d", start_date: str = None, end_da
     
     # Referrers
     referrer_pipeline = [
-        {"$match": {"timestamp": {"$gte": start, "$lte": end}, "referrer": {"$nin": [None, ""]}}},
+        {"$match": {"tenantId": tenant, "timestamp": {"$gte": start, "$lte": end}, "referrer": {"$nin": [None, ""]}}},
         {"$group": {"_id": "$referrer", "count": {"$sum": 1}}},
         {"$sort": {"count": -1}},
         {"$limit": 10}
@@ -400,7 +407,7 @@ async def get_traffic_sources(period: str = "7d", start_date: str = None, end_da
     }
 
 @router.get("/stats/realtime")
-async def get_realtime_stats():
+async def get_realtime_stats(tenant: str = Depends(get_tenant)):
     """Get real-time statistics"""
     db = get_db()
     
@@ -411,19 +418,19 @@ async def get_realtime_stats():
     
     # Online now (last 5 minutes)
     online_sessions = await db.sessions.find(
-        {"last_activity": {"$gte": five_minutes_ago}},
+        {"tenantId": tenant, "last_activity": {"$gte": five_minutes_ago}},
         {"_id": 0, "visitor_id": 1, "pages": 1, "device_type": 1, "last_activity": 1}
     ).to_list(100)
     
     # Recent pageviews (last 15 minutes)
     recent_pageviews = await db.pageviews.find(
-        {"timestamp": {"$gte": fifteen_minutes_ago}},
+        {"tenantId": tenant, "timestamp": {"$gte": fifteen_minutes_ago}},
         {"_id": 0, "page": 1, "timestamp": 1, "device_type": 1}
     ).sort("timestamp", -1).to_list(50)
     
     # Pageviews per minute (last hour)
     minute_pipeline = [
-        {"$match": {"timestamp": {"$gte": one_hour_ago}}},
+        {"$match": {"tenantId": tenant, "timestamp": {"$gte": one_hour_ago}}},
         {"$group": {
             "_id": {
                 "hour": {"$hour": "$timestamp"},
@@ -456,14 +463,14 @@ async def get_realtime_stats():
     }
 
 @router.get("/stats/actions")
-async def get_action_stats(period: str = "7d", start_date: str = None, end_date: str = None):
+async def get_action_stats(period: str = "7d", start_date: str = None, end_date: str = None, tenant: str = Depends(get_tenant)):
     """Get action statistics"""
     db = get_db()
     
     start, end = get_date_range(period, start_date, end_date)
     
     pipeline = [
-        {"$match": {"timestamp": {"$gte": start, "$lte": end}}},
+        {"$match": {"tenantId": tenant, "timestamp": {"$gte": start, "$lte": end}}},
         {"$group": {
             "_id": "$action",
             "count": {"$sum": 1},
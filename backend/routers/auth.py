@@ -1,6 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timezone, timedelta
 from passlib.context import CryptContext
 from jose import JWTError, jwt
@@ -9,6 +8,8 @@ from typing import Optional
 import os
 import secrets
 
+from utils.database import get_database
+
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 # Security configuration
@@ -41,9 +42,7 @@ class TokenResponse(BaseModel):
     user: UserResponse
 
 def get_db():
-    mongo_url = os.environ.get('MONGO_URL')
-    client = AsyncIOMotorClient(mongo_url)
-    return client[os.environ.get('DB_NAME')]
+    return get_database()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -1,71 +1,249 @@
-from fastapi import APIRouter, HTTPException
-from motor.motor_asyncio import AsyncIOMotorClient
-from datetime import datetime
-import os
+from fastapi import APIRouter, HTTPException, Request, Depends
+from pymongo import ReturnDocument
+from datetime import datetime, timedelta
+from typing import Optional
+import asyncio
+import logging
 
+from config import get_config
 from models import ProductImagesBase, ProductImagesUpdate, ProductImagesResponse
+from routers.auth import get_current_user
+from routers.uploads import MAX_FILE_SIZE, UPLOAD_DIR, release_upload, storage, store_received
+from utils.cache import images_cache, encode_json
+from utils.cache_sync import cache_sync
+from utils.content_store import UPLOADS_COLLECTION, save_metadata, upload_from_url
+from utils.database import get_database
+from utils.http_cache import conditional_json
+from utils.image_placeholder import placeholder_for_file, placeholder_for_url
+from utils.remote_mirror import RemoteMirror, is_remote_url
+from utils.snapshots import snapshot_publisher
+from utils.tenancy import DEFAULT_TENANT, get_tenant
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/images", tags=["images"])
 
+# Images that get a placeholder ({url, src, width, height} under
+# placeholders.<field>; url tells whether it still matches the image)
+PLACEHOLDER_FIELDS = ("main", "secondary", "tertiary")
+# Images that could not be downloaded or read are tried again after this long
+PLACEHOLDER_RETRY = timedelta(hours=1)
+
+# (tenant, field, url) being computed, and the tasks doing it
+_pending_placeholders = set()
+_placeholder_tasks = set()
+
+# Images copied from remote hosts into upload storage; the document then
+# holds the local URL and sources.<field> the remote one
+MIRROR_FIELDS = ("main", "secondary", "tertiary", "logo")
+
 def get_db():
-    mongo_url = os.environ.get('MONGO_URL')
-    client = AsyncIOMotorClient(mongo_url)
-    return client[os.environ.get('DB_NAME')]
+    return get_database()
 
-@router.get("", response_model=ProductImagesResponse)
-async def get_images():
-    """Get product images"""
+async def store_mirrored(upload) -> str:
+    record, _ = await store_received(upload)
+    return record["_id"]
+
+remote_mirror = RemoteMirror(UPLOAD_DIR, MAX_FILE_SIZE, store_mirrored, release_upload)
+
+async def publish_images(tenant: str, images: dict):
+    """Cache a saved images document, announce it and refresh what derives from it"""
+    cache = images_cache.for_tenant(tenant)
+    entry = cache.set(images)
+    await cache_sync.publish(cache)
+    await snapshot_publisher.publish(tenant)
+    ensure_placeholders(tenant, images)
+    if any(is_remote_url(images.get(field) or "") for field in MIRROR_FIELDS):
+        remote_mirror.wake()
+    return entry
+
+async def mirror_product_images():
+    """Copy remote product images locally and point the documents at the copies"""
+    db = get_db()
+    config = get_config()
+    max_age = timedelta(seconds=config.image_mirror_interval)
+    
+    # remote URL -> [(tenant, field, current value)]
+    targets = {}
+    async for images in db.product_images.find({}, {**{field: 1 for field in MIRROR_FIELDS}, "sources": 1}):
+        sources = images.get("sources") or {}
+        for field in MIRROR_FIELDS:
+            value = images.get(field) or ""
+            if is_remote_url(value):
+                url = value
+            elif sources.get(field):
+                url = sources[field]  # mirrored before: revalidate
+            else:
+                continue
+            targets.setdefault(url, []).append((images["_id"], field, value))
+    
+    changed = set()
+    for url, uses in targets.items():
+        filename = await remote_mirror.refresh(db, url, max_age)
+        if not filename:
+            continue
+        local_url = f"{config.external_url}/api/uploads/images/{filename}"
+        for tenant, field, value in uses:
+            if value == local_url:
+                continue
+            # Skipped if the image was changed meanwhile
+            result = await db.product_images.update_one(
+                {"_id": tenant, field: value},
+                {"$set": {field: local_url, f"sources.{field}": url}}
+            )
+            if result.modified_count:
+                changed.add(tenant)
+    
+    await remote_mirror.prune(db, targets)
+    for tenant in changed:
+        await publish_images(tenant, await db.product_images.find_one({"_id": tenant}))
+
+async def resolve_placeholder(url: str) -> Optional[dict]:
+    """Placeholder of an image URL; our own uploads are read from their record"""
+    db = get_db()
+    filename = upload_from_url(url) or await remote_mirror.lookup(db, url)
+    if filename:
+        record = await db[UPLOADS_COLLECTION].find_one({"_id": filename}, {"placeholder": 1, "width": 1, "height": 1})
+        if record and record.get("placeholder"):
+            return {"src": record["placeholder"], "width": record.get("width"), "height": record.get("height")}
+        # Uploaded before placeholders existed
+        path = UPLOAD_DIR / filename
+        if record and await storage.fetch(filename, path):
+            placeholder = await placeholder_for_file(path)
+            if placeholder:
+                await save_metadata(db, filename, {"placeholder": placeholder["src"]})
+            return placeholder
+    return await placeholder_for_url(url)
+
+async def refresh_placeholders(tenant: str, images: dict, fields: list):
+    """Compute placeholders for fields and publish the updated document"""
+    db = get_db()
+    changed = False
+    try:
+        placeholders = await asyncio.gather(*(
+            resolve_placeholder(images[field]) if images[field] else asyncio.sleep(0) for field in fields
+        ))
+        for field, placeholder in zip(fields, placeholders):
+            url = images[field]
+            if url and placeholder is None:
+                placeholder = {"failedAt": datetime.utcnow()}
+            # Skipped if the image was changed meanwhile (that change has its own refresh)
+            result = await db.product_images.update_one(
+                {"_id": tenant, field: url},
+                {"$set": {f"placeholders.{field}": {"url": url, **(placeholder or {})}}}
+            )
+            changed = changed or result.modified_count > 0
+        
+        if changed:
+            await publish_images(tenant, await db.product_images.find_one({"_id": tenant}))
+    except Exception as e:
+        logger.warning(f"Placeholder refresh failed for tenant {tenant}: {e}")
+    finally:
+        for field in fields:
+            _pending_placeholders.discard((tenant, field, images[field]))
+
+def ensure_placeholders(tenant: str, images: dict):
+    """Start computing missing or outdated placeholders in the background"""
+    placeholders = images.get("placeholders") or {}
+    retry_before = datetime.utcnow() - PLACEHOLDER_RETRY
+    
+    mirroring = get_config().image_mirror_interval > 0
+    
+    def outdated(field):
+        placeholder = placeholders.get(field) or {}
+        if mirroring and is_remote_url(images.get(field) or ""):
+            return False  # made from the local copy once mirrored
+        if placeholder.get("url") != images.get(field, ""):
+            return True
+        return placeholder.get("failedAt") is not None and placeholder["failedAt"] < retry_before
+    
+    fields = [
+        field for field in PLACEHOLDER_FIELDS
+        if outdated(field) and (tenant, field, images.get(field, "")) not in _pending_placeholders
+    ]
+    if not fields:
+        return
+    
+    images = {field: images.get(field, "") for field in fields}
+    _pending_placeholders.update((tenant, field, images[field]) for field in fields)
+    task = asyncio.create_task(refresh_placeholders(tenant, images, fields))
+    _placeholder_tasks.add(task)
+    task.add_done_callback(_placeholder_tasks.discard)
+
+async def load_images(tenant: str = DEFAULT_TENANT):
+    """Load a tenant's product images from the database, creating defaults if missing"""
     db = get_db()
-    images = await db.product_images.find_one()
     
-    if not images:
-        # Create default images if not exists
-        default_images = ProductImagesBase().model_dump()
-        default_images["updatedAt"] = datetime.utcnow()
-        result = await db.product_images.insert_one(default_images)
-        default_images["_id"] = str(result.inserted_id)
-        return default_images
+    default_images = ProductImagesBase().model_dump()
+    default_images["updatedAt"] = datetime.utcnow()
     
-    images["_id"] = str(images["_id"])
+    images = await db.product_images.find_one_and_update(
+        {"_id": tenant},
+        {"$setOnInsert": default_images},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    ensure_placeholders(tenant, images)
     return images
 
+snapshot_publisher.add_source(load_images, lambda images: {"images": encode_json(images)})
+
+@router.get("", response_model=ProductImagesResponse)
+async def get_images(request: Request, tenant: str = Depends(get_tenant)):
+    """Get product images"""
+    entry = await images_cache.for_tenant(tenant).get_or_load(lambda: load_images(tenant))
+    return conditional_json(request, entry.body, entry.etag)
+
 @router.put("", response_model=ProductImagesResponse)
-async def update_images(images_update: ProductImagesUpdate):
+async def update_images(
+    images_update: ProductImagesUpdate,
+    tenant: str = Depends(get_tenant),
+    current_user: dict = Depends(get_current_user)
+):
     """Update product images"""
     db = get_db()
     
-    # Get current images or create default
-    current = await db.product_images.find_one()
-    
-    if not current:
-        default_images = ProductImagesBase().model_dump()
-        default_images["updatedAt"] = datetime.utcnow()
-        result = await db.product_images.insert_one(default_images)
-        current = await db.product_images.find_one({"_id": result.inserted_id})
-    
     # Update only provided fields
     update_data = {k: v for k, v in images_update.model_dump().items() if v is not None}
     update_data["updatedAt"] = datetime.utcnow()
     
-    await db.product_images.update_one(
-        {"_id": current["_id"]},
-        {"$set": update_data}
+    # One pipeline update, so unchanged fields can be compared in place:
+    # defaults fill fields the document does not have yet, and a changed
+    # image is no longer a mirror of its remote source
+    changes = {field: {"$literal": value} for field, value in update_data.items()}
+    for field, value in ProductImagesBase().model_dump().items():
+        if field not in update_data:
+            changes[field] = {"$ifNull": [f"${field}", {"$literal": value}]}
+    for field in MIRROR_FIELDS:
+        if field in update_data:
+            changes[f"sources.{field}"] = {
+                "$cond": [{"$eq": [f"${field}", {"$literal": update_data[field]}]}, f"$sources.{field}", "$$REMOVE"]
+            }
+    
+    updated = await db.product_images.find_one_and_update(
+        {"_id": tenant},
+        [{"$set": changes}],
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
     
-    updated = await db.product_images.find_one({"_id": current["_id"]})
-    updated["_id"] = str(updated["_id"])
-    return updated
+    entry = await publish_images(tenant, updated)
+    return entry.doc
 
 @router.post("/reset")
-async def reset_images():
+async def reset_images(tenant: str = Depends(get_tenant), current_user: dict = Depends(get_current_user)):
     """Reset images to default"""
     db = get_db()
     
-    await db.product_images.delete_many({})
-    
     default_images = ProductImagesBase().model_dump()
     default_images["updatedAt"] = datetime.utcnow()
-    result = await db.product_images.insert_one(default_images)
-    default_images["_id"] = str(result.inserted_id)
     
-    return default_images
+    updated = await db.product_images.find_one_and_replace(
+        {"_id": tenant},
+        default_images,
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    
+    entry = await publish_images(tenant, updated)
+    return entry.doc
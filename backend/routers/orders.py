@@ -1,30 +1,37 @@
-from fastapi import APIRouter, HTTPException
-from motor.motor_asyncio import AsyncIOMotorClient
-from datetime import datetime
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Response, Depends
+from datetime import datetime, timezone
+from typing import Optional
 from bson import ObjectId
-import os
+from pydantic import TypeAdapter
 import random
 import string
 
-from models import OrderCreate, OrderResponse, OrderStatus, OrderStatusUpdate
+from models import OrderCreate, OrderPage, OrderResponse, OrderStatus, OrderStatusUpdate, OrderSummary
+from routers.auth import get_current_user
+from utils.database import get_database
+from utils.pagination import fetch_page, sort_direction
+from utils.tenancy import get_tenant
 from utils.validators import validate_brazilian_phone, validate_email, validate_name
 
 router = APIRouter(prefix="/api/orders", tags=["orders"])
 
+# Validates and serializes order pages straight to JSON bytes in pydantic-core
+order_page_adapter = TypeAdapter(OrderPage)
+
+# ?include_total=true counts matching orders up to this many
+ORDER_TOTAL_LIMIT = 10000
+
 def get_db():
-    mongo_url = os.environ.get('MONGO_URL')
-    client = AsyncIOMotorClient(mongo_url)
-    return client[os.environ.get('DB_NAME')]
+    return get_database()
 
-def generate_order_number():
+def generate_order_number(now: Optional[datetime] = None):
     """Generate unique order number"""
-    timestamp = datetime.utcnow().strftime("%Y%m%d")
+    timestamp = (now or datetime.utcnow()).strftime("%Y%m%d")
     random_part = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
     return f"NV-{timestamp}-{random_part}"
 
 @router.post("", response_model=OrderResponse)
-async def create_order(order: OrderCreate):
+async def create_order(order: OrderCreate, tenant: str = Depends(get_tenant)):
     """Create a new order with validation"""
     db = get_db()
     
@@ -43,41 +50,106 @@ async def create_order(order: OrderCreate):
     if not is_valid:
         raise HTTPException(status_code=400, detail=f"Email inválido: {error_msg}")
     
+    # Truncated to what BSON dates store, so the response matches later reads
+    now = datetime.utcnow()
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
     order_data = order.model_dump()
-    order_data["orderNumber"] = generate_order_number()
+    order_data["tenantId"] = tenant
+    order_data["orderNumber"] = generate_order_number(now)
     order_data["status"] = OrderStatus.PENDING
-    order_data["createdAt"] = datetime.utcnow()
-    order_data["updatedAt"] = datetime.utcnow()
+    order_data["createdAt"] = now
+    order_data["updatedAt"] = now
     
+    # The inserted document is the response; no read-back round trip
     result = await db.orders.insert_one(order_data)
+    order_data["_id"] = str(result.inserted_id)
     
-    created_order = await db.orders.find_one({"_id": result.inserted_id})
-    created_order["_id"] = str(created_order["_id"])
-    
-    return created_order
+    return order_data
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Naive UTC datetime, as stored in createdAt"""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
 
-@router.get("", response_model=List[OrderResponse])
-async def list_orders(skip: int = 0, limit: int = 100):
-    """List all orders (admin)"""
+@router.get("", response_model=OrderPage)
+async def list_orders(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    status: Optional[OrderStatus] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    state: Optional[str] = None,
+    city: Optional[str] = None,
+    utm_source: Optional[str] = None,
+    include_total: bool = False,
+    tenant: str = Depends(get_tenant),
+    current_user: dict = Depends(get_current_user)
+):
+    """List orders (admin), a page at a time (pass nextCursor back as cursor)"""
     db = get_db()
     
-    orders = await db.orders.find().sort("createdAt", -1).skip(skip).limit(limit).to_list(limit)
-    
-    for order in orders:
-        order["_id"] = str(order["_id"])
+    query = {"tenantId": tenant}
+    if status is not None:
+        query["status"] = status
+    if date_from is not None or date_to is not None:
+        query["createdAt"] = {}
+        if date_from is not None:
+            query["createdAt"]["$gte"] = as_utc(date_from)
+        if date_to is not None:
+            query["createdAt"]["$lte"] = as_utc(date_to)
+    if state:
+        query["state"] = state
+    if city:
+        query["city"] = city
+    if utm_source:
+        query["utmSource"] = utm_source
+    
+    orders, next_cursor = await fetch_page(
+        db.orders, query, "createdAt", (datetime, ObjectId), sort_direction(order), cursor, limit
+    )
+    for item in orders:
+        item["_id"] = str(item["_id"])
+    
+    page = {"orders": orders, "count": len(orders), "nextCursor": next_cursor}
+    if include_total:
+        # Bounded, so a broad filter on a large store stays cheap
+        total = await db.orders.count_documents(query, limit=ORDER_TOTAL_LIMIT)
+        page["total"] = total
+        page["totalCapped"] = total >= ORDER_TOTAL_LIMIT
+    
+    body = order_page_adapter.dump_json(order_page_adapter.validate_python(page), by_alias=True)
+    return Response(content=body, media_type="application/json")
+
+@router.get("/summary", response_model=OrderSummary)
+async def get_order_summary(tenant: str = Depends(get_tenant), current_user: dict = Depends(get_current_user)):
+    """Order counts per status and paid revenue (admin)"""
+    db = get_db()
     
-    return orders
+    by_status = {status: 0 for status in OrderStatus}
+    paid_total = 0.0
+    async for group in db.orders.aggregate([
+        {"$match": {"tenantId": tenant}},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}, "totalPrice": {"$sum": "$totalPrice"}}},
+    ]):
+        if group["_id"] in by_status:
+            by_status[group["_id"]] = group["count"]
+        if group["_id"] == OrderStatus.PAID:
+            paid_total = group["totalPrice"]
+    
+    return {"total": sum(by_status.values()), "byStatus": by_status, "paidTotal": paid_total}
 
 @router.get("/{order_id}", response_model=OrderResponse)
-async def get_order(order_id: str):
+async def get_order(order_id: str, tenant: str = Depends(get_tenant)):
     """Get a specific order"""
     db = get_db()
     
     try:
-        order = await db.orders.find_one({"_id": ObjectId(order_id)})
+        order = await db.orders.find_one({"_id": ObjectId(order_id), "tenantId": tenant})
     except:
         # Try to find by order number
-        order = await db.orders.find_one({"orderNumber": order_id})
+        order = await db.orders.find_one({"orderNumber": order_id, "tenantId": tenant})
     
     if not order:
         raise HTTPException(status_code=404, detail="Pedido não encontrado")
@@ -86,7 +158,7 @@ async def get_order(order_id: str):
     return order
 
 @router.patch("/{order_id}/status", response_model=OrderResponse)
-async def update_order_status(order_id: str, status_update: OrderStatusUpdate):
+async def update_order_status(order_id: str, status_update: OrderStatusUpdate, tenant: str = Depends(get_tenant)):
     """Update order status"""
     db = get_db()
     
@@ -95,7 +167,7 @@ async def update_order_status(order_id: str, status_update: OrderStatusUpdate):
     except:
         raise HTTPException(status_code=400, detail="ID de pedido inválido")
     
-    order = await db.orders.find_one({"_id": oid})
+    order = await db.orders.find_one({"_id": oid, "tenantId": tenant})
     if not order:
         raise HTTPException(status_code=404, detail="Pedido não encontrado")
     
@@ -1,8 +1,6 @@
-from fastapi import APIRouter, HTTPException, Request
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import APIRouter, HTTPException, Request, Depends
 from datetime import datetime, timedelta
 from bson import ObjectId
-import os
 import httpx
 import logging
 import base64
@@ -10,7 +8,13 @@ import hashlib
 import io
 import qrcode
 
+from config import get_config
 from models import OrderStatus
+from routers.settings import load_settings
+from utils.cache import settings_cache
+from utils.database import get_database
+from utils.http_cache import conditional_json
+from utils.tenancy import DEFAULT_TENANT, get_tenant
 
 router = APIRouter(prefix="/api/payments", tags=["payments"])
 logger = logging.getLogger(__name__)
@@ -18,31 +22,29 @@ logger = logging.getLogger(__name__)
 ORIONPAY_API_URL = "https://payapi.orion.moe/api/v1"
 
 def get_db():
-    mongo_url = os.environ.get('MONGO_URL')
-    client = AsyncIOMotorClient(mongo_url)
-    return client[os.environ.get('DB_NAME')]
+    return get_database()
 
-async def get_payment_settings():
-    """Get payment gateway settings from database"""
-    db = get_db()
-    settings = await db.settings.find_one({}, {"_id": 0})
-    
-    if not settings:
-        # Return defaults if no settings
-        return {
-            "paymentGateway": "orionpay",
-            "orionpayApiKey": os.environ.get('ORIONPAY_API_KEY', ''),
-            "orionpayWebhookSecret": "",
-            "paymentTestMode": True,
-            "pixExpirationMinutes": 30
-        }
+async def get_payment_settings(tenant: str = DEFAULT_TENANT):
+    """Get a tenant's payment gateway settings (served from the settings cache)"""
+    entry = await settings_cache.for_tenant(tenant).get_or_load(lambda: load_settings(tenant))
+    settings = dict(entry.doc)
+    settings.pop("_id", None)
     
     # Fallback to env var if not in settings
     if not settings.get("orionpayApiKey"):
-        settings["orionpayApiKey"] = os.environ.get('ORIONPAY_API_KEY', '')
+        settings["orionpayApiKey"] = get_config().orionpay_api_key
     
     return settings
 
+def build_payment_config(settings: dict) -> dict:
+    """Public payment configuration (without sensitive data)"""
+    return {
+        "gateway": settings.get("paymentGateway", "orionpay"),
+        "isConfigured": bool(settings.get("orionpayApiKey") or get_config().orionpay_api_key),
+        "testMode": settings.get("paymentTestMode", True),
+        "pixExpirationMinutes": settings.get("pixExpirationMinutes", 30)
+    }
+
 def generate_pix_emv_code(order_id: str, amount: float, merchant_name: str = "NEUROVITA") -> str:
     """
     Generate a valid PIX EMV code (BR Code)
@@ -126,10 +128,10 @@ def generate_qr_code_base64(data: str) -> str:
     return f"data:image/png;base64,{img_base64}"
 
 @router.post("/pix/generate")
-async def generate_pix_payment(order_id: str):
+async def generate_pix_payment(order_id: str, tenant: str = Depends(get_tenant)):
     """Generate PIX payment for an order"""
     db = get_db()
-    payment_settings = await get_payment_settings()
+    payment_settings = await get_payment_settings(tenant)
     
     api_key = payment_settings.get("orionpayApiKey")
     expiration_minutes = payment_settings.get("pixExpirationMinutes", 30)
@@ -137,9 +139,9 @@ async def generate_pix_payment(order_id: str):
     
     # Get order
     try:
-        order = await db.orders.find_one({"_id": ObjectId(order_id)})
+        order = await db.orders.find_one({"_id": ObjectId(order_id), "tenantId": tenant})
     except:
-        order = await db.orders.find_one({"orderNumber": order_id})
+        order = await db.orders.find_one({"orderNumber": order_id, "tenantId": tenant})
     
     if not order:
         raise HTTPException(status_code=404, detail="Pedido não encontrado")
@@ -233,14 +235,14 @@ async def generate_pix_payment(order_id: str):
     }
 
 @router.get("/pix/status/{order_id}")
-async def check_pix_status(order_id: str):
+async def check_pix_status(order_id: str, tenant: str = Depends(get_tenant)):
     """Check PIX payment status for an order"""
     db = get_db()
     
     try:
-        order = await db.orders.find_one({"_id": ObjectId(order_id)})
+        order = await db.orders.find_one({"_id": ObjectId(order_id), "tenantId": tenant})
     except:
-        order = await db.orders.find_one({"orderNumber": order_id})
+        order = await db.orders.find_one({"orderNumber": order_id, "tenantId": tenant})
     
     if not order:
         raise HTTPException(status_code=404, detail="Pedido não encontrado")
@@ -255,13 +257,9 @@ async def check_pix_status(order_id: str):
     }
 
 @router.get("/config")
-async def get_payment_config():
+async def get_payment_config(request: Request, tenant: str = Depends(get_tenant)):
     """Get payment gateway configuration status (without sensitive data)"""
-    payment_settings = await get_payment_settings()
+    entry = await settings_cache.for_tenant(tenant).get_or_load(lambda: load_settings(tenant))
+    config = entry.view("payment_config", build_payment_config)
     
-    return {
-        "gateway": payment_settings.get("paymentGateway", "orionpay"),
-        "isConfigured": bool(payment_settings.get("orionpayApiKey")),
-        "testMode": payment_settings.get("paymentTestMode", True),
-        "pixExpirationMinutes": payment_settings.get("pixExpirationMinutes", 30)
-    }
+    return conditional_json(request, config.body, config.etag)
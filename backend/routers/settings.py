@@ -1,47 +1,106 @@
-from fastapi import APIRouter, HTTPException
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import APIRouter, HTTPException, Request, Depends
+from pymongo import ReturnDocument
 from datetime import datetime
-import os
+from typing import List, Optional
+import hashlib
 
-from models import SettingsBase, SettingsUpdate, SettingsResponse
+from models import SettingsBase, SettingsUpdate, SettingsResponse, PUBLIC_SETTINGS_FIELDS, public_settings
+from routers.auth import get_current_user
+from utils.cache import settings_cache, encode_json, make_etag, SectionedBody
+from utils.cache_sync import cache_sync
+from utils.database import get_database
+from utils.http_cache import conditional_json
+from utils.snapshots import snapshot_publisher
+from utils.tenancy import DEFAULT_TENANT, get_tenant
 
 router = APIRouter(prefix="/api/settings", tags=["settings"])
 
+# Fields of the FAQ page snapshot (what FAQ.jsx requests)
+FAQ_SNAPSHOT_FIELDS = ("faq", "productName", "whatsapp")
+
 def get_db():
-    mongo_url = os.environ.get('MONGO_URL')
-    client = AsyncIOMotorClient(mongo_url)
-    return client[os.environ.get('DB_NAME')]
+    return get_database()
 
-@router.get("")
-async def get_settings():
-    """Get site settings"""
+async def load_settings(tenant: str = DEFAULT_TENANT):
+    """Load a tenant's settings from the database, creating defaults if missing"""
     db = get_db()
-    settings = await db.settings.find_one()
     
-    if not settings:
-        # Create default settings if not exists
-        default_settings = SettingsBase().model_dump()
-        default_settings["updatedAt"] = datetime.utcnow()
-        result = await db.settings.insert_one(default_settings)
-        default_settings["_id"] = str(result.inserted_id)
-        return default_settings
+    default_settings = SettingsBase().model_dump()
+    default_settings["updatedAt"] = datetime.utcnow()
     
-    settings["_id"] = str(settings["_id"])
-    return settings
+    return await db.settings.find_one_and_update(
+        {"_id": tenant},
+        {"$setOnInsert": default_settings},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
 
-@router.put("")
-async def update_settings(settings_update: SettingsUpdate):
-    """Update site settings"""
-    db = get_db()
+def render_settings_snapshots(settings: dict) -> dict:
+    """Static snapshot files derived from the settings document"""
+    public = SectionedBody(public_settings(settings))
+    return {"settings": public.body, "faq": public.select(FAQ_SNAPSHOT_FIELDS)}
+
+snapshot_publisher.add_source(load_settings, render_settings_snapshots)
+
+def parse_fields(fields: str) -> List[str]:
+    """Parse a comma-separated list of public settings fields"""
+    keys = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    if not keys:
+        raise HTTPException(status_code=400, detail="Informe ao menos um campo")
+    
+    invalid = [key for key in keys if key not in PUBLIC_SETTINGS_FIELDS]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Campos inválidos: {', '.join(invalid)}")
+    
+    return keys
+
+@router.get("")
+async def get_settings(request: Request, fields: Optional[str] = None, tenant: str = Depends(get_tenant)):
+    """Get public site settings (storefront fields only), optionally a subset: ?fields=faq,hero"""
+    cache = settings_cache.for_tenant(tenant)
+    if fields is None:
+        entry = await cache.get_or_load(lambda: load_settings(tenant))
+        public = entry.view("public")
+        return conditional_json(request, public.body, public.etag)
     
-    # Get current settings or create default
-    current = await db.settings.find_one()
+    keys = parse_fields(fields)
+    entry = cache.peek()
     
-    if not current:
-        default_settings = SettingsBase().model_dump()
-        default_settings["updatedAt"] = datetime.utcnow()
-        result = await db.settings.insert_one(default_settings)
-        current = await db.settings.find_one({"_id": result.inserted_id})
+    if entry is None:
+        # Cache miss: read only the requested fields
+        db = get_db()
+        projection = {key: 1 for key in keys}
+        projection["_id"] = 0
+        settings = await db.settings.find_one({"_id": tenant}, projection)
+        if settings is not None:
+            body = encode_json({key: settings[key] for key in keys if key in settings})
+            return conditional_json(request, body, make_etag(body))
+        entry = await cache.get_or_load(lambda: load_settings(tenant))
+    
+    # Cache hit: join the pre-encoded sections of the public view
+    public = entry.view("public")
+    selection = hashlib.sha256(",".join(keys).encode()).hexdigest()[:8]
+    etag = f'{public.etag[:-1]}-{selection}"'
+    return conditional_json(request, public.select(keys), etag)
+
+@router.get("/admin")
+async def get_admin_settings(
+    request: Request,
+    tenant: str = Depends(get_tenant),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the full settings document, including payment credentials (admin)"""
+    entry = await settings_cache.for_tenant(tenant).get_or_load(lambda: load_settings(tenant))
+    return conditional_json(request, entry.body, entry.etag, cache_control="private, no-cache")
+
+@router.put("")
+async def update_settings(
+    settings_update: SettingsUpdate,
+    tenant: str = Depends(get_tenant),
+    current_user: dict = Depends(get_current_user)
+):
+    """Update site settings; returns the full document, like /admin"""
+    db = get_db()
     
     # Update only provided fields
     update_data = {}
@@ -57,25 +116,42 @@ async def update_settings(settings_update: SettingsUpdate):
     
     update_data["updatedAt"] = datetime.utcnow()
     
-    await db.settings.update_one(
-        {"_id": current["_id"]},
-        {"$set": update_data}
+    # Defaults only apply when the document does not exist yet
+    default_settings = {
+        key: value for key, value in SettingsBase().model_dump().items()
+        if key not in update_data
+    }
+    
+    updated = await db.settings.find_one_and_update(
+        {"_id": tenant},
+        {"$set": update_data, "$setOnInsert": default_settings},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
     
-    updated = await db.settings.find_one({"_id": current["_id"]})
-    updated["_id"] = str(updated["_id"])
-    return updated
+    cache = settings_cache.for_tenant(tenant)
+    entry = cache.set(updated)
+    await cache_sync.publish(cache)
+    await snapshot_publisher.publish(tenant)
+    return entry.doc
 
 @router.post("/reset")
-async def reset_settings():
-    """Reset settings to default"""
+async def reset_settings(tenant: str = Depends(get_tenant), current_user: dict = Depends(get_current_user)):
+    """Reset settings to default (admin)"""
     db = get_db()
     
-    await db.settings.delete_many({})
-    
     default_settings = SettingsBase().model_dump()
     default_settings["updatedAt"] = datetime.utcnow()
-    result = await db.settings.insert_one(default_settings)
-    default_settings["_id"] = str(result.inserted_id)
     
-    return default_settings
+    updated = await db.settings.find_one_and_replace(
+        {"_id": tenant},
+        default_settings,
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    
+    cache = settings_cache.for_tenant(tenant)
+    entry = cache.set(updated)
+    await cache_sync.publish(cache)
+    await snapshot_publisher.publish(tenant)
+    return entry.doc
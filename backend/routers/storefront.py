@@ -0,0 +1,190 @@
+from fastapi import APIRouter, HTTPException, Request, Depends
+from starlette.concurrency import run_in_threadpool
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+import asyncio
+import html
+import httpx
+import logging
+import re
+import time
+
+from config import get_config
+from routers.settings import load_settings
+from routers.images import load_images
+from utils.cache import settings_cache, images_cache, make_etag
+from utils.http_cache import conditional_response
+from utils.serialization import dumps
+from utils.tenancy import get_tenant
+
+router = APIRouter(prefix="/api/storefront", tags=["storefront"])
+logger = logging.getLogger(__name__)
+
+FRONTEND_DIR = Path(__file__).parent.parent.parent / "frontend"
+DEFAULT_TEMPLATES = [
+    FRONTEND_DIR / "build" / "index.html",  # local React build
+    FRONTEND_DIR / "index.html",  # build copied by install.sh
+    FRONTEND_DIR / "public" / "index.html",  # development
+]
+
+# Seconds between checks for a new frontend build
+TEMPLATE_CHECK_INTERVAL = 30
+
+# The SPA reads this element instead of calling /api/settings and /api/images
+BOOTSTRAP_ELEMENT_ID = "storefront-bootstrap"
+
+HEAD_END_RE = re.compile(r"([ \t]*)</head>", re.IGNORECASE)
+TITLE_RE = re.compile(r"<title>.*?</title>", re.IGNORECASE | re.DOTALL)
+REPLACED_META_RE = re.compile(
+    r'\s*<meta\s+(?:name="(?:description|theme-color|keywords)"|property="og:(?:title|description|image)")[^>]*>',
+    re.IGNORECASE,
+)
+
+# Characters that must not appear raw inside an inline <script>
+SCRIPT_ESCAPES = {
+    ord("<"): "\\u003c",
+    ord(">"): "\\u003e",
+    ord("&"): "\\u0026",
+    0x2028: "\\u2028",
+    0x2029: "\\u2029",
+}
+
+
+class TemplateSource:
+    """
+    The built index.html, read from a file or fetched from the frontend server.
+
+    STOREFRONT_TEMPLATE may be a path or an http(s) URL; by default the
+    local React build (or public/index.html in development) is used. The
+    source is checked for changes at most every TEMPLATE_CHECK_INTERVAL
+    seconds, so a frontend deploy is picked up without a backend restart.
+    """
+
+    def __init__(self):
+        self.text: Optional[str] = None
+        self.version: Optional[str] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> Tuple[str, str]:
+        if self.text is not None and time.monotonic() - self._checked_at < TEMPLATE_CHECK_INTERVAL:
+            return self.text, self.version
+
+        async with self._lock:
+            if self.text is None or time.monotonic() - self._checked_at >= TEMPLATE_CHECK_INTERVAL:
+                location = get_config().storefront_template
+                if location.startswith(("http://", "https://")):
+                    await self._fetch(location)
+                else:
+                    await self._read(location)
+                self._checked_at = time.monotonic()
+
+        if self.text is None:
+            raise HTTPException(status_code=503, detail="Template da loja não encontrado")
+        return self.text, self.version
+
+    async def _read(self, location: str):
+        candidates = [Path(location)] if location else DEFAULT_TEMPLATES
+        for path in candidates:
+            try:
+                stat = await run_in_threadpool(path.stat)
+            except FileNotFoundError:
+                continue
+            version = f"{path}:{stat.st_mtime_ns}"
+            if version != self.version:
+                self.text = await run_in_threadpool(path.read_text, encoding="utf-8")
+                self.version = version
+            return
+
+    async def _fetch(self, url: str):
+        headers = {"If-None-Match": self.version} if self.version else {}
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await client.get(url, headers=headers, timeout=5.0)
+        except httpx.HTTPError as e:
+            logger.warning(f"Storefront template fetch failed: {e}")
+            return
+
+        if response.status_code == 200:
+            self.text = response.text
+            self.version = response.headers.get("etag") or make_etag(response.content)
+        elif response.status_code != 304:
+            logger.warning(f"Storefront template fetch returned {response.status_code}")
+
+
+def script_json(content) -> str:
+    """JSON safe to embed inside an inline <script> element"""
+    return dumps(content).decode("utf-8").translate(SCRIPT_ESCAPES)
+
+
+def render_index(template: str, settings: dict, images: dict) -> str:
+    """
+    Inline storefront content and SEO meta tags into index.html.
+
+    Args:
+        template: Built index.html
+        settings: Public settings projection
+        images: Product images document
+
+    Returns:
+        Rendered HTML
+    """
+    site_name = settings.get("siteName") or ""
+    default_title = f"{site_name} - {settings['tagline']}" if settings.get("tagline") else site_name
+    title = settings.get("metaTitle") or default_title
+    description = settings.get("metaDescription") or settings.get("description") or ""
+    og_title = settings.get("ogTitle") or title
+    og_description = settings.get("ogDescription") or description
+    og_image = settings.get("ogImage") or ""
+
+    def meta(attr: str, name: str, content: str) -> str:
+        return f'<meta {attr}="{name}" content="{html.escape(content)}" />'
+
+    head = [
+        meta("name", "description", description),
+        meta("name", "keywords", settings.get("metaKeywords") or ""),
+        meta("name", "theme-color", settings.get("primaryColor") or "#059669"),
+        meta("property", "og:title", og_title),
+        meta("property", "og:description", og_description),
+    ]
+    if og_image:
+        head.append(meta("property", "og:image", og_image))
+    head.append(
+        f'<script id="{BOOTSTRAP_ELEMENT_ID}" type="application/json">'
+        f'{script_json({"settings": settings, "images": images})}</script>'
+    )
+
+    page = REPLACED_META_RE.sub("", template)
+    page = TITLE_RE.sub(lambda _: f"<title>{html.escape(title)}</title>", page, count=1)
+    return HEAD_END_RE.sub(
+        lambda m: "".join(f"{m.group(1)}    {tag}\n" for tag in head) + m.group(0), page, count=1
+    )
+
+
+template_source = TemplateSource()
+
+# Last rendered page per tenant: (settings, images and template versions), body, etag.
+# Bounded like the settings cache, least recently used tenant first.
+_rendered: "OrderedDict[str, Tuple[tuple, bytes, str]]" = OrderedDict()
+
+@router.get("/index.html")
+async def get_storefront_index(request: Request, tenant: str = Depends(get_tenant)):
+    """Render index.html with the storefront bootstrap payload inlined"""
+    settings_entry = await settings_cache.for_tenant(tenant).get_or_load(lambda: load_settings(tenant))
+    images_entry = await images_cache.for_tenant(tenant).get_or_load(lambda: load_images(tenant))
+    template, template_version = await template_source.get()
+
+    key = (settings_entry.version, images_entry.version, template_version)
+    rendered = _rendered.get(tenant)
+    if rendered is None or rendered[0] != key:
+        page = render_index(template, settings_entry.view("public").content, images_entry.doc)
+        body = page.encode("utf-8")
+        rendered = _rendered[tenant] = (key, body, make_etag(body))
+
+    _rendered.move_to_end(tenant)
+    while len(_rendered) > settings_cache.max_tenants:
+        _rendered.popitem(last=False)
+
+    _, body, etag = rendered
+    return conditional_response(request, body, etag, "text/html; charset=utf-8")
@@ -1,10 +1,34 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from fastapi.responses import FileResponse
-from datetime import datetime
-import os
-import uuid
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import RedirectResponse
+from typing import Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime, timedelta
+import asyncio
+import logging
 import shutil
 from pathlib import Path
+from urllib.parse import quote
+
+from config import AppConfig, get_config
+from routers.auth import get_current_user
+from utils.content_store import (
+    UPLOADS_COLLECTION, add_reference, cache_control_for, content_etag, content_filename, describe_file,
+    drop_record, is_content_addressed, release_reference, save_metadata, store_upload
+)
+from utils.database import get_database
+from utils.http_cache import file_response
+from utils.image_optimize import optimize_upload
+from utils.image_placeholder import placeholder_for_file
+from utils.image_transform import (
+    CACHE_DIRNAME, TRANSFORM_FORMATS, TransformCache, format_available, get_allowed_qualities, get_allowed_sizes
+)
+from utils.image_variants import MEDIA_TYPES, VARIANTS_DIRNAME, build_variants, delete_variants, describe_variants
+from utils.pagination import fetch_page, sort_direction
+from utils.storage import create_storage
+from utils.upload_gc import GC_GRACE, QUARANTINE_RETENTION, collect_garbage
+from utils.upload_stream import IMAGE_MEDIA_TYPES, ReceivedUpload, receive_upload, receive_uploads
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/uploads", tags=["uploads"])
 
@@ -15,6 +39,31 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 # Allowed extensions
 ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg'}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+MAX_BATCH_FILES = 50
+
+# Extensions that ?w=&h=&fmt=&q= can be applied to
+TRANSFORMABLE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+
+transform_cache = TransformCache(UPLOAD_DIR / CACHE_DIRNAME)
+
+# Where uploads are kept for good (STORAGE_BACKEND); UPLOAD_DIR is the
+# local working copy either way
+storage = create_storage(get_config(), UPLOAD_DIR)
+
+# Clients may cache a redirect to the storage for this long (well within
+# the lifetime of a pre-signed URL)
+REDIRECT_CACHE_CONTROL = "public, max-age=300"
+
+def get_db():
+    return get_database()
+
+# ?sort= values of the listing: the field they order by, and the types of
+# its cursor values and of _id
+LIST_SORT_FIELDS = {
+    "createdAt": ("createdAt", (datetime, str)),
+    "size": ("size", (int, str)),
+    "filename": ("_id", (str,)),
+}
 
 def get_file_extension(filename: str) -> str:
     return Path(filename).suffix.lower()
@@ -22,123 +71,331 @@ def get_file_extension(filename: str) -> str:
 def is_allowed_file(filename: str) -> bool:
     return get_file_extension(filename) in ALLOWED_EXTENSIONS
 
-@router.post("/image")
-async def upload_image(file: UploadFile = File(...)):
-    """Upload an image file"""
-    
-    # Validate file extension
-    if not is_allowed_file(file.filename):
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Tipo de arquivo não permitido. Use: {', '.join(ALLOWED_EXTENSIONS)}"
+def variant_key(filename: str) -> str:
+    return f"{VARIANTS_DIRNAME}/{filename}"
+
+async def publish_variants(manifest: Optional[dict]):
+    """Hand the generated variants of an upload to the storage backend"""
+    for variant in (manifest or {}).get("variants", []):
+        await storage.save(
+            variant_key(variant["filename"]),
+            UPLOAD_DIR / VARIANTS_DIRNAME / variant["filename"],
+            MEDIA_TYPES[variant["format"]],
+            cache_control_for(variant["filename"].split("-", 1)[0])
         )
+
+async def store_received(upload: ReceivedUpload) -> Tuple[dict, bool]:
+    """
+    Store a received file and count a reference to it (uploads and mirrored
+    remote images go through here).
     
-    # Read file content
-    content = await file.read()
+    Returns:
+        The uploads record including its metadata, and whether the content
+        was already stored
+    """
+    # Named by content hash (the extension follows the detected content, not
+    # the client's file name); identical uploads share one file
+    unique_filename = content_filename(upload)
+    local_path = UPLOAD_DIR / unique_filename
+    deduplicated = await storage.exists(unique_filename)
     
-    # Validate file size
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Arquivo muito grande. Máximo: {MAX_FILE_SIZE // 1024 // 1024}MB"
-        )
+    # Strip metadata and recompress new content (named by the original bytes,
+    # which the optimized file is derived from)
+    bytes_saved = 0
+    if not deduplicated:
+        try:
+            bytes_saved = await optimize_upload(upload)
+        except BaseException:
+            upload.discard()
+            raise
+    
+    record = await add_reference(get_db(), unique_filename, upload, bytes_saved)
+    # The file may have gone with its last reference since the check above;
+    # the reference now held keeps it from here on. Stored as received then
+    # (the record was created with this upload's size)
+    if deduplicated and not await storage.exists(unique_filename):
+        deduplicated = False
     
-    # Generate unique filename
-    ext = get_file_extension(file.filename)
-    unique_filename = f"{uuid.uuid4().hex}{ext}"
-    file_path = UPLOAD_DIR / unique_filename
-    
-    # Save file
-    with open(file_path, "wb") as f:
-        f.write(content)
-    
-    # Generate URL - use the external URL for production
-    # Try to get from frontend env first, then fall back to localhost
-    external_url = os.environ.get('EXTERNAL_URL', '')
-    if not external_url:
-        # Read from frontend .env if available
-        frontend_env_path = Path(__file__).parent.parent.parent / "frontend" / ".env"
-        if frontend_env_path.exists():
-            with open(frontend_env_path) as f:
-                for line in f:
-                    if line.startswith('REACT_APP_BACKEND_URL='):
-                        external_url = line.split('=', 1)[1].strip().strip('"\'')
-                        break
-    
-    if not external_url:
-        external_url = 'http://localhost:8001'
-    
-    file_url = f"{external_url}/api/uploads/images/{unique_filename}"
+    # The local copy is the working file for variants and transformations
+    await run_in_threadpool(store_upload, upload, local_path)
+    if not deduplicated:
+        await storage.save(unique_filename, local_path, IMAGE_MEDIA_TYPES[upload.extension], cache_control_for(upload.sha256))
     
+    if deduplicated and "mimeType" in record:
+        # Stored before: metadata and variants are on the record already
+        return record, deduplicated
+    
+    # Resized WebP/AVIF copies, generated in the image process pool
+    manifest = await build_variants(local_path)
+    await publish_variants(manifest)
+    
+    # Listing metadata, so /list never has to touch the storage
+    metadata = await run_in_threadpool(describe_file, local_path, manifest)
+    # Tiny inline preview shown while the image loads
+    placeholder = await placeholder_for_file(local_path)
+    metadata["placeholder"] = placeholder["src"] if placeholder else None
+    await save_metadata(get_db(), unique_filename, metadata)
+    return {**record, **metadata}, deduplicated
+
+async def release_upload(filename: str) -> int:
+    """
+    Drop one reference to a stored file; the file, its variants and its local
+    copies go with the last one (legacy files without a hash name go at once).
+    
+    Returns:
+        References left
+    """
+    db = get_db()
+    record = await db[UPLOADS_COLLECTION].find_one({"_id": filename}, {"variants": 1})
+    if is_content_addressed(Path(filename).stem):
+        remaining = await release_reference(db, filename)
+        if remaining > 0:
+            return remaining
+    
+    await storage.delete(filename)
+    await discard_derived(filename, (record or {}).get("variants") or [])
+    await drop_record(db, filename)
+    return 0
+
+async def discard_derived(filename: str, variants: list):
+    """Delete an upload's stored variants and its local working copies"""
+    for variant in variants:
+        await storage.delete(variant_key(variant["filename"]))
+    
+    file_path = UPLOAD_DIR / filename
+    await run_in_threadpool(file_path.unlink, missing_ok=True)
+    await run_in_threadpool(delete_variants, UPLOAD_DIR, file_path.stem)
+    await transform_cache.purge(file_path.stem)
+
+def upload_result(record: dict, upload: ReceivedUpload, deduplicated: bool, external_url: str) -> dict:
+    """Response body of a stored upload"""
     return {
         "success": True,
-        "filename": unique_filename,
-        "url": file_url,
-        "size": len(content),
-        "uploadedAt": datetime.utcnow().isoformat()
+        "filename": record["_id"],
+        "url": f"{external_url}/api/uploads/images/{record['_id']}",
+        "size": record["size"],
+        "originalSize": record.get("originalSize", record["size"]),
+        "bytesSaved": record.get("bytesSaved", 0),
+        "sha256": upload.sha256,
+        "deduplicated": deduplicated,
+        "refCount": record["refCount"],
+        "mimeType": record["mimeType"],
+        "width": record.get("width"),
+        "height": record.get("height"),
+        "placeholder": record.get("placeholder"),
+        "uploadedAt": datetime.utcnow().isoformat(),
+        **describe_variants(record if record.get("variants") else None, f"{external_url}/api/uploads/variants")
     }
 
+@router.post("/image")
+async def upload_image(request: Request, config: AppConfig = Depends(get_config)):
+    """Upload an image file (multipart field "file"), streamed to disk"""
+    # Rejects wrong extensions, non-images and oversized files while streaming
+    upload = await receive_upload(request, UPLOAD_DIR, MAX_FILE_SIZE, ALLOWED_EXTENSIONS)
+    record, deduplicated = await store_received(upload)
+    return upload_result(record, upload, deduplicated, config.external_url)
+
+@router.post("/images")
+async def upload_images(request: Request, config: AppConfig = Depends(get_config)):
+    """Upload several image files at once (multipart field "files", once per file)"""
+    # Each file is stored as soon as it has been received, while the next
+    # ones are still streaming, UPLOAD_BATCH_CONCURRENCY at a time
+    semaphore = asyncio.Semaphore(config.upload_batch_concurrency)
+    # Identical files in one batch are stored one after the other
+    content_locks = {}
+    results = {}
+    tasks = {}
+    
+    async def process(upload: ReceivedUpload) -> dict:
+        async with content_locks.setdefault(upload.sha256, asyncio.Lock()), semaphore:
+            try:
+                record, deduplicated = await store_received(upload)
+            except Exception as e:
+                upload.discard()
+                logger.error(f"Could not store {upload.filename}: {e}")
+                return {"success": False, "status": 500, "error": "Erro ao salvar o arquivo"}
+        return upload_result(record, upload, deduplicated, config.external_url)
+    
+    try:
+        async for index, name, received in receive_uploads(
+            request, UPLOAD_DIR, MAX_FILE_SIZE, ALLOWED_EXTENSIONS, MAX_BATCH_FILES
+        ):
+            if isinstance(received, HTTPException):
+                results[index] = {"name": name, "success": False, "status": received.status_code, "error": received.detail}
+            else:
+                tasks[index] = (name, asyncio.create_task(process(received)))
+    finally:
+        # Files already received are stored even if the rest of the body fails
+        await asyncio.gather(*(task for _, task in tasks.values()), return_exceptions=True)
+    
+    for index, (name, task) in tasks.items():
+        results[index] = {"name": name, **task.result()}
+    files = [results[index] for index in sorted(results)]
+    uploaded = sum(1 for item in files if item["success"])
+    return {
+        "success": uploaded == len(files),
+        "uploaded": uploaded,
+        "failed": len(files) - uploaded,
+        "files": files,
+    }
+
+def validate_transform(w: Optional[int], h: Optional[int], fmt: Optional[str], q: Optional[int]):
+    """Check transformation parameters against the allow-lists"""
+    sizes = get_allowed_sizes()
+    for name, value in (("w", w), ("h", h)):
+        if value is not None and value not in sizes:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Valor de {name} não permitido. Use: {', '.join(map(str, sorted(sizes)))}"
+            )
+    
+    if fmt is not None and not format_available(fmt):
+        available = [f for f in TRANSFORM_FORMATS if format_available(f)]
+        raise HTTPException(status_code=400, detail=f"Formato não suportado. Use: {', '.join(available)}")
+    
+    if q is not None and q not in get_allowed_qualities():
+        qualities = ', '.join(map(str, sorted(get_allowed_qualities())))
+        raise HTTPException(status_code=400, detail=f"Qualidade não permitida. Use: {qualities}")
+
+async def serve_upload(request: Request, path: Path, media_type: str, source_stem: str, config: AppConfig):
+    """Send a file from UPLOAD_DIR with ETag/304 and range support (through nginx if configured)"""
+    accel_redirect = None
+    if config.uploads_accel_redirect:
+        relative = quote(path.relative_to(UPLOAD_DIR).as_posix())
+        accel_redirect = f"{config.uploads_accel_redirect.rstrip('/')}/{relative}"
+    
+    try:
+        return await file_response(
+            request,
+            path,
+            media_type,
+            etag=content_etag(path.name),
+            cache_control=cache_control_for(source_stem),
+            accel_redirect=accel_redirect
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Imagem não encontrada")
+
 @router.get("/images/{filename}")
-async def get_image(filename: str):
-    """Serve an uploaded image"""
+async def get_image(
+    request: Request,
+    filename: str,
+    w: Optional[int] = None,
+    h: Optional[int] = None,
+    fmt: Optional[str] = None,
+    q: Optional[int] = None,
+    config: AppConfig = Depends(get_config)
+):
+    """Serve an uploaded image, optionally resized/re-encoded: ?w=640&fmt=webp&q=80"""
     file_path = UPLOAD_DIR / filename
     
-    if not file_path.exists():
+    # Temporary files of uploads in progress are not served
+    if filename.startswith("."):
         raise HTTPException(status_code=404, detail="Imagem não encontrada")
     
-    # Determine content type
     ext = get_file_extension(filename)
-    content_types = {
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.png': 'image/png',
-        '.gif': 'image/gif',
-        '.webp': 'image/webp',
-        '.svg': 'image/svg+xml'
-    }
+    if w is not None or h is not None or fmt is not None or q is not None:
+        validate_transform(w, h, fmt, q)
+        # Transformations are computed (and cached) locally
+        if not await storage.fetch(filename, file_path):
+            raise HTTPException(status_code=404, detail="Imagem não encontrada")
+        if ext not in TRANSFORMABLE_EXTENSIONS:
+            raise HTTPException(status_code=400, detail="Esta imagem não pode ser transformada")
+        
+        # Keep the source format unless another one is requested
+        fmt = fmt or {'.jpg': 'jpeg', '.jpeg': 'jpeg'}.get(ext, ext[1:])
+        try:
+            transformed = await transform_cache.get(file_path, w, h, fmt, q)
+        except OSError:
+            raise HTTPException(status_code=422, detail="Não foi possível processar a imagem")
+        
+        return await serve_upload(request, transformed, TRANSFORM_FORMATS[fmt][1], file_path.stem, config)
     
-    return FileResponse(
-        file_path,
-        media_type=content_types.get(ext, 'application/octet-stream'),
-        headers={"Cache-Control": "public, max-age=31536000"}
-    )
+    download_url = storage.download_url(filename)
+    if download_url:
+        return RedirectResponse(download_url, headers={"Cache-Control": REDIRECT_CACHE_CONTROL})
+    
+    media_type = IMAGE_MEDIA_TYPES.get(ext, 'application/octet-stream')
+    return await serve_upload(request, file_path, media_type, file_path.stem, config)
+
+@router.get("/variants/{filename}")
+async def get_image_variant(request: Request, filename: str, config: AppConfig = Depends(get_config)):
+    """Serve a resized variant of an uploaded image"""
+    file_path = UPLOAD_DIR / VARIANTS_DIRNAME / filename
+    
+    if filename.startswith(".") or filename.endswith(".json"):
+        raise HTTPException(status_code=404, detail="Imagem não encontrada")
+    
+    download_url = storage.download_url(variant_key(filename))
+    if download_url:
+        return RedirectResponse(download_url, headers={"Cache-Control": REDIRECT_CACHE_CONTROL})
+    
+    media_type = "image/avif" if filename.endswith(".avif") else "image/webp"
+    return await serve_upload(request, file_path, media_type, filename.split("-", 1)[0], config)
 
 @router.delete("/images/{filename}")
 async def delete_image(filename: str):
-    """Delete an uploaded image"""
-    file_path = UPLOAD_DIR / filename
-    
-    if not file_path.exists():
+    """Delete an uploaded image (the file goes once its last reference is deleted)"""
+    if filename.startswith(".") or not await storage.exists(filename):
         raise HTTPException(status_code=404, detail="Imagem não encontrada")
     
-    os.remove(file_path)
+    remaining = await release_upload(filename)
+    if remaining > 0:
+        return {"success": True, "message": "Referência removida; imagem ainda em uso", "refCount": remaining}
     
     return {"success": True, "message": "Imagem removida com sucesso"}
 
 @router.get("/list")
-async def list_images():
-    """List all uploaded images"""
-    # Get external URL
-    external_url = ''
-    frontend_env_path = Path(__file__).parent.parent.parent / "frontend" / ".env"
-    if frontend_env_path.exists():
-        with open(frontend_env_path) as f:
-            for line in f:
-                if line.startswith('REACT_APP_BACKEND_URL='):
-                    external_url = line.split('=', 1)[1].strip().strip('"\'')
-                    break
-    
-    if not external_url:
-        external_url = 'http://localhost:8001'
+async def list_images(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    sort: str = Query("createdAt", pattern="^(createdAt|size|filename)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    config: AppConfig = Depends(get_config)
+):
+    """List uploaded images, a page at a time (pass nextCursor back as cursor)"""
+    db = get_db()
+    field, types = LIST_SORT_FIELDS[sort]
+    # Files being deleted are no longer listed
+    query = {"deletingAt": {"$exists": False}}
+    records, next_cursor = await fetch_page(
+        db[UPLOADS_COLLECTION], query, field, types, sort_direction(order), cursor, limit
+    )
+    # count stays the number of listed uploads, not the page size
+    count = await db[UPLOADS_COLLECTION].count_documents(query)
     
+    external_url = config.external_url
     images = []
-    for file in UPLOAD_DIR.iterdir():
-        if file.is_file() and is_allowed_file(file.name):
-            images.append({
-                "filename": file.name,
-                "url": f"{external_url}/api/uploads/images/{file.name}",
-                "size": file.stat().st_size,
-                "createdAt": datetime.fromtimestamp(file.stat().st_ctime).isoformat()
-            })
-    
-    return {"images": images, "count": len(images)}
+    for record in records:
+        manifest = {"width": record.get("width"), "height": record.get("height"), "variants": record.get("variants")}
+        images.append({
+            "filename": record["_id"],
+            "url": f"{external_url}/api/uploads/images/{record['_id']}",
+            "size": record.get("size"),
+            "bytesSaved": record.get("bytesSaved", 0),
+            "sha256": record.get("sha256"),
+            "mimeType": record.get("mimeType"),
+            "refCount": record.get("refCount"),
+            "createdAt": record["createdAt"].isoformat() if record.get("createdAt") else None,
+            **describe_variants(manifest if record.get("variants") else None, f"{external_url}/api/uploads/variants"),
+            "width": record.get("width"),
+            "height": record.get("height"),
+            "placeholder": record.get("placeholder"),
+        })
+    
+    return {"images": images, "count": count, "nextCursor": next_cursor}
+
+@router.post("/gc")
+async def collect_unused_images(
+    dry_run: bool = False,
+    mode: str = Query("quarantine", pattern="^(quarantine|delete)$"),
+    grace_hours: float = Query(GC_GRACE.total_seconds() / 3600, ge=0),
+    retention_hours: float = Query(QUARANTINE_RETENTION.total_seconds() / 3600, ge=0),
+    current_user: dict = Depends(get_current_user)
+):
+    """Quarantine (or delete) uploads the settings and product images no longer use (admin)"""
+    return await collect_garbage(
+        get_db(), storage, discard_derived, UPLOAD_DIR, ALLOWED_EXTENSIONS,
+        grace=timedelta(hours=grace_hours), retention=timedelta(hours=retention_hours),
+        delete=mode == "delete", dry_run=dry_run
+    )
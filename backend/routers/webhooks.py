@@ -1,22 +1,21 @@
-from fastapi import APIRouter, HTTPException, Request, Header
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import APIRouter, HTTPException, Request, Header, Depends
 from datetime import datetime
 from bson import ObjectId
-import os
 import hmac
 import hashlib
 import logging
 import json
 
+from config import AppConfig, get_config
 from models import OrderStatus
+from utils.database import get_database
+from utils.tenancy import get_tenant
 
 router = APIRouter(prefix="/api/webhooks", tags=["webhooks"])
 logger = logging.getLogger(__name__)
 
 def get_db():
-    mongo_url = os.environ.get('MONGO_URL')
-    client = AsyncIOMotorClient(mongo_url)
-    return client[os.environ.get('DB_NAME')]
+    return get_database()
 
 def validate_webhook_signature(payload: str, signature: str, secret: str) -> bool:
     """Validate OrionPay webhook signature"""
@@ -37,7 +36,9 @@ def validate_webhook_signature(payload: str, signature: str, secret: str) -> boo
 @router.post("/orionpay")
 async def orionpay_webhook(
     request: Request,
-    x_webhook_signature: str = Header(None, alias="X-Webhook-Signature")
+    x_webhook_signature: str = Header(None, alias="X-Webhook-Signature"),
+    tenant: str = Depends(get_tenant),
+    config: AppConfig = Depends(get_config)
 ):
     """Handle OrionPay webhook notifications"""
     db = get_db()
@@ -49,7 +50,7 @@ async def orionpay_webhook(
         logger.info(f"Webhook received: {payload.get('event')}")
         
         # Validate signature (optional - if WEBHOOK_SECRET is set)
-        webhook_secret = os.environ.get("ORIONPAY_WEBHOOK_SECRET")
+        webhook_secret = config.orionpay_webhook_secret
         if webhook_secret and x_webhook_signature:
             if not validate_webhook_signature(body.decode(), x_webhook_signature, webhook_secret):
                 logger.warning("Invalid webhook signature")
@@ -71,7 +72,7 @@ async def orionpay_webhook(
             if not order and buyer_email:
                 # Try to find by email (most recent pending order)
                 order = await db.orders.find_one(
-                    {"email": buyer_email, "status": OrderStatus.PENDING},
+                    {"tenantId": tenant, "email": buyer_email, "status": OrderStatus.PENDING},
                     sort=[("createdAt", -1)]
                 )
             
@@ -109,7 +110,7 @@ async def test_webhook():
     return {"status": "ok", "message": "Webhook endpoint is working"}
 
 @router.post("/orionpay/simulate-payment")
-async def simulate_payment(order_id: str):
+async def simulate_payment(order_id: str, tenant: str = Depends(get_tenant)):
     """
     Simulate a successful payment webhook for testing purposes.
     This endpoint simulates what OrionPay would send when a payment is confirmed.
@@ -118,9 +119,9 @@ async def simulate_payment(order_id: str):
     
     # Find the order
     try:
-        order = await db.orders.find_one({"_id": ObjectId(order_id)})
+        order = await db.orders.find_one({"_id": ObjectId(order_id), "tenantId": tenant})
     except:
-        order = await db.orders.find_one({"orderNumber": order_id})
+        order = await db.orders.find_one({"orderNumber": order_id, "tenantId": tenant})
     
     if not order:
         raise HTTPException(status_code=404, detail="Pedido não encontrado")
@@ -0,0 +1,56 @@
+"""
+Quarantine (or delete) uploads that nothing refers to any more
+
+Marks every upload URL used by the settings and product_images documents
+(and by the remote image mirror), then moves the other uploads older than
+the grace period to quarantine. Quarantined files are deleted for good
+after a week, or restored if they are used again before that.
+
+Usage (from the backend directory):
+    python scripts/gc_uploads.py [--dry-run] [--delete] [--grace-hours N]
+"""
+import argparse
+import asyncio
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from routers.uploads import ALLOWED_EXTENSIONS, UPLOAD_DIR, discard_derived, storage
+from utils.database import close_client, get_database
+from utils.upload_gc import GC_GRACE, collect_garbage
+
+
+async def main(dry_run: bool, delete: bool, grace_hours: float) -> None:
+    db = get_database()
+    try:
+        report = await collect_garbage(
+            db, storage, discard_derived, UPLOAD_DIR, ALLOWED_EXTENSIONS,
+            grace=timedelta(hours=grace_hours), delete=delete, dry_run=dry_run
+        )
+    finally:
+        close_client()
+
+    prefix = "Would be " if dry_run else ""
+    print(f"Referenced uploads: {report['referenced']}")
+    for action in ("quarantined", "deleted", "restored", "purged", "localFiles"):
+        if report[action]:
+            print(f"{prefix}{action}: {len(report[action])}")
+            for name in report[action]:
+                print(f"  {name}")
+    print(f"{prefix}quarantined: {report['quarantinedBytes']} bytes")
+    print(f"{prefix}reclaimed: {report['reclaimedBytes']} bytes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="report without changing anything")
+    parser.add_argument("--delete", action="store_true", help="delete unused uploads instead of quarantining them")
+    parser.add_argument(
+        "--grace-hours", type=float, default=GC_GRACE.total_seconds() / 3600,
+        help="keep unused uploads touched within this many hours (default: %(default)s)"
+    )
+    args = parser.parse_args()
+
+    asyncio.run(main(args.dry_run, args.delete, args.grace_hours))
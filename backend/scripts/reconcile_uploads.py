@@ -0,0 +1,42 @@
+"""
+Sync the uploads collection with the upload storage (directory or bucket)
+
+Adds records for files that have none, drops records whose file is gone
+and corrects sizes. The server also runs this once at startup.
+
+Usage (from the backend directory):
+    python scripts/reconcile_uploads.py [--dry-run]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from routers.uploads import ALLOWED_EXTENSIONS, UPLOAD_DIR, storage
+from utils.content_store import ensure_upload_indexes, reconcile_uploads
+from utils.database import close_client, get_database
+
+
+async def main(dry_run: bool) -> None:
+    db = get_database()
+    try:
+        await ensure_upload_indexes(db)
+        report = await reconcile_uploads(db, storage, UPLOAD_DIR, ALLOWED_EXTENSIONS, dry_run=dry_run)
+    finally:
+        close_client()
+
+    prefix = "Would be " if dry_run else ""
+    for action in ("added", "removed", "updated"):
+        print(f"{prefix}{action}: {len(report[action])}")
+        for name in report[action]:
+            print(f"  {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="report changes without writing")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.dry_run))
@@ -1,29 +1,37 @@
 from fastapi import FastAPI, APIRouter
-from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+import asyncio
 import logging
-from pathlib import Path
+import signal
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List
 import uuid
 from datetime import datetime, timezone
 
-# Import routers
-from routers import settings, images, orders, payments, webhooks, auth, uploads, analytics
-
+# Load backend/.env and validate the settings before importing the routers
+# (auth reads its secret at import time); fails fast on invalid values
+from config import get_config, reload_config
+config = get_config()
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
-
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Import routers
+from routers import settings, images, orders, payments, webhooks, auth, uploads, analytics, storefront
+from utils.cache import settings_cache, images_cache
+from utils.cache_sync import cache_sync
+from utils.content_store import ensure_upload_indexes, reconcile_uploads_safely
+from utils.database import close_client, get_client, get_database
+from utils.singletons import migrate_singleton
+from utils.snapshots import snapshot_publisher
+from utils.image_variants import shutdown_executor
+from utils.tenancy import tenant_resolver, migrate_tenant_data
+from utils.serialization import FastJSONResponse
+
+
+# MongoDB connection, shared with the routers
+client = get_client()
+db = get_database()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -86,11 +94,12 @@ app.include_router(payments.router)
 app.include_router(webhooks.router)
 app.include_router(uploads.router)
 app.include_router(analytics.router)
+app.include_router(storefront.router)
 
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+    allow_origins=list(config.cors_origins),
     allow_methods=["*"],
     allow_headers=["*"],
 )
@@ -102,6 +111,65 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def migrate_singletons():
+    await migrate_singleton(db.settings)
+    await migrate_singleton(db.product_images)
+
+@app.on_event("startup")
+async def setup_tenancy():
+    await migrate_tenant_data(db)
+    tenant_resolver.start(db)
+    
+    # Settings/images kept in memory for at most this many tenants each
+    settings_cache.max_tenants = config.tenant_cache_size
+    images_cache.max_tenants = config.tenant_cache_size
+
+@app.on_event("startup")
+async def start_cache_sync():
+    cache_sync.start(db, interval=config.cache_sync_interval)
+
+@app.on_event("startup")
+async def start_snapshot_publisher():
+    snapshot_publisher.start(db)
+    # Rebuild missing or outdated snapshots without delaying startup
+    app.state.snapshot_task = asyncio.create_task(snapshot_publisher.publish_all())
+
+@app.on_event("startup")
+async def setup_uploads_index():
+    await ensure_upload_indexes(db)
+    # Index files uploaded before the uploads collection existed
+    app.state.uploads_task = asyncio.create_task(
+        reconcile_uploads_safely(db, uploads.storage, uploads.UPLOAD_DIR, uploads.ALLOWED_EXTENSIONS)
+    )
+
+@app.on_event("startup")
+async def start_remote_mirror():
+    # Copies remote product images locally and revalidates them
+    if config.image_mirror_interval:
+        images.remote_mirror.start(images.mirror_product_images, config.image_mirror_interval)
+
+@app.on_event("startup")
+async def setup_config_reload():
+    def reload():
+        try:
+            reload_config()
+        except ValueError as e:
+            logger.error(f"Configuration reload failed, keeping the current settings: {e}")
+            return
+        # Cached views can embed configuration (payment config's isConfigured)
+        settings_cache.invalidate_all()
+        images_cache.invalidate_all()
+    
+    # `kill -HUP <pid>` re-reads backend/.env and the environment
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload)
+    except (AttributeError, NotImplementedError, RuntimeError):
+        pass  # no SIGHUP on this platform / not the main thread
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    await cache_sync.stop()
+    await images.remote_mirror.stop()
+    shutdown_executor()
+    close_client()
\ No newline at end of file
@@ -0,0 +1,26 @@
+"""
+Shared fixtures
+Admin routes need a bearer token; the tests register a throwaway admin user
+"""
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+def register_admin(base_url: str) -> dict:
+    """Authorization headers of a newly registered admin user"""
+    response = requests.post(f"{base_url}/api/auth/register", json={
+        "email": f"test_admin_{uuid.uuid4().hex[:12]}@example.com",
+        "password": uuid.uuid4().hex,
+        "name": "TEST Admin"
+    })
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def admin_headers() -> dict:
+    return register_admin(BASE_URL)
@@ -4,7 +4,10 @@ Tests: Settings API, Images API, Orders API
 """
 import pytest
 import requests
+import base64
+import json
 import os
+import uuid
 
 BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
 
@@ -32,7 +35,7 @@ class TestSettingsAPI:
         assert isinstance(data["testimonials"], list)
         assert isinstance(data["productOptions"], list)
         
-    def test_update_settings_sitename(self):
+    def test_update_settings_sitename(self, admin_headers):
         """PUT /api/settings - Update site name"""
         # First get current settings
         get_response = requests.get(f"{BASE_URL}/api/settings")
@@ -41,7 +44,7 @@ class TestSettingsAPI:
         
         # Update site name
         test_name = "TEST_NeuroVita_CMS"
-        update_response = requests.put(f"{BASE_URL}/api/settings", json={
+        update_response = requests.put(f"{BASE_URL}/api/settings", headers=admin_headers, json={
             "siteName": test_name
         })
         assert update_response.status_code == 200
@@ -56,11 +59,11 @@ class TestSettingsAPI:
         assert verify_data["siteName"] == test_name
         
         # Restore original name
-        requests.put(f"{BASE_URL}/api/settings", json={
+        requests.put(f"{BASE_URL}/api/settings", headers=admin_headers, json={
             "siteName": original_name or "NeuroVita"
         })
         
-    def test_update_settings_product_name(self):
+    def test_update_settings_product_name(self, admin_headers):
         """PUT /api/settings - Update product name"""
         # Get current settings
         get_response = requests.get(f"{BASE_URL}/api/settings")
@@ -69,7 +72,7 @@ class TestSettingsAPI:
         
         # Update product name
         test_product_name = "TEST_SuperVita"
-        update_response = requests.put(f"{BASE_URL}/api/settings", json={
+        update_response = requests.put(f"{BASE_URL}/api/settings", headers=admin_headers, json={
             "productName": test_product_name
         })
         assert update_response.status_code == 200
@@ -83,11 +86,11 @@ class TestSettingsAPI:
         assert verify_data["productName"] == test_product_name
         
         # Restore original
-        requests.put(f"{BASE_URL}/api/settings", json={
+        requests.put(f"{BASE_URL}/api/settings", headers=admin_headers, json={
             "productName": original_product_name or "NeuroVita"
         })
 
-    def test_update_settings_hero_section(self):
+    def test_update_settings_hero_section(self, admin_headers):
         """PUT /api/settings - Update hero section"""
         get_response = requests.get(f"{BASE_URL}/api/settings")
         original_data = get_response.json()
@@ -100,7 +103,7 @@ class TestSettingsAPI:
             "ctaText": "TEST_CTA"
         }
         
-        update_response = requests.put(f"{BASE_URL}/api/settings", json={
+        update_response = requests.put(f"{BASE_URL}/api/settings", headers=admin_headers, json={
             "hero": test_hero
         })
         assert update_response.status_code == 200
@@ -111,11 +114,11 @@ class TestSettingsAPI:
         
         # Restore original
         if original_hero:
-            requests.put(f"{BASE_URL}/api/settings", json={
+            requests.put(f"{BASE_URL}/api/settings", headers=admin_headers, json={
                 "hero": original_hero
             })
         
-    def test_update_settings_benefits(self):
+    def test_update_settings_benefits(self, admin_headers):
         """PUT /api/settings - Update benefits array"""
         get_response = requests.get(f"{BASE_URL}/api/settings")
         original_data = get_response.json()
@@ -126,7 +129,7 @@ class TestSettingsAPI:
             {"icon": "Brain", "title": "TEST_Benefit_2", "description": "Test description 2"}
         ]
         
-        update_response = requests.put(f"{BASE_URL}/api/settings", json={
+        update_response = requests.put(f"{BASE_URL}/api/settings", headers=admin_headers, json={
             "benefits": test_benefits
         })
         assert update_response.status_code == 200
@@ -137,10 +140,63 @@ class TestSettingsAPI:
         
         # Restore original
         if original_benefits:
-            requests.put(f"{BASE_URL}/api/settings", json={
+            requests.put(f"{BASE_URL}/api/settings", headers=admin_headers, json={
                 "benefits": original_benefits
             })
 
+    def test_public_settings_hide_payment_credentials(self):
+        """GET /api/settings - Should not expose payment gateway fields"""
+        response = requests.get(f"{BASE_URL}/api/settings")
+        assert response.status_code == 200
+
+        data = response.json()
+        assert "orionpayApiKey" not in data
+        assert "orionpayWebhookSecret" not in data
+        assert "paymentTestMode" not in data
+
+    def test_admin_settings_requires_auth(self):
+        """GET /api/settings/admin - Should reject anonymous requests"""
+        response = requests.get(f"{BASE_URL}/api/settings/admin")
+        assert response.status_code == 401
+
+    def test_settings_changes_require_auth(self):
+        """PUT /api/settings and POST /api/settings/reset - Should reject anonymous requests"""
+        assert requests.put(f"{BASE_URL}/api/settings", json={}).status_code == 401
+        assert requests.post(f"{BASE_URL}/api/settings/reset").status_code == 401
+
+    def test_unknown_host_uses_default_tenant(self):
+        """GET /api/settings - Hosts without a tenant get the default settings"""
+        default = requests.get(f"{BASE_URL}/api/settings")
+        unknown = requests.get(f"{BASE_URL}/api/settings", headers={"Host": "test-unknown-tenant.example"})
+        assert unknown.status_code == 200
+        assert unknown.json()["siteName"] == default.json()["siteName"]
+
+    def test_get_settings_fields(self):
+        """GET /api/settings?fields= - Should return only the requested fields"""
+        full = requests.get(f"{BASE_URL}/api/settings").json()
+        response = requests.get(f"{BASE_URL}/api/settings", params={"fields": "faq,productName"})
+        assert response.status_code == 200
+
+        data = response.json()
+        assert set(data) == {"faq", "productName"}
+        assert data["faq"] == full["faq"]
+        assert data["productName"] == full["productName"]
+
+        # The selection has its own ETag, revalidated without a body
+        etag = response.headers["etag"]
+        assert etag != requests.get(f"{BASE_URL}/api/settings").headers["etag"]
+        cached = requests.get(
+            f"{BASE_URL}/api/settings", params={"fields": "faq,productName"}, headers={"If-None-Match": etag}
+        )
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+    def test_get_settings_unknown_field(self):
+        """GET /api/settings?fields= - Should reject fields that are not public settings"""
+        for fields in ("faq,notAField", "orionpayApiKey"):
+            response = requests.get(f"{BASE_URL}/api/settings", params={"fields": fields})
+            assert response.status_code == 400
+
 
 class TestImagesAPI:
     """Tests for /api/images endpoints"""
@@ -161,7 +217,7 @@ class TestImagesAPI:
         assert isinstance(data["main"], str)
         assert isinstance(data["secondary"], str)
         
-    def test_update_images(self):
+    def test_update_images(self, admin_headers):
         """PUT /api/images - Update product images"""
         # Get current images
         get_response = requests.get(f"{BASE_URL}/api/images")
@@ -170,7 +226,7 @@ class TestImagesAPI:
         
         # Update main image
         test_image_url = "https://example.com/test-image.jpg"
-        update_response = requests.put(f"{BASE_URL}/api/images", json={
+        update_response = requests.put(f"{BASE_URL}/api/images", headers=admin_headers, json={
             "main": test_image_url
         })
         assert update_response.status_code == 200
@@ -184,32 +240,39 @@ class TestImagesAPI:
         assert verify_data["main"] == test_image_url
         
         # Restore original
-        requests.put(f"{BASE_URL}/api/images", json={
+        requests.put(f"{BASE_URL}/api/images", headers=admin_headers, json={
             "main": original_main
         })
 
+    def test_images_changes_require_auth(self):
+        """PUT /api/images and POST /api/images/reset - Should reject anonymous requests"""
+        assert requests.put(f"{BASE_URL}/api/images", json={}).status_code == 401
+        assert requests.post(f"{BASE_URL}/api/images/reset").status_code == 401
+
 
 class TestOrdersAPI:
     """Tests for /api/orders endpoints"""
     
-    def test_list_orders(self):
-        """GET /api/orders - Should return orders list"""
-        response = requests.get(f"{BASE_URL}/api/orders")
+    def test_list_orders(self, admin_headers):
+        """GET /api/orders - Should return a page of orders"""
+        response = requests.get(f"{BASE_URL}/api/orders", headers=admin_headers)
         assert response.status_code == 200
         
         data = response.json()
-        assert isinstance(data, list)
+        assert isinstance(data["orders"], list)
+        assert data["count"] == len(data["orders"])
+        assert "nextCursor" in data
         
         # If there are orders, verify structure
-        if len(data) > 0:
-            order = data[0]
+        if len(data["orders"]) > 0:
+            order = data["orders"][0]
             assert "orderNumber" in order
             assert "name" in order
             assert "email" in order
             assert "status" in order
             assert "totalPrice" in order
             
-    def test_create_order(self):
+    def test_create_order(self, admin_headers):
         """POST /api/orders - Create a new order"""
         order_data = {
             "name": "TEST_Order_User",
@@ -242,8 +305,8 @@ class TestOrdersAPI:
         order_id = created_order["_id"]
         
         # Verify order exists in list
-        list_response = requests.get(f"{BASE_URL}/api/orders")
-        orders = list_response.json()
+        list_response = requests.get(f"{BASE_URL}/api/orders", headers=admin_headers)
+        orders = list_response.json()["orders"]
         order_ids = [o["_id"] for o in orders]
         assert order_id in order_ids
         
@@ -280,7 +343,34 @@ class TestOrdersAPI:
         assert fetched_order["_id"] == order_id
         assert fetched_order["name"] == order_data["name"]
         assert fetched_order["email"] == order_data["email"]
-        
+
+    def test_created_order_matches_stored_order(self):
+        """POST /api/orders - The response is the stored order, timestamps included"""
+        order_data = {
+            "name": "Teste Pedido",
+            "email": "teste.pedido@gmail.com",
+            "phone": "(11) 98765-4321",
+            "cep": "01310-100",
+            "address": "Avenida Teste",
+            "number": "300",
+            "complement": "",
+            "neighborhood": "Centro",
+            "city": "São Paulo",
+            "state": "SP",
+            "quantity": 1,
+            "productPrice": 0,
+            "shippingPrice": 17.00,
+            "totalPrice": 17.00
+        }
+
+        create_response = requests.post(f"{BASE_URL}/api/orders", json=order_data)
+        assert create_response.status_code == 200
+        created_order = create_response.json()
+        assert created_order["createdAt"] == created_order["updatedAt"]
+
+        fetched_order = requests.get(f"{BASE_URL}/api/orders/{created_order['_id']}").json()
+        assert fetched_order == created_order
+
     def test_update_order_status(self):
         """PATCH /api/orders/{id}/status - Update order status"""
         # First create an order
@@ -326,13 +416,79 @@ class TestOrdersAPI:
         response = requests.get(f"{BASE_URL}/api/orders/{fake_id}")
         assert response.status_code == 404
 
+    def test_list_orders_pagination_and_filters(self, admin_headers):
+        """GET /api/orders - Cursor pagination with server-side filters"""
+        utm_source = f"test-{uuid.uuid4().hex[:8]}"
+        order_data = {
+            "name": "Teste Pagina",
+            "email": "teste.pagina@gmail.com",
+            "phone": "(11) 98765-4321",
+            "cep": "01310-100",
+            "address": "Avenida Teste",
+            "number": "400",
+            "complement": "",
+            "neighborhood": "Centro",
+            "city": "Campinas",
+            "state": "SP",
+            "quantity": 1,
+            "productPrice": 0,
+            "shippingPrice": 16.00,
+            "totalPrice": 16.00,
+            "utmSource": utm_source
+        }
+        created = [requests.post(f"{BASE_URL}/api/orders", json=order_data).json()["_id"] for _ in range(3)]
+        requests.patch(f"{BASE_URL}/api/orders/{created[0]}/status", json={"status": "paid"})
+
+        # Newest first, two per page
+        first = requests.get(f"{BASE_URL}/api/orders", headers=admin_headers, params={
+            "utm_source": utm_source, "limit": 2, "include_total": "true"
+        }).json()
+        assert first["total"] == 3
+        assert first["count"] == 2
+        assert first["nextCursor"]
+
+        second = requests.get(f"{BASE_URL}/api/orders", headers=admin_headers, params={
+            "utm_source": utm_source, "limit": 2, "cursor": first["nextCursor"]
+        }).json()
+        assert second["nextCursor"] is None
+        listed = [o["_id"] for o in first["orders"] + second["orders"]]
+        assert listed == created[::-1]
+
+        paid = requests.get(f"{BASE_URL}/api/orders", headers=admin_headers, params={
+            "utm_source": utm_source, "status": "paid", "city": "Campinas", "state": "SP"
+        }).json()
+        assert [o["_id"] for o in paid["orders"]] == [created[0]]
+
+        invalid = requests.get(f"{BASE_URL}/api/orders", headers=admin_headers, params={"cursor": "invalid"})
+        assert invalid.status_code == 400
+
+        # Cursor values must be sort keys, not query operators
+        injected = base64.urlsafe_b64encode(json.dumps([{"$ne": None}, {"$ne": None}]).encode()).decode()
+        response = requests.get(f"{BASE_URL}/api/orders", headers=admin_headers, params={"cursor": injected})
+        assert response.status_code == 400
+
+    def test_orders_listing_requires_auth(self):
+        """GET /api/orders and GET /api/orders/summary - Should reject anonymous requests"""
+        assert requests.get(f"{BASE_URL}/api/orders").status_code == 401
+        assert requests.get(f"{BASE_URL}/api/orders/summary").status_code == 401
+
+    def test_order_summary(self, admin_headers):
+        """GET /api/orders/summary - Counts per status and paid revenue"""
+        response = requests.get(f"{BASE_URL}/api/orders/summary", headers=admin_headers)
+        assert response.status_code == 200
+
+        data = response.json()
+        assert set(data["byStatus"]) == {"pending", "paid", "shipped", "delivered"}
+        assert data["total"] == sum(data["byStatus"].values())
+        assert data["paidTotal"] >= 0
+
 
 class TestResetEndpoints:
     """Tests for reset endpoints (settings and images)"""
     
-    def test_reset_settings(self):
+    def test_reset_settings(self, admin_headers):
         """POST /api/settings/reset - Reset settings to default"""
-        response = requests.post(f"{BASE_URL}/api/settings/reset")
+        response = requests.post(f"{BASE_URL}/api/settings/reset", headers=admin_headers)
         assert response.status_code == 200
         
         data = response.json()
@@ -341,9 +497,9 @@ class TestResetEndpoints:
         assert data["productName"] == "NeuroVita"
         assert len(data["benefits"]) == 4  # Default has 4 benefits
         
-    def test_reset_images(self):
+    def test_reset_images(self, admin_headers):
         """POST /api/images/reset - Reset images to default"""
-        response = requests.post(f"{BASE_URL}/api/images/reset")
+        response = requests.post(f"{BASE_URL}/api/images/reset", headers=admin_headers)
         assert response.status_code == 200
         
         data = response.json()
@@ -352,5 +508,72 @@ class TestResetEndpoints:
         assert data["main"] != ""
 
 
+class TestConditionalRequests:
+    """Tests for ETag revalidation of the cached GET endpoints"""
+
+    def assert_revalidates(self, path):
+        """GET path sends an ETag, and the same ETag in If-None-Match gets an empty 304"""
+        response = requests.get(f"{BASE_URL}{path}")
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+
+        cached = requests.get(f"{BASE_URL}{path}", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        return etag
+
+    def assert_put_changes_etag(self, path, put_path, headers, change, restore):
+        """A PUT that changes the document changes the ETag, and the old one no longer matches"""
+        etag = self.assert_revalidates(path)
+        try:
+            assert requests.put(f"{BASE_URL}{put_path}", headers=headers, json=change).status_code == 200
+            response = requests.get(f"{BASE_URL}{path}", headers={"If-None-Match": etag})
+            assert response.status_code == 200
+            assert response.headers["etag"] != etag
+        finally:
+            requests.put(f"{BASE_URL}{put_path}", headers=headers, json=restore)
+
+    def test_settings_etag(self, admin_headers):
+        """GET /api/settings - Revalidates, and PUT /api/settings changes the ETag"""
+        original = requests.get(f"{BASE_URL}/api/settings").json()["siteName"]
+        self.assert_put_changes_etag(
+            "/api/settings", "/api/settings", admin_headers,
+            {"siteName": f"TEST_Site_{uuid.uuid4().hex[:8]}"}, {"siteName": original},
+        )
+
+    def test_images_etag(self, admin_headers):
+        """GET /api/images - Revalidates, and PUT /api/images changes the ETag"""
+        original = requests.get(f"{BASE_URL}/api/images").json()["main"]
+        self.assert_put_changes_etag(
+            "/api/images", "/api/images", admin_headers,
+            {"main": f"https://example.com/{uuid.uuid4().hex[:8]}.jpg"}, {"main": original},
+        )
+
+    def test_payment_config_etag(self, admin_headers):
+        """GET /api/payments/config - Revalidates, and a settings PUT changes the ETag"""
+        original = requests.get(f"{BASE_URL}/api/payments/config").json()["pixExpirationMinutes"]
+        self.assert_put_changes_etag(
+            "/api/payments/config", "/api/settings", admin_headers,
+            {"pixExpirationMinutes": original + 1}, {"pixExpirationMinutes": original},
+        )
+
+
+class TestStorefrontAPI:
+    """Tests for /api/storefront endpoints"""
+
+    def test_index_inlines_bootstrap_payload(self):
+        """GET /api/storefront/index.html - Should inline settings and images"""
+        response = requests.get(f"{BASE_URL}/api/storefront/index.html")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/html")
+        assert 'id="storefront-bootstrap"' in response.text
+        assert "orionpayApiKey" not in response.text
+
+        # Unchanged page is revalidated without a body
+        etag = response.headers["etag"]
+        cached = requests.get(f"{BASE_URL}/api/storefront/index.html", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
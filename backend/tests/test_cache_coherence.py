@@ -0,0 +1,149 @@
+"""
+Cross-process cache coherence tests
+Runs two backend instances against the same local mongod and checks that a
+save on one instance is visible on the other within the sync interval
+"""
+import pytest
+import requests
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+from conftest import register_admin
+
+BACKEND_DIR = Path(__file__).parent.parent
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+DB_NAME = os.environ.get('COHERENCE_DB_NAME', 'neurovita_coherence_test')
+SYNC_INTERVAL = 0.5
+
+
+def mongo_available() -> bool:
+    try:
+        from pymongo import MongoClient
+        MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000).admin.command('ping')
+        return True
+    except Exception:
+        return False
+
+
+pytestmark = pytest.mark.skipif(not mongo_available(), reason="mongod not reachable at MONGO_URL")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(base_url: str, timeout: float = 20.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/api/health", timeout=1).status_code == 200:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Backend at {base_url} did not start")
+
+
+@pytest.fixture(scope="module")
+def instances():
+    """Start two independent backend processes sharing one database"""
+    from pymongo import MongoClient
+    MongoClient(MONGO_URL).drop_database(DB_NAME)
+
+    # Shared JWT key, so a token issued by one instance is accepted by the other
+    env = dict(
+        os.environ, MONGO_URL=MONGO_URL, DB_NAME=DB_NAME, CACHE_SYNC_INTERVAL=str(SYNC_INTERVAL),
+        JWT_SECRET_KEY=uuid.uuid4().hex,
+    )
+    processes, urls = [], []
+    for _ in range(2):
+        port = free_port()
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port)],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ))
+        urls.append(f"http://127.0.0.1:{port}")
+
+    try:
+        for url in urls:
+            wait_until_up(url)
+        yield urls
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=10)
+        MongoClient(MONGO_URL).drop_database(DB_NAME)
+
+
+@pytest.fixture(scope="module")
+def admin_headers(instances):
+    """Token of an admin user registered on the test instances"""
+    return register_admin(instances[0])
+
+
+def wait_for(fetch, expected, timeout: float):
+    """Poll fetch() until it returns expected; return the elapsed time"""
+    start = time.time()
+    while time.time() - start < timeout:
+        if fetch() == expected:
+            return time.time() - start
+        time.sleep(0.05)
+    pytest.fail(f"Value did not converge to {expected!r} within {timeout}s")
+
+
+class TestCacheCoherence:
+    """Saves on one instance invalidate the cache on the other"""
+
+    def test_settings_update_propagates(self, instances, admin_headers):
+        """PUT /api/settings on A is served by GET /api/settings on B"""
+        a, b = instances
+
+        # Warm both caches
+        assert requests.get(f"{a}/api/settings").status_code == 200
+        assert requests.get(f"{b}/api/settings").status_code == 200
+
+        response = requests.put(f"{a}/api/settings", headers=admin_headers, json={"siteName": "TEST_Coherence_A"})
+        assert response.status_code == 200
+
+        elapsed = wait_for(
+            lambda: requests.get(f"{b}/api/settings").json()["siteName"],
+            "TEST_Coherence_A",
+            timeout=SYNC_INTERVAL * 4 + 2,
+        )
+        print(f"Settings converged on second instance after {elapsed:.2f}s")
+
+    def test_images_update_propagates(self, instances, admin_headers):
+        """PUT /api/images on B is served by GET /api/images on A"""
+        a, b = instances
+
+        assert requests.get(f"{a}/api/images").status_code == 200
+
+        response = requests.put(f"{b}/api/images", headers=admin_headers, json={"logo": "https://example.com/TEST_logo.png"})
+        assert response.status_code == 200
+
+        elapsed = wait_for(
+            lambda: requests.get(f"{a}/api/images").json()["logo"],
+            "https://example.com/TEST_logo.png",
+            timeout=SYNC_INTERVAL * 4 + 2,
+        )
+        print(f"Images converged on first instance after {elapsed:.2f}s")
+
+    def test_reset_propagates(self, instances, admin_headers):
+        """POST /api/settings/reset on B is served by GET /api/settings on A"""
+        a, b = instances
+
+        requests.put(f"{a}/api/settings", headers=admin_headers, json={"siteName": "TEST_Before_Reset"})
+        assert requests.post(f"{b}/api/settings/reset", headers=admin_headers).status_code == 200
+
+        wait_for(
+            lambda: requests.get(f"{a}/api/settings").json()["siteName"],
+            "NeuroVita",
+            timeout=SYNC_INTERVAL * 4 + 2,
+        )
@@ -0,0 +1,109 @@
+"""
+Remote image mirror tests
+A stand-in origin server on this machine serves a product image with an
+ETag; the backend must be able to reach it, so these tests only run when
+the backend under test is local too (REACT_APP_BACKEND_URL on localhost).
+The backend refuses loopback image URLs unless it runs with
+REMOTE_FETCH_ALLOW_PRIVATE=true; set the same variable for the tests.
+"""
+import pytest
+import requests
+import hashlib
+import io
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+from PIL import Image
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+ALLOW_PRIVATE = os.environ.get('REMOTE_FETCH_ALLOW_PRIVATE', '').lower() in ("1", "true", "yes")
+
+pytestmark = pytest.mark.skipif(
+    urlparse(BASE_URL).hostname not in ("localhost", "127.0.0.1"),
+    reason="the backend must run locally to reach the stand-in origin"
+)
+
+
+def random_png() -> bytes:
+    buffer = io.BytesIO()
+    Image.frombytes("RGB", (8, 6), os.urandom(144)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def origin():
+    """Image server answering If-None-Match with 304; records each request's If-None-Match"""
+    state = {"body": random_png(), "requests": []}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            etag = f'"{hashlib.md5(state["body"]).hexdigest()}"'
+            state["requests"].append(self.headers.get("If-None-Match"))
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(state["body"])))
+            self.end_headers()
+            self.wfile.write(state["body"])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{server.server_address[1]}/product.png?w=1200&q=80"
+    yield state
+    server.shutdown()
+
+
+def wait_for(predicate, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        value = predicate()
+        if value:
+            return value
+        time.sleep(0.2)
+    return None
+
+
+class TestImageMirror:
+    """Remote product images are copied locally and the API points at the copy"""
+
+    @pytest.mark.skipif(not ALLOW_PRIVATE, reason="REMOTE_FETCH_ALLOW_PRIVATE is not set")
+    def test_remote_image_is_mirrored(self, origin, admin_headers):
+        original_main = requests.get(f"{BASE_URL}/api/images").json()["main"]
+        requests.put(f"{BASE_URL}/api/images", headers=admin_headers, json={"main": origin["url"]})
+
+        def mirrored():
+            images = requests.get(f"{BASE_URL}/api/images").json()
+            return images if "/api/uploads/images/" in images["main"] else None
+
+        images = wait_for(mirrored)
+        assert images is not None
+        assert images["sources"]["main"] == origin["url"]
+        assert requests.get(images["main"]).content[:8] == b"\x89PNG\r\n\x1a\n"
+        # Downloaded once; later checks are conditional requests
+        assert origin["requests"][0] is None
+        assert all(origin["requests"][1:])
+
+        requests.put(f"{BASE_URL}/api/images", headers=admin_headers, json={"main": original_main})
+
+    @pytest.mark.skipif(ALLOW_PRIVATE, reason="REMOTE_FETCH_ALLOW_PRIVATE is set")
+    def test_loopback_image_is_not_fetched(self, origin, admin_headers):
+        original_main = requests.get(f"{BASE_URL}/api/images").json()["main"]
+        response = requests.put(f"{BASE_URL}/api/images", headers=admin_headers, json={"main": origin["url"]})
+        assert response.status_code == 200
+
+        # Neither the mirror nor the placeholder job may call the origin
+        time.sleep(2)
+        assert origin["requests"] == []
+        assert requests.get(f"{BASE_URL}/api/images").json()["main"] == origin["url"]
+
+        requests.put(f"{BASE_URL}/api/images", headers=admin_headers, json={"main": original_main})
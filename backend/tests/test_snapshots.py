@@ -0,0 +1,79 @@
+"""
+Static snapshot publishing tests
+Runs the SnapshotPublisher in-process against a temporary SNAPSHOT_DIR,
+with in-memory documents standing in for the settings and images collections
+"""
+import pytest
+import asyncio
+import json
+import os
+import time
+
+from utils import snapshots
+from utils.serialization import dumps
+from utils.snapshots import MANIFEST_NAME, SNAPSHOT_RETENTION, SnapshotPublisher
+
+TENANT = "default"
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    """Temporary SNAPSHOT_DIR for the publisher"""
+    monkeypatch.setattr(snapshots, "get_snapshot_dir", lambda: tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def documents():
+    return {"settings": {"siteName": "NeuroVita", "faq": []}, "images": {"main": "/a.jpg"}}
+
+
+@pytest.fixture
+def publisher(documents):
+    """Publisher with one source per document, like the settings and images routers register"""
+    publisher = SnapshotPublisher()
+    for kind in documents:
+        async def load(tenant, kind=kind):
+            return documents[kind]
+        publisher.add_source(load, lambda doc, kind=kind: {kind: dumps(doc)})
+    return publisher
+
+
+def read_manifest(root):
+    return json.loads((root / "tenants" / TENANT / MANIFEST_NAME).read_bytes())
+
+
+class TestSnapshotPublisher:
+    """A save publishes new hashed content files and points the tenant's manifest at them"""
+
+    def test_save_writes_new_snapshot(self, snapshot_dir, documents, publisher):
+        first = asyncio.run(publisher.publish(TENANT))
+        assert read_manifest(snapshot_dir) == first
+        tenant_dir = snapshot_dir / "tenants" / TENANT
+        assert json.loads((tenant_dir / first["settings"]).read_bytes()) == documents["settings"]
+
+        # A settings save: new settings file, images file unchanged
+        documents["settings"] = {**documents["settings"], "siteName": "TEST Site"}
+        second = asyncio.run(publisher.publish(TENANT))
+        assert read_manifest(snapshot_dir) == second
+        assert second["settings"] != first["settings"]
+        assert second["images"] == first["images"]
+        assert json.loads((tenant_dir / second["settings"]).read_bytes())["siteName"] == "TEST Site"
+
+        # Clients holding the previous manifest can still fetch its files
+        assert (tenant_dir / first["settings"]).exists()
+
+    def test_superseded_files_expire(self, snapshot_dir, documents, publisher):
+        first = asyncio.run(publisher.publish(TENANT))
+        old = snapshot_dir / "tenants" / TENANT / first["images"]
+        expired = time.time() - SNAPSHOT_RETENTION - 1
+        os.utime(old, (expired, expired))
+
+        documents["images"] = {"main": "/b.jpg"}
+        second = asyncio.run(publisher.publish(TENANT))
+        assert not old.exists()
+        assert (snapshot_dir / "tenants" / TENANT / second["images"]).exists()
+
+    def test_disabled_without_snapshot_dir(self, monkeypatch, publisher):
+        monkeypatch.setattr(snapshots, "get_snapshot_dir", lambda: None)
+        assert asyncio.run(publisher.publish(TENANT)) is None
@@ -4,13 +4,23 @@ Tests: Webhook endpoints, Payment simulation, Image upload API
 """
 import pytest
 import requests
+import io
 import os
 import tempfile
+import time
 from datetime import datetime
+from PIL import Image, PngImagePlugin
 
 BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
 
 
+def unique_png() -> bytes:
+    """Small PNG with random pixels, so its content hash is not shared"""
+    buffer = io.BytesIO()
+    Image.frombytes("RGB", (4, 4), os.urandom(48)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
 class TestWebhookEndpoints:
     """Tests for P1: Webhook/Payment simulation endpoints"""
     
@@ -206,6 +216,31 @@ class TestImageUploadEndpoints:
         assert isinstance(data["count"], int)
         print(f"Images list: {data['count']} images found")
     
+    def test_list_uploaded_images_paginates(self):
+        """GET /api/uploads/list?limit=&cursor= - Pages do not overlap"""
+        uploaded = [
+            requests.post(f"{BASE_URL}/api/uploads/image", files={'file': ('page.png', unique_png(), 'image/png')}).json()
+            for _ in range(3)
+        ]
+        
+        first = requests.get(f"{BASE_URL}/api/uploads/list", params={"limit": 2}).json()
+        assert len(first["images"]) == 2
+        assert first["count"] >= len(uploaded)
+        assert first["nextCursor"]
+        
+        second = requests.get(f"{BASE_URL}/api/uploads/list", params={"limit": 2, "cursor": first["nextCursor"]}).json()
+        first_names = {image["filename"] for image in first["images"]}
+        assert first_names.isdisjoint(image["filename"] for image in second["images"])
+        
+        # Newest first: the last upload leads the first page
+        assert first["images"][0]["filename"] == uploaded[-1]["filename"]
+        
+        response = requests.get(f"{BASE_URL}/api/uploads/list", params={"cursor": "invalid"})
+        assert response.status_code == 400
+        
+        for image in uploaded:
+            requests.delete(f"{BASE_URL}/api/uploads/images/{image['filename']}")
+    
     def test_upload_png_image(self):
         """POST /api/uploads/image - Upload a PNG image"""
         # Create a minimal valid PNG file
@@ -310,6 +345,166 @@ class TestImageUploadEndpoints:
         assert "detail" in data
         print(f"Invalid file type correctly rejected: {data['detail']}")
     
+    def test_upload_returns_variant_manifest(self):
+        """POST /api/uploads/image - Response lists resized variants and srcsets"""
+        png_data = bytes([
+            0x89, 0x50, 0x4E, 0x47, 0x0D, 0x0A, 0x1A, 0x0A,
+            0x00, 0x00, 0x00, 0x0D, 0x49, 0x48, 0x44, 0x52,
+            0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x01,
+            0x08, 0x02, 0x00, 0x00, 0x00, 0x90, 0x77, 0x53,
+            0xDE, 0x00, 0x00, 0x00, 0x0C, 0x49, 0x44, 0x41,
+            0x54, 0x08, 0xD7, 0x63, 0xF8, 0x00, 0x00, 0x00,
+            0x02, 0x00, 0x01, 0x00, 0x01, 0xEB, 0x67, 0xD0,
+            0x00, 0x00, 0x00, 0x00, 0x49, 0x45, 0x4E, 0x44,
+            0xAE, 0x42, 0x60, 0x82
+        ])
+        
+        files = {'file': ('variants_test.png', png_data, 'image/png')}
+        response = requests.post(f"{BASE_URL}/api/uploads/image", files=files)
+        assert response.status_code == 200
+        
+        data = response.json()
+        assert isinstance(data["variants"], list)
+        assert isinstance(data["srcset"], dict)
+        for variant in data["variants"]:
+            variant_response = requests.get(variant["url"])
+            assert variant_response.status_code == 200
+        
+        requests.delete(f"{BASE_URL}/api/uploads/images/{data['filename']}")
+    
+    def test_get_transformed_image(self):
+        """GET /api/uploads/images/{filename}?w=&fmt= - Resize and re-encode on request"""
+        png_data = bytes([
+            0x89, 0x50, 0x4E, 0x47, 0x0D, 0x0A, 0x1A, 0x0A,
+            0x00, 0x00, 0x00, 0x0D, 0x49, 0x48, 0x44, 0x52,
+            0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x01,
+            0x08, 0x02, 0x00, 0x00, 0x00, 0x90, 0x77, 0x53,
+            0xDE, 0x00, 0x00, 0x00, 0x0C, 0x49, 0x44, 0x41,
+            0x54, 0x08, 0xD7, 0x63, 0xF8, 0x00, 0x00, 0x00,
+            0x02, 0x00, 0x01, 0x00, 0x01, 0xEB, 0x67, 0xD0,
+            0x00, 0x00, 0x00, 0x00, 0x49, 0x45, 0x4E, 0x44,
+            0xAE, 0x42, 0x60, 0x82
+        ])
+        
+        files = {'file': ('transform_test.png', png_data, 'image/png')}
+        filename = requests.post(f"{BASE_URL}/api/uploads/image", files=files).json()["filename"]
+        
+        response = requests.get(f"{BASE_URL}/api/uploads/images/{filename}", params={"w": 64, "fmt": "jpeg"})
+        assert response.status_code == 200
+        assert response.headers.get("content-type") == "image/jpeg"
+        
+        # Sizes outside the allow-list are rejected
+        response = requests.get(f"{BASE_URL}/api/uploads/images/{filename}", params={"w": 65})
+        assert response.status_code == 400
+        
+        requests.delete(f"{BASE_URL}/api/uploads/images/{filename}")
+    
+    def test_upload_rejects_non_image_content(self):
+        """POST /api/uploads/image - Should reject files whose bytes are not an image"""
+        files = {'file': ('fake.png', b"<html>not an image</html>", 'image/png')}
+        response = requests.post(f"{BASE_URL}/api/uploads/image", files=files)
+        
+        assert response.status_code == 400
+        print(f"Non-image content correctly rejected: {response.json()['detail']}")
+    
+    def test_upload_too_large(self):
+        """POST /api/uploads/image - Should reject files over the 5MB limit"""
+        png_header = bytes([0x89, 0x50, 0x4E, 0x47, 0x0D, 0x0A, 0x1A, 0x0A])
+        files = {'file': ('huge.png', png_header + b"\0" * (6 * 1024 * 1024), 'image/png')}
+        response = requests.post(f"{BASE_URL}/api/uploads/image", files=files)
+        
+        assert response.status_code == 413
+        print(f"Oversized upload correctly rejected: {response.json()['detail']}")
+    
+    def test_identical_uploads_share_one_file(self):
+        """POST /api/uploads/image - Same content is stored once and reference counted"""
+        png_data = unique_png()
+        
+        first = requests.post(f"{BASE_URL}/api/uploads/image", files={'file': ('a.png', png_data, 'image/png')}).json()
+        second = requests.post(f"{BASE_URL}/api/uploads/image", files={'file': ('b.png', png_data, 'image/png')}).json()
+        assert first["filename"] == second["filename"] == f"{first['sha256']}.png"
+        assert second["deduplicated"] == True
+        
+        image_url = f"{BASE_URL}/api/uploads/images/{first['filename']}"
+        assert "immutable" in requests.get(image_url).headers.get("cache-control", "")
+        
+        # The file stays until its last reference is deleted
+        requests.delete(image_url)
+        assert requests.get(image_url).status_code == 200
+        requests.delete(image_url)
+        assert requests.get(image_url).status_code == 404
+    
+    def test_upload_strips_metadata(self):
+        """POST /api/uploads/image - Metadata is stripped and the savings reported"""
+        meta = PngImagePlugin.PngInfo()
+        meta.add_text("Comment", "x" * 4096)
+        buffer = io.BytesIO()
+        Image.frombytes("RGB", (4, 4), os.urandom(48)).save(buffer, "PNG", pnginfo=meta)
+        png_data = buffer.getvalue()
+        
+        data = requests.post(f"{BASE_URL}/api/uploads/image", files={'file': ('meta.png', png_data, 'image/png')}).json()
+        assert data["originalSize"] == len(png_data)
+        assert data["bytesSaved"] > 4096
+        assert data["size"] == data["originalSize"] - data["bytesSaved"]
+        
+        image_url = f"{BASE_URL}/api/uploads/images/{data['filename']}"
+        stored = Image.open(io.BytesIO(requests.get(image_url).content))
+        assert "Comment" not in stored.info
+        
+        requests.delete(image_url)
+    
+    def test_upload_placeholder(self, admin_headers):
+        """POST /api/uploads/image and PUT /api/images - Placeholders with intrinsic size"""
+        upload = requests.post(
+            f"{BASE_URL}/api/uploads/image", files={'file': ('lqip.png', unique_png(), 'image/png')}
+        ).json()
+        assert upload["placeholder"].startswith("data:image/")
+        assert (upload["width"], upload["height"]) == (4, 4)
+        
+        original_main = requests.get(f"{BASE_URL}/api/images").json()["main"]
+        requests.put(f"{BASE_URL}/api/images", headers=admin_headers, json={"main": upload["url"]})
+        
+        # Computed in the background after the update
+        placeholder = {}
+        for _ in range(50):
+            placeholder = requests.get(f"{BASE_URL}/api/images").json().get("placeholders", {}).get("main") or {}
+            if placeholder.get("url") == upload["url"]:
+                break
+            time.sleep(0.1)
+        assert placeholder.get("src") == upload["placeholder"]
+        assert (placeholder["width"], placeholder["height"]) == (4, 4)
+        
+        requests.put(f"{BASE_URL}/api/images", headers=admin_headers, json={"main": original_main})
+        requests.delete(upload["url"])
+
+    def test_batch_upload(self):
+        """POST /api/uploads/images - Several files in one request, one result per file"""
+        png_data = unique_png()
+        files = [
+            ('files', ('one.png', unique_png(), 'image/png')),
+            ('files', ('notes.txt', b'hello', 'text/plain')),
+            ('files', ('two.png', png_data, 'image/png')),
+            ('files', ('copy.png', png_data, 'image/png')),
+        ]
+        response = requests.post(f"{BASE_URL}/api/uploads/images", files=files)
+        assert response.status_code == 200
+
+        data = response.json()
+        assert (data["success"], data["uploaded"], data["failed"]) == (False, 3, 1)
+        assert [item["name"] for item in data["files"]] == ['one.png', 'notes.txt', 'two.png', 'copy.png']
+
+        one, rejected, two, copy = data["files"]
+        assert rejected["success"] == False
+        assert rejected["status"] == 400
+        assert one["success"] and one["mimeType"] == "image/png"
+        # Identical files in one batch share one file
+        assert copy["filename"] == two["filename"]
+        assert copy["deduplicated"] == True
+
+        for item in (one, two, copy):
+            requests.delete(item["url"])
+        assert requests.get(two["url"]).status_code == 404
+
     def test_get_uploaded_image(self):
         """GET /api/uploads/images/{filename} - Retrieve an uploaded image"""
         # First upload an image
@@ -336,6 +531,26 @@ class TestImageUploadEndpoints:
         assert len(get_response.content) > 0
         print(f"Image retrieval successful: {filename}")
     
+    def test_get_image_conditional_and_range(self):
+        """GET /api/uploads/images/{filename} - ETag revalidation (304) and byte ranges"""
+        png_data = unique_png()
+        filename = requests.post(
+            f"{BASE_URL}/api/uploads/image", files={'file': ('range.png', png_data, 'image/png')}
+        ).json()["filename"]
+        image_url = f"{BASE_URL}/api/uploads/images/{filename}"
+        
+        etag = requests.get(image_url).headers["etag"]
+        assert filename.split(".")[0] in etag
+        
+        response = requests.get(image_url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        
+        response = requests.get(image_url, headers={"Range": "bytes=0-7"})
+        assert response.status_code == 206
+        assert response.content == png_data[:8]
+        
+        requests.delete(image_url)
+    
     def test_get_nonexistent_image(self):
         """GET /api/uploads/images/{filename} - Should return 404 for non-existent image"""
         response = requests.get(f"{BASE_URL}/api/uploads/images/nonexistent_file.png")
@@ -344,18 +559,8 @@ class TestImageUploadEndpoints:
     
     def test_delete_uploaded_image(self):
         """DELETE /api/uploads/images/{filename} - Delete an uploaded image"""
-        # First upload an image
-        png_data = bytes([
-            0x89, 0x50, 0x4E, 0x47, 0x0D, 0x0A, 0x1A, 0x0A,
-            0x00, 0x00, 0x00, 0x0D, 0x49, 0x48, 0x44, 0x52,
-            0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x01,
-            0x08, 0x02, 0x00, 0x00, 0x00, 0x90, 0x77, 0x53,
-            0xDE, 0x00, 0x00, 0x00, 0x0C, 0x49, 0x44, 0x41,
-            0x54, 0x08, 0xD7, 0x63, 0xF8, 0x00, 0x00, 0x00,
-            0x02, 0x00, 0x01, 0x00, 0x01, 0xEB, 0x67, 0xD0,
-            0x00, 0x00, 0x00, 0x00, 0x49, 0x45, 0x4E, 0x44,
-            0xAE, 0x42, 0x60, 0x82
-        ])
+        # First upload an image (unique, so no other test holds a reference)
+        png_data = unique_png()
         
         files = {'file': ('delete_test.png', png_data, 'image/png')}
         upload_response = requests.post(f"{BASE_URL}/api/uploads/image", files=files)
@@ -374,11 +579,82 @@ class TestImageUploadEndpoints:
         assert get_response.status_code == 404
         print("Verified image no longer exists after deletion")
 
+    def test_upload_gc_requires_auth(self):
+        """POST /api/uploads/gc - Should reject anonymous requests"""
+        response = requests.post(f"{BASE_URL}/api/uploads/gc", params={"dry_run": "true"})
+        assert response.status_code == 401
+
+
+class TestUploadGarbageCollection:
+    """POST /api/uploads/gc - Mark and sweep of unused uploads"""
+
+    def run_gc(self, headers, **params):
+        response = requests.post(f"{BASE_URL}/api/uploads/gc", headers=headers, params=params)
+        assert response.status_code == 200
+        return response.json()
+
+    def upload(self) -> dict:
+        response = requests.post(
+            f"{BASE_URL}/api/uploads/image", files={'file': ('gc.png', unique_png(), 'image/png')}
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    def test_unused_upload_is_quarantined_then_purged(self, admin_headers):
+        """Uploads the images use are kept; unused ones go to quarantine, then for good"""
+        used, unused = self.upload(), self.upload()
+        original_logo = requests.get(f"{BASE_URL}/api/images").json()["logo"]
+        requests.put(f"{BASE_URL}/api/images", headers=admin_headers, json={"logo": used["url"]})
+        try:
+            report = self.run_gc(admin_headers, dry_run="true", grace_hours=0)
+            assert report["dryRun"] is True
+            assert unused["filename"] in report["quarantined"]
+            assert used["filename"] not in report["quarantined"]
+            assert requests.get(unused["url"]).status_code == 200
+
+            report = self.run_gc(admin_headers, grace_hours=0)
+            assert unused["filename"] in report["quarantined"]
+            assert used["filename"] not in report["quarantined"]
+            assert requests.get(unused["url"]).status_code == 404
+            assert requests.get(used["url"]).status_code == 200
+
+            report = self.run_gc(admin_headers, retention_hours=0)
+            assert unused["filename"] in report["purged"]
+            assert unused["filename"] not in report["restored"]
+        finally:
+            requests.put(f"{BASE_URL}/api/images", headers=admin_headers, json={"logo": original_logo})
+
+    def test_recent_upload_is_kept(self, admin_headers):
+        """Unused uploads within the grace period are not swept"""
+        recent = self.upload()
+        report = self.run_gc(admin_headers, dry_run="true")
+        assert recent["filename"] not in report["quarantined"]
+
+        requests.delete(recent["url"])
+
+    def test_quarantined_upload_is_restored_when_used(self, admin_headers):
+        """A quarantined upload that is referenced again comes back"""
+        upload = self.upload()
+        report = self.run_gc(admin_headers, grace_hours=0)
+        assert upload["filename"] in report["quarantined"]
+        assert requests.get(upload["url"]).status_code == 404
+
+        original_logo = requests.get(f"{BASE_URL}/api/images").json()["logo"]
+        requests.put(f"{BASE_URL}/api/images", headers=admin_headers, json={"logo": upload["url"]})
+        try:
+            report = self.run_gc(admin_headers)
+            assert upload["filename"] in report["restored"]
+            response = requests.get(upload["url"])
+            assert response.status_code == 200
+            assert response.content[:8] == b"\x89PNG\r\n\x1a\n"
+        finally:
+            requests.put(f"{BASE_URL}/api/images", headers=admin_headers, json={"logo": original_logo})
+
 
 class TestPaymentIntegrationFlow:
     """End-to-end test for the payment simulation flow"""
     
-    def test_complete_payment_flow(self):
+    def test_complete_payment_flow(self, admin_headers):
         """Full flow: Create order -> Verify pending -> Simulate payment -> Verify paid"""
         # Step 1: Create order
         order_data = {
@@ -433,7 +709,7 @@ class TestPaymentIntegrationFlow:
         print(f"Step 4: Order status changed to paid: {order_after['status']}")
         
         # Step 5: Verify in orders list
-        list_response = requests.get(f"{BASE_URL}/api/orders")
+        list_response = requests.get(f"{BASE_URL}/api/orders", headers=admin_headers)
         orders = list_response.json()
         
         matching_order = next((o for o in orders if o["_id"] == order_id), None)
@@ -0,0 +1,228 @@
+"""
+In-process cache for singleton documents (site settings, product images)
+Serves hot landing-page reads without touching MongoDB
+"""
+import asyncio
+import hashlib
+import itertools
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from models import public_settings
+from utils.serialization import dumps as encode_json
+
+# Versions are unique across all caches, so a cache that is evicted and
+# recreated never hands out a version it used before
+_versions = itertools.count(1)
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the encoded body"""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+class EncodedBody:
+    """JSON content serialized once, together with its ETag"""
+    __slots__ = ("content", "body", "etag")
+
+    def __init__(self, content: Any):
+        self.content = content
+        self.body = encode_json(content)
+        self.etag = make_etag(self.body)
+
+
+class SectionedBody(EncodedBody):
+    """
+    JSON object encoded once per top-level key.
+
+    Any subset of the keys can be served by joining the pre-encoded
+    sections, without running the encoder again.
+    """
+    __slots__ = ("sections",)
+
+    def __init__(self, content: Dict[str, Any]):
+        self.content = content
+        self.sections = {
+            key: encode_json(key) + b":" + encode_json(value)
+            for key, value in content.items()
+        }
+        self.body = b"{" + b",".join(self.sections.values()) + b"}"
+        self.etag = make_etag(self.body)
+
+    def select(self, keys: Iterable[str]) -> bytes:
+        """Encoded JSON object holding only the given keys"""
+        return b"{" + b",".join(self.sections[key] for key in keys if key in self.sections) + b"}"
+
+
+class CacheEntry:
+    """
+    Immutable snapshot of a cached document.
+
+    The document is encoded and hashed once when the entry is created (on
+    write or on the first load), so requests never re-serialize it. The
+    document is shared between requests and must be treated as read-only.
+    """
+    __slots__ = ("doc", "version", "encoded", "_views")
+
+    def __init__(self, doc: Dict[str, Any], version: int):
+        self.doc = doc
+        self.version = version
+        self.encoded = EncodedBody(doc)
+        self._views: Dict[str, EncodedBody] = {}
+
+    @property
+    def body(self) -> bytes:
+        return self.encoded.body
+
+    @property
+    def etag(self) -> str:
+        return self.encoded.etag
+
+    def view(self, name: str, build: Optional[Callable[[Dict[str, Any]], Any]] = None) -> EncodedBody:
+        """
+        Return a derived representation of the document, built once per entry.
+
+        Args:
+            name: Unique name of the view
+            build: Function mapping the document to the view content (or to
+                an already encoded body); may be omitted for views the cache
+                builds eagerly
+
+        Returns:
+            EncodedBody of the view
+        """
+        encoded = self._views.get(name)
+        if encoded is None:
+            if build is None:
+                raise KeyError(f"View '{name}' is not registered")
+            encoded = build(self.doc)
+            if not isinstance(encoded, EncodedBody):
+                encoded = EncodedBody(encoded)
+            self._views[name] = encoded
+        return encoded
+
+
+class DocumentCache:
+    """
+    Holds the current version of a singleton document in memory.
+
+    Every write (set or invalidate) takes a new, monotonically increasing
+    version, so readers can tell whether the entry they hold is still current.
+
+    Views passed to the constructor are built and encoded as soon as a new
+    document is stored, i.e. when it is saved, not when it is first read.
+    """
+
+    def __init__(self, name: str, views: Optional[Dict[str, Callable[[Dict[str, Any]], Any]]] = None):
+        self.name = name
+        self.views = views or {}
+        self._entry: Optional[CacheEntry] = None
+        self._version = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def peek(self) -> Optional[CacheEntry]:
+        """Return the cached entry without loading it"""
+        return self._entry
+
+    def _make_entry(self, doc: Dict[str, Any], version: int) -> CacheEntry:
+        entry = CacheEntry(doc, version)
+        for name, build in self.views.items():
+            entry.view(name, build)
+        return entry
+
+    def set(self, doc: Dict[str, Any]) -> CacheEntry:
+        """Replace the cached document (write-through after a save)"""
+        self._version = next(_versions)
+        self._entry = self._make_entry(doc, self._version)
+        return self._entry
+
+    def invalidate(self) -> None:
+        """Drop the cached document so the next read goes to the database"""
+        self._version = next(_versions)
+        self._entry = None
+
+    async def get_or_load(self, loader: Callable[[], Awaitable[Dict[str, Any]]]) -> CacheEntry:
+        """
+        Return the cached entry, calling loader on a miss.
+
+        Concurrent misses share a single load. If the cache is written or
+        invalidated while the load is in flight, the loaded document is
+        returned but not cached.
+
+        Args:
+            loader: Coroutine function returning the document from the database
+
+        Returns:
+            CacheEntry with the current document
+        """
+        entry = self._entry
+        if entry is not None:
+            return entry
+
+        async with self._lock:
+            if self._entry is not None:
+                return self._entry
+
+            version = self._version
+            doc = await loader()
+
+            if self._version != version:
+                return self._entry or self._make_entry(doc, version)
+
+            return self.set(doc)
+
+
+class TenantCache:
+    """
+    One DocumentCache per tenant, bounded to the most recently used tenants.
+
+    Caches are created on first use and named "<name>:<tenant>". When more
+    than max_tenants are held, the least recently used one is dropped; its
+    next request simply loads from the database again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        views: Optional[Dict[str, Callable[[Dict[str, Any]], Any]]] = None,
+        max_tenants: int = 64,
+    ):
+        self.name = name
+        self.views = views or {}
+        self.max_tenants = max_tenants
+        self._caches: "OrderedDict[str, DocumentCache]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._caches)
+
+    def for_tenant(self, tenant: str) -> DocumentCache:
+        """Return tenant's cache, creating it (and evicting the LRU one) if needed"""
+        cache = self._caches.get(tenant)
+        if cache is None:
+            cache = DocumentCache(f"{self.name}:{tenant}", self.views)
+            self._caches[tenant] = cache
+            while len(self._caches) > self.max_tenants:
+                self._caches.popitem(last=False)
+        else:
+            self._caches.move_to_end(tenant)
+        return cache
+
+    def peek(self, tenant: str) -> Optional[DocumentCache]:
+        """Return tenant's cache if it is held, without creating or touching it"""
+        return self._caches.get(tenant)
+
+    def invalidate_all(self) -> None:
+        """Invalidate every tenant's cache, e.g. when views depend on changed configuration"""
+        for cache in self._caches.values():
+            cache.invalidate()
+
+
+settings_cache = TenantCache(
+    "settings",
+    views={"public": lambda doc: SectionedBody(public_settings(doc))},
+)
+images_cache = TenantCache("product_images")
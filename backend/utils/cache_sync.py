@@ -0,0 +1,122 @@
+"""
+Cross-process coherence for the in-process document caches
+Keeps every uvicorn worker / container within a bounded staleness window
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from utils.cache import DocumentCache, TenantCache, settings_cache, images_cache
+
+logger = logging.getLogger(__name__)
+
+# One document per tenant cache: {_id: "<cache name>:<tenant>", version: <int>}
+VERSIONS_COLLECTION = "cache_versions"
+
+
+class CacheSync:
+    """
+    Invalidates local caches when another process saves the same document.
+
+    Every write bumps a shared version counter in MongoDB. Each process
+    follows the counters through a change stream when the server is a
+    replica set, and otherwise polls them every `interval` seconds, so a
+    stale entry survives at most one interval. Counters of tenants whose
+    cache is not currently held are tracked but have nothing to invalidate.
+    """
+
+    def __init__(self, caches: List[TenantCache], interval: float = 2.0):
+        self.caches = {cache.name: cache for cache in caches}
+        self.interval = interval
+        self._db = None
+        self._seen: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, db, interval: Optional[float] = None) -> None:
+        """Start following version changes in the background"""
+        self._db = db
+        if interval is not None:
+            self.interval = interval
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def publish(self, cache: DocumentCache) -> None:
+        """
+        Announce a local write of cache's document to the other processes.
+
+        Call after the write has been persisted and the local cache updated.
+        If another process wrote concurrently, the local entry may hold the
+        older document, so it is dropped.
+        """
+        if self._db is None:
+            return
+
+        # A counter this process has never seen has not been written yet
+        previous = self._seen.get(cache.name, 0)
+        try:
+            doc = await self._db[VERSIONS_COLLECTION].find_one_and_update(
+                {"_id": cache.name},
+                {"$inc": {"version": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except PyMongoError as e:
+            logger.warning(f"Cache version bump failed for {cache.name}: {e}")
+            return
+
+        if doc["version"] != previous + 1:
+            cache.invalidate()
+        self._seen[cache.name] = doc["version"]
+
+    async def poll_once(self) -> None:
+        """Compare shared versions with the last seen ones and invalidate"""
+        async for doc in self._db[VERSIONS_COLLECTION].find({}):
+            self._observe(doc["_id"], doc.get("version", 0))
+
+    def _observe(self, key: str, version: int) -> None:
+        if self._seen.get(key, 0) != version:
+            self._seen[key] = version
+            name, _, tenant = key.partition(":")
+            tenant_caches = self.caches.get(name)
+            cache = tenant_caches.peek(tenant) if tenant_caches else None
+            if cache is not None:
+                cache.invalidate()
+
+    async def _run(self) -> None:
+        try:
+            await self._watch()
+        except PyMongoError as e:
+            # Change streams need a replica set; stand-alone servers poll
+            logger.info(f"Cache sync falling back to polling every {self.interval}s ({e.__class__.__name__})")
+
+        while True:
+            try:
+                await self.poll_once()
+            except PyMongoError as e:
+                logger.warning(f"Cache sync poll failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def _watch(self) -> None:
+        async with self._db[VERSIONS_COLLECTION].watch(full_document="updateLookup") as stream:
+            # Anything written before the stream opened is picked up here
+            await self.poll_once()
+            async for change in stream:
+                full = change.get("fullDocument") or {}
+                name = change["documentKey"]["_id"]
+                self._observe(name, full.get("version", 0))
+
+
+cache_sync = CacheSync([settings_cache, images_cache])
@@ -0,0 +1,373 @@
+"""
+Content-addressed upload storage
+Uploads are named after the SHA-256 of their bytes, so identical files are
+stored once and their URLs never change meaning (safe to cache forever)
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from PIL import Image
+from pymongo import DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from starlette.concurrency import run_in_threadpool
+
+from utils.image_variants import read_manifest
+from utils.upload_stream import IMAGE_MEDIA_TYPES, ReceivedUpload
+
+logger = logging.getLogger(__name__)
+
+# One document per stored file, the index the upload listing is served from:
+# {_id: <filename>, sha256, size, originalSize, bytesSaved, extension,
+#  mimeType, width, height, placeholder, variants: [...], refCount,
+#  createdAt, updatedAt, deletingAt}
+# sha256 is the hash of the bytes as uploaded; size is after optimization.
+# deletingAt marks a record whose file is being deleted: it goes only after
+# the file, and new references wait for it
+UPLOADS_COLLECTION = "uploads"
+
+# Listing sort orders (the filename sort uses _id)
+UPLOAD_INDEXES = [
+    [("createdAt", DESCENDING), ("_id", DESCENDING)],
+    [("size", DESCENDING), ("_id", DESCENDING)],
+]
+
+# Records without a file are only pruned after this long, so uploads that
+# are between registering and writing their file are left alone
+RECONCILE_GRACE = timedelta(minutes=10)
+
+# A deletingAt mark this old was left by a process that died mid-delete;
+# a new reference takes the record over
+DELETING_TIMEOUT = timedelta(minutes=5)
+DELETING_POLL = 0.05
+
+CONTENT_STEM_RE = re.compile(r"^[0-9a-f]{64}$")
+# Path of an upload's public URL (as returned by the upload endpoint)
+UPLOAD_URL_PATH_RE = re.compile(r"/api/uploads/images/([^/]+)$")
+
+# Content-addressed files (and anything derived from them) never change
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Legacy random names could in principle be reused
+DEFAULT_CACHE_CONTROL = "public, max-age=31536000"
+
+
+def content_filename(upload: ReceivedUpload) -> str:
+    """Stored file name of an upload: <sha256><extension>"""
+    return f"{upload.sha256}{upload.extension}"
+
+
+def upload_from_url(url: str) -> Optional[str]:
+    """File name of the upload an image URL points to, or None for other URLs"""
+    match = UPLOAD_URL_PATH_RE.search(urlsplit(url).path)
+    if not match:
+        return None
+    filename = unquote(match.group(1))
+    return None if filename.startswith(".") or "/" in filename else filename
+
+
+def is_content_addressed(stem: str) -> bool:
+    """Whether a file stem is a content hash (rather than a legacy random name)"""
+    return bool(CONTENT_STEM_RE.match(stem))
+
+
+def cache_control_for(stem: str) -> str:
+    """Cache-Control for an upload, its variants and its transformations"""
+    return IMMUTABLE_CACHE_CONTROL if is_content_addressed(stem) else DEFAULT_CACHE_CONTROL
+
+
+def content_etag(filename: str) -> Optional[str]:
+    """
+    Strong ETag of a stored file, variant or transformation: its name, which
+    starts with the content hash. None for legacy random names.
+    """
+    stem = re.split(r"[-_.]", filename, maxsplit=1)[0]
+    return f'"{filename}"' if is_content_addressed(stem) else None
+
+
+def store_upload(upload: ReceivedUpload, dest: Path) -> bool:
+    """
+    Move an upload's temporary file to dest unless that content is already
+    stored (blocking; use the threadpool).
+
+    Returns:
+        True if an identical file already existed and the upload was dropped
+    """
+    if dest.exists():
+        upload.discard()
+        return True
+    try:
+        os.replace(upload.path, dest)
+    except OSError:
+        upload.discard()
+        raise
+    return False
+
+
+def probe_dimensions(path: Path) -> Tuple[Optional[int], Optional[int]]:
+    """Displayed width and height of an image (None for SVG or unreadable files)"""
+    if path.suffix.lower() == ".svg":
+        return None, None
+    try:
+        # Only the header is read
+        with Image.open(path) as image:
+            width, height = image.size
+            # EXIF orientations 5-8 rotate by 90 degrees
+            if image.getexif().get(0x0112) in (5, 6, 7, 8):
+                width, height = height, width
+            return width, height
+    except (OSError, Image.DecompressionBombError):
+        return None, None
+
+
+def describe_file(path: Path, manifest: Optional[dict] = None) -> dict:
+    """
+    Listing metadata of a stored file (blocking; use the threadpool).
+
+    Args:
+        path: Stored file
+        manifest: Its variant manifest, if already at hand
+
+    Returns:
+        {"mimeType", "width", "height", "variants"}
+    """
+    if manifest is None:
+        manifest = read_manifest(path.parent, path.stem)
+    if manifest:
+        width, height = manifest["width"], manifest["height"]
+    else:
+        width, height = probe_dimensions(path)
+    return {
+        "mimeType": IMAGE_MEDIA_TYPES.get(path.suffix.lower(), "application/octet-stream"),
+        "width": width,
+        "height": height,
+        "variants": (manifest or {}).get("variants", []),
+    }
+
+
+async def save_metadata(db, filename: str, metadata: dict) -> None:
+    """Store the listing metadata of a file on its record"""
+    await db[UPLOADS_COLLECTION].update_one({"_id": filename}, {"$set": metadata})
+
+
+async def add_reference(db, filename: str, upload: ReceivedUpload, bytes_saved: int = 0) -> dict:
+    """
+    Count one more reference to a stored file, creating its record if needed.
+    Waits while the file is being deleted; the file may then be gone, so
+    check that it is stored after taking the reference.
+
+    Args:
+        db: Motor database
+        filename: Content-addressed file name
+        upload: The upload being stored
+        bytes_saved: Bytes removed by optimization (upload.size is the
+            optimized size)
+
+    Returns:
+        The updated record
+    """
+    while True:
+        now = datetime.utcnow()
+        try:
+            return await db[UPLOADS_COLLECTION].find_one_and_update(
+                {
+                    "_id": filename,
+                    "$or": [{"deletingAt": {"$exists": False}}, {"deletingAt": {"$lt": now - DELETING_TIMEOUT}}],
+                },
+                {
+                    "$inc": {"refCount": 1},
+                    "$set": {"updatedAt": now},
+                    "$unset": {"deletingAt": ""},
+                    "$setOnInsert": {
+                        "sha256": upload.sha256,
+                        "size": upload.size,
+                        "originalSize": upload.size + bytes_saved,
+                        "bytesSaved": bytes_saved,
+                        "extension": upload.extension,
+                        "createdAt": now,
+                    },
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # The record exists but is marked for deletion
+            await asyncio.sleep(DELETING_POLL)
+
+
+async def release_reference(db, filename: str) -> int:
+    """
+    Drop one reference to a stored file. The last one marks the record for
+    deletion: delete the file, then call drop_record.
+
+    Args:
+        db: Motor database
+        filename: Stored file name
+
+    Returns:
+        References left; 0 means the file must be deleted (also for files
+        uploaded before content addressing, which have no record)
+    """
+    record: Optional[dict] = await db[UPLOADS_COLLECTION].find_one_and_update(
+        {"_id": filename, "refCount": {"$gt": 0}},
+        {"$inc": {"refCount": -1}, "$set": {"updatedAt": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
+    )
+    if record is None:
+        return 0
+    if record["refCount"] > 0:
+        return record["refCount"]
+
+    # A concurrent upload may have referenced the file again in between
+    result = await db[UPLOADS_COLLECTION].update_one(
+        {"_id": filename, "refCount": {"$lte": 0}, "deletingAt": {"$exists": False}},
+        {"$set": {"deletingAt": datetime.utcnow()}}
+    )
+    return 0 if result.modified_count else 1
+
+
+async def mark_deleting(db, filename: str, record: Optional[dict]) -> bool:
+    """
+    Mark an unreferenced file for deletion, as release_reference does for
+    the last reference; files without a record get a placeholder one.
+
+    Args:
+        db: Motor database
+        filename: Stored file name
+        record: Its record as last read (None if it had none); the mark is
+            only set if the record was not touched since
+
+    Returns:
+        False if the file was referenced meanwhile and must be kept
+    """
+    collection = db[UPLOADS_COLLECTION]
+    now = datetime.utcnow()
+    if record is None:
+        try:
+            await collection.insert_one({"_id": filename, "refCount": 0, "updatedAt": now, "deletingAt": now})
+        except DuplicateKeyError:
+            return False
+        return True
+    result = await collection.update_one(
+        {
+            "_id": filename,
+            "updatedAt": record.get("updatedAt"),
+            "$or": [{"deletingAt": {"$exists": False}}, {"deletingAt": {"$lt": now - DELETING_TIMEOUT}}],
+        },
+        {"$set": {"deletingAt": now}}
+    )
+    return bool(result.modified_count)
+
+
+async def drop_record(db, filename: str) -> None:
+    """Remove the record of a file marked for deletion, once the file is gone"""
+    await db[UPLOADS_COLLECTION].delete_one({"_id": filename, "deletingAt": {"$exists": True}})
+
+
+async def ensure_upload_indexes(db) -> None:
+    """Create the indexes the upload listing sorts on"""
+    for keys in UPLOAD_INDEXES:
+        await db[UPLOADS_COLLECTION].create_index(keys)
+
+
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def reconcile_uploads(db, storage, upload_dir: Path, allowed_extensions: set, dry_run: bool = False) -> dict:
+    """
+    Bring the uploads collection in line with the stored files.
+
+    Files without a record (uploaded before the index existed, or copied in
+    by hand) get one with a single reference; records whose file is gone
+    are removed once older than RECONCILE_GRACE; sizes are corrected.
+
+    Args:
+        db: Motor database
+        storage: Storage backend holding the uploads
+        upload_dir: Local working directory (files are fetched there to be
+            hashed and measured)
+        allowed_extensions: Extensions that count as uploads
+        dry_run: Only report what would change
+
+    Returns:
+        {"added": [...], "removed": [...], "updated": [...]} file names
+    """
+    files = {
+        name: (stored.size, stored.modified)
+        for name, stored in (await storage.list()).items()
+        if Path(name).suffix.lower() in allowed_extensions
+    }
+    collection = db[UPLOADS_COLLECTION]
+    report = {"added": [], "removed": [], "updated": []}
+    cutoff = datetime.utcnow() - RECONCILE_GRACE
+
+    known = set()
+    async for record in collection.find({}, {"size": 1, "updatedAt": 1}):
+        name = record["_id"]
+        known.add(name)
+        if name not in files:
+            if (record.get("updatedAt") or cutoff) <= cutoff:
+                report["removed"].append(name)
+                if not dry_run:
+                    await collection.delete_one({"_id": name, "updatedAt": record.get("updatedAt")})
+        elif record.get("size") != files[name][0]:
+            report["updated"].append(name)
+            if not dry_run:
+                await collection.update_one({"_id": name}, {"$set": {"size": files[name][0]}})
+
+    for name in sorted(set(files) - known):
+        report["added"].append(name)
+        if dry_run:
+            continue
+        path = upload_dir / name
+        size, modified = files[name]
+        try:
+            if not await storage.fetch(name, path):
+                continue
+            # Content-addressed names already are the hash; legacy ones are hashed
+            if is_content_addressed(path.stem):
+                sha256 = path.stem
+            else:
+                sha256 = await run_in_threadpool(_sha256_file, path)
+            metadata = await run_in_threadpool(describe_file, path)
+        except FileNotFoundError:
+            continue
+        now = datetime.utcnow()
+        await collection.update_one(
+            {"_id": name},
+            {"$setOnInsert": {
+                "sha256": sha256,
+                "size": size,
+                "extension": path.suffix.lower(),
+                "refCount": 1,
+                "createdAt": datetime.utcfromtimestamp(modified),
+                "updatedAt": now,
+                **metadata,
+            }},
+            upsert=True
+        )
+
+    if any(report.values()):
+        logger.info(
+            f"Uploads index reconciled: {len(report['added'])} added, "
+            f"{len(report['removed'])} removed, {len(report['updated'])} updated"
+        )
+    return report
+
+
+async def reconcile_uploads_safely(db, storage, upload_dir: Path, allowed_extensions: set) -> None:
+    """reconcile_uploads for startup: failures are logged, not raised"""
+    try:
+        await reconcile_uploads(db, storage, upload_dir, allowed_extensions)
+    except (OSError, PyMongoError) as e:
+        logger.warning(f"Uploads index reconcile failed: {e}")
@@ -0,0 +1,38 @@
+"""
+Shared MongoDB client
+One Motor client, and so one connection pool, per process instead of a new
+client for every request
+"""
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from config import get_config
+
+_client: Optional[AsyncIOMotorClient] = None
+_database = None
+
+
+def get_client() -> AsyncIOMotorClient:
+    """The process-wide Motor client, created on first use"""
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(get_config().mongo_url)
+    return _client
+
+
+def get_database():
+    """The application database on the shared client"""
+    global _database
+    if _database is None:
+        _database = get_client()[get_config().db_name]
+    return _database
+
+
+def close_client() -> None:
+    """Close the shared client (called on application shutdown)"""
+    global _client, _database
+    if _client is not None:
+        _client.close()
+        _client = None
+        _database = None
@@ -0,0 +1,132 @@
+"""
+HTTP conditional request helpers (ETag / If-None-Match)
+"""
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from stat import S_ISREG
+from typing import Optional
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+
+# Public content that may change at any time: caches keep a copy but must
+# revalidate it, which costs a body-less 304 when nothing changed
+REVALIDATE = "public, no-cache"
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag.
+
+    Args:
+        if_none_match: Raw header value (may be "*" or a list of tags)
+        etag: Current strong ETag, including quotes
+
+    Returns:
+        True if the client copy is current
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def conditional_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    media_type: str,
+    cache_control: str = REVALIDATE,
+) -> Response:
+    """
+    Return a pre-encoded body, or 304 Not Modified if the client has it.
+
+    Args:
+        request: Incoming request
+        body: Encoded body
+        etag: ETag of the body
+        media_type: Content type of the body
+        cache_control: Cache-Control header value
+
+    Returns:
+        200 response with the body, or 304 with no body
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def conditional_json(request: Request, body: bytes, etag: str, cache_control: str = REVALIDATE) -> Response:
+    """Pre-encoded JSON variant of conditional_response"""
+    return conditional_response(request, body, etag, "application/json", cache_control)
+
+
+def modified_since(if_modified_since: str, mtime: float) -> bool:
+    """Whether a file changed after an If-Modified-Since date (True if unparsable)"""
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return True
+    return int(mtime) > since
+
+
+async def file_response(
+    request: Request,
+    path: Path,
+    media_type: str,
+    etag: Optional[str] = None,
+    cache_control: str = REVALIDATE,
+    accel_redirect: Optional[str] = None,
+) -> Response:
+    """
+    Serve a file with validators: 304 when the client copy is current,
+    byte ranges (Range / If-Range) otherwise.
+
+    The body goes out through the ASGI pathsend extension (zero-copy) when
+    the server offers it, or through nginx when accel_redirect is given.
+
+    Args:
+        request: Incoming request
+        path: File to serve; FileNotFoundError if it does not exist
+        media_type: Content type of the file
+        etag: Strong ETag (quoted); derived from size and mtime if None
+        cache_control: Cache-Control header value
+        accel_redirect: Internal nginx URI of the file; the response then
+            carries X-Accel-Redirect and no body
+
+    Returns:
+        304, X-Accel-Redirect or file response
+    """
+    stat = await run_in_threadpool(path.stat)
+    if not S_ISREG(stat.st_mode):
+        raise FileNotFoundError(path)
+    if etag is None:
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+    }
+
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        current = etag_matches(if_none_match, etag)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        current = bool(if_modified_since) and not modified_since(if_modified_since, stat.st_mtime)
+    if current:
+        return Response(status_code=304, headers=headers)
+
+    if accel_redirect:
+        return Response(media_type=media_type, headers={**headers, "X-Accel-Redirect": accel_redirect})
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat)
@@ -0,0 +1,137 @@
+"""
+Lossless / visually-lossless optimization of uploaded images
+Strips camera metadata and recompresses JPEG, PNG and SVG files in the image
+process pool; the optimized file is only kept when it is smaller
+"""
+import asyncio
+import io
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image, ImageCms, features
+
+from config import get_config
+from utils.image_variants import get_executor
+from utils.upload_stream import ReceivedUpload
+
+logger = logging.getLogger(__name__)
+
+EXIF_ORIENTATION = 0x0112
+
+SVG_COMMENT_RE = re.compile(rb"<!--.*?-->", re.S)
+SVG_METADATA_RE = re.compile(rb"<metadata\b.*?(?:/>|</metadata>)", re.S)
+# Elements and attributes written by Inkscape/Sodipodi for their own use
+SVG_EDITOR_ELEMENT_RE = re.compile(rb"<(sodipodi|inkscape):[\w-]+\b.*?(?:/>|</\1:[\w-]+>)", re.S)
+SVG_EDITOR_ATTRIBUTE_RE = re.compile(rb"\s(?:sodipodi|inkscape|xmlns:sodipodi|xmlns:inkscape)(?::[\w-]+)?=\"[^\"]*\"")
+SVG_BETWEEN_TAGS_RE = re.compile(rb">\s+<")
+
+
+def _is_srgb(icc_profile: bytes) -> bool:
+    """Whether an ICC profile is plain sRGB (what browsers assume anyway)"""
+    if not features.check("littlecms2"):
+        return False
+    try:
+        description = ImageCms.getProfileDescription(ImageCms.ImageCmsProfile(io.BytesIO(icc_profile)))
+    except (OSError, ImageCms.PyCMSError):
+        return False
+    return "srgb" in description.lower()
+
+
+def _color_options(image: Image.Image) -> dict:
+    """Keep only what affects rendering: the orientation tag and wide-gamut profiles"""
+    options = {}
+    orientation = image.getexif().get(EXIF_ORIENTATION)
+    if orientation and orientation != 1:
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = orientation
+        options["exif"] = exif.tobytes()
+    icc_profile = image.info.get("icc_profile")
+    if icc_profile and not _is_srgb(icc_profile):
+        # e.g. Display P3 photos from phones; dropping it would shift colors
+        options["icc_profile"] = icc_profile
+    return options
+
+
+def minify_svg(data: bytes) -> bytes:
+    """Drop comments, metadata and editor data; collapse whitespace between tags"""
+    data = SVG_COMMENT_RE.sub(b"", data)
+    data = SVG_METADATA_RE.sub(b"", data)
+    data = SVG_EDITOR_ELEMENT_RE.sub(b"", data)
+    data = SVG_EDITOR_ATTRIBUTE_RE.sub(b"", data)
+    # Whitespace between tags is significant inside text
+    if b"<text" not in data:
+        data = SVG_BETWEEN_TAGS_RE.sub(b"><", data)
+    return data.strip()
+
+
+def optimize_image(source: str, dest: str, extension: str) -> Optional[int]:
+    """
+    Write an optimized copy of source to dest (runs in a worker process).
+
+    JPEG is re-encoded with its own quantization tables and subsampling
+    (quality="keep") plus optimized Huffman coding; PNG is recompressed
+    losslessly; SVG is minified. GIF (animation) and WebP are left alone.
+
+    Args:
+        source: Path of the uploaded file
+        dest: Path for the optimized copy
+        extension: Canonical extension of the upload
+
+    Returns:
+        Size of dest in bytes, or None if nothing was written
+    """
+    try:
+        if extension == ".svg":
+            Path(dest).write_bytes(minify_svg(Path(source).read_bytes()))
+        elif extension in (".jpg", ".jpeg"):
+            with Image.open(source) as image:
+                image.save(
+                    dest, format="JPEG", quality="keep", optimize=True, progressive=True, **_color_options(image)
+                )
+        elif extension == ".png":
+            with Image.open(source) as image:
+                if getattr(image, "is_animated", False):
+                    return None
+                image.save(dest, format="PNG", optimize=True, **_color_options(image))
+        else:
+            return None
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning(f"Could not optimize {source}: {e}")
+        try:
+            os.unlink(dest)
+        except FileNotFoundError:
+            pass
+        return None
+    return os.path.getsize(dest)
+
+
+async def optimize_upload(upload: ReceivedUpload) -> int:
+    """
+    Optimize an upload's temporary file in place when that makes it smaller.
+
+    Args:
+        upload: Received upload; its path and size are updated
+
+    Returns:
+        Bytes saved (0 if the original was kept or optimization is off)
+    """
+    if not get_config().image_optimize:
+        return 0
+
+    dest = upload.path.with_name(f"{upload.path.name}.opt")
+    loop = asyncio.get_running_loop()
+    size = await loop.run_in_executor(get_executor(), optimize_image, str(upload.path), str(dest), upload.extension)
+    if size is None:
+        return 0
+    if size >= upload.size:
+        dest.unlink(missing_ok=True)
+        return 0
+
+    os.chmod(dest, 0o644)
+    os.replace(dest, upload.path)
+    saved = upload.size - size
+    upload.size = size
+    return saved
@@ -0,0 +1,103 @@
+"""
+Low-quality image placeholders (LQIP)
+A ~20px copy of an image inlined as a data URI, plus its intrinsic size, so
+the frontend can paint a blurred preview and reserve the image box before
+the real image arrives
+"""
+import asyncio
+import base64
+import io
+import logging
+from pathlib import Path
+from typing import Optional, Union
+
+import httpx
+from PIL import Image, ImageOps, features
+
+from utils.image_variants import get_executor
+from utils.safe_fetch import public_client
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_SIZE = 20
+EXIF_ORIENTATION = 0x0112
+
+# Remote images larger than this are not downloaded for a placeholder
+MAX_REMOTE_BYTES = 15 * 1024 * 1024
+REMOTE_TIMEOUT = 10.0
+
+
+def render_placeholder(source: Union[str, bytes]) -> Optional[dict]:
+    """
+    Placeholder of an image (runs in a worker process).
+
+    Args:
+        source: Image path or encoded image bytes
+
+    Returns:
+        {"src": data URI, "width", "height"} with the displayed size of the
+        full image, or None if it is not a readable raster image
+    """
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+            width, height = image.size
+            if image.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+                width, height = height, width
+            # JPEG decodes straight at 1/8 scale
+            image.draft("RGB", (PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+            small = ImageOps.exif_transpose(image)
+            small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+            small = small.convert("RGBA" if small.has_transparency_data else "RGB")
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+    buffer = io.BytesIO()
+    if features.check("webp"):
+        small.save(buffer, format="WEBP", quality=40)
+        media_type = "image/webp"
+    else:
+        small.save(buffer, format="PNG", optimize=True)
+        media_type = "image/png"
+    encoded = base64.b64encode(buffer.getvalue()).decode("ascii")
+    return {"src": f"data:{media_type};base64,{encoded}", "width": width, "height": height}
+
+
+async def placeholder_for_file(path: Path) -> Optional[dict]:
+    """Placeholder of a local image, rendered in the image process pool"""
+    if path.suffix.lower() == ".svg":
+        return None
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), render_placeholder, str(path))
+
+
+async def placeholder_for_url(url: str) -> Optional[dict]:
+    """
+    Placeholder of a remote image.
+
+    Args:
+        url: Absolute http(s) URL of the image
+
+    Returns:
+        Placeholder dict, or None if the image could not be downloaded or read
+        (or is not on a public host)
+    """
+    if not url.startswith(("http://", "https://")):
+        return None
+    try:
+        async with public_client(REMOTE_TIMEOUT) as client:
+            async with client.stream("GET", url) as response:
+                response.raise_for_status()
+                if response.headers.get("content-type", "").startswith("image/svg"):
+                    return None
+                buffer = bytearray()
+                async for chunk in response.aiter_bytes():
+                    buffer.extend(chunk)
+                    if len(buffer) > MAX_REMOTE_BYTES:
+                        logger.warning(f"Image too large for a placeholder: {url}")
+                        return None
+    except httpx.HTTPError as e:
+        logger.warning(f"Could not download {url} for a placeholder: {e}")
+        return None
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), render_placeholder, bytes(buffer))
@@ -0,0 +1,201 @@
+"""
+On-the-fly image transformations (resize / re-encode) with a disk cache
+Each distinct transformation is computed once in the image process pool
+and then served from an LRU-bounded cache directory
+"""
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from PIL import Image, ImageOps, features
+from starlette.concurrency import run_in_threadpool
+
+from config import get_config
+from utils.image_variants import get_executor
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIRNAME = "cache"
+
+TRANSFORM_FORMATS = {
+    "webp": ("WEBP", "image/webp", 80),
+    "avif": ("AVIF", "image/avif", 60),
+    "jpeg": ("JPEG", "image/jpeg", 82),
+    "png": ("PNG", "image/png", None),
+}
+
+
+# Only the configured dimensions and qualities are accepted, so clients
+# cannot fill the cache with arbitrary sizes
+def get_allowed_sizes() -> frozenset:
+    """Widths/heights accepted by ?w= and ?h= (IMAGE_TRANSFORM_SIZES)"""
+    return get_config().image_transform_sizes
+
+
+def get_allowed_qualities() -> frozenset:
+    """Qualities accepted by ?q= (IMAGE_TRANSFORM_QUALITIES)"""
+    return get_config().image_transform_qualities
+
+
+def format_available(fmt: str) -> bool:
+    return fmt in TRANSFORM_FORMATS and (fmt not in ("webp", "avif") or features.check(fmt))
+
+
+def transform_image(source: str, dest: str, width: Optional[int], height: Optional[int],
+                    fmt: str, quality: Optional[int]) -> int:
+    """
+    Resize and re-encode source into dest (runs in a worker process).
+
+    With both width and height the image is fitted inside the box; with one
+    of them the other follows the aspect ratio. Images are never enlarged.
+
+    Returns:
+        Size of the written file in bytes
+    """
+    pil_format, _, default_quality = TRANSFORM_FORMATS[fmt]
+
+    with Image.open(source) as opened:
+        image = ImageOps.exif_transpose(opened)
+        image.load()
+
+    box = (width or image.width, height or image.height)
+    if box[0] < image.width or box[1] < image.height:
+        image.thumbnail(box, Image.LANCZOS, reducing_gap=3.0)
+
+    if pil_format == "JPEG":
+        image = image.convert("RGB")
+    elif image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+
+    options = {"format": pil_format}
+    if default_quality is not None:
+        options["quality"] = quality or default_quality
+    if pil_format in ("JPEG", "PNG"):
+        options["optimize"] = True
+
+    tmp = f"{dest}.{os.getpid()}.part"
+    image.save(tmp, **options)
+    os.replace(tmp, dest)
+    return os.path.getsize(dest)
+
+
+def _file_size(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return None
+
+
+class TransformCache:
+    """
+    Disk cache of transformed images with single-flight generation.
+
+    Entries are named after the source and the parameters. The index of
+    entries is kept in memory in least-recently-used order (rebuilt from
+    file modification times on first use); once the total size exceeds
+    max_bytes the oldest entries are deleted.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self._total = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _limit(self) -> int:
+        if self.max_bytes is not None:
+            return self.max_bytes
+        return get_config().image_cache_max_bytes
+
+    def _scan(self) -> "OrderedDict[str, int]":
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for path in self.cache_dir.iterdir():
+            if path.is_file() and not path.name.endswith(".part"):
+                stat = path.stat()
+                entries.append((stat.st_mtime, path.name, stat.st_size))
+        return OrderedDict((name, size) for _, name, size in sorted(entries))
+
+    async def _ensure_index(self) -> "OrderedDict[str, int]":
+        if self._index is None:
+            index = await run_in_threadpool(self._scan)
+            if self._index is None:
+                self._index = index
+                self._total = sum(index.values())
+        return self._index
+
+    @staticmethod
+    def key(stem: str, width: Optional[int], height: Optional[int], fmt: str, quality: Optional[int]) -> str:
+        """Cache file name for a transformation"""
+        return f"{stem}_{width or 0}x{height or 0}_q{quality or 0}.{fmt}"
+
+    async def get(self, source: Path, width: Optional[int], height: Optional[int],
+                  fmt: str, quality: Optional[int]) -> Path:
+        """
+        Return the cached transformation of source, generating it if needed.
+
+        Concurrent requests for the same transformation share one job.
+
+        Returns:
+            Path of the transformed file
+        """
+        index = await self._ensure_index()
+        name = self.key(source.stem, width, height, fmt, quality)
+        path = self.cache_dir / name
+
+        if name in index:
+            if await run_in_threadpool(path.is_file):
+                index.move_to_end(name)
+                return path
+            # Evicted by another process
+            self._total -= index.pop(name)
+
+        future = self._inflight.get(name)
+        if future is None:
+            future = asyncio.ensure_future(self._generate(source, path, width, height, fmt, quality))
+            self._inflight[name] = future
+            future.add_done_callback(lambda _: self._inflight.pop(name, None))
+        return await asyncio.shield(future)
+
+    async def _generate(self, source: Path, path: Path, width: Optional[int], height: Optional[int],
+                        fmt: str, quality: Optional[int]) -> Path:
+        # Another process may already have generated it
+        size = await run_in_threadpool(_file_size, path)
+        if size is None:
+            loop = asyncio.get_running_loop()
+            size = await loop.run_in_executor(
+                get_executor(), transform_image, str(source), str(path), width, height, fmt, quality
+            )
+
+        index = await self._ensure_index()
+        self._total += size - index.pop(path.name, 0)
+        index[path.name] = size
+        await self._evict(index)
+        return path
+
+    async def _evict(self, index: "OrderedDict[str, int]") -> None:
+        limit = self._limit()
+        victims = []
+        while self._total > limit and len(index) > 1:
+            name, size = index.popitem(last=False)
+            self._total -= size
+            victims.append(self.cache_dir / name)
+        if victims:
+            await run_in_threadpool(lambda: [p.unlink(missing_ok=True) for p in victims])
+
+    async def purge(self, stem: str) -> None:
+        """Drop every cached transformation of an image (after it is deleted)"""
+        index = await self._ensure_index()
+        prefix = f"{stem}_"
+        for name in [name for name in index if name.startswith(prefix)]:
+            self._total -= index.pop(name)
+
+        # Entries created by other processes are not in this index
+        def unlink_all():
+            for path in self.cache_dir.glob(f"{prefix}*"):
+                path.unlink(missing_ok=True)
+        await run_in_threadpool(unlink_all)
@@ -0,0 +1,197 @@
+"""
+Responsive image variants (resized WebP/AVIF copies) for uploaded images
+Generated in a process pool so Pillow never blocks the event loop or
+competes with request handling for the GIL
+"""
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from PIL import Image, ImageOps, features
+
+from config import get_config
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIRNAME = "variants"
+
+# Raster formats that get variants (SVG is resolution independent and
+# animated GIFs would lose their animation)
+RESIZABLE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+FORMAT_OPTIONS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "avif": {"format": "AVIF", "quality": 60, "speed": 6},
+}
+FORMAT_FEATURES = {"webp": "webp", "avif": "avif"}
+MEDIA_TYPES = {"webp": "image/webp", "avif": "image/avif"}
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_variant_widths() -> List[int]:
+    """Target widths (IMAGE_VARIANT_WIDTHS, comma-separated pixels)"""
+    return list(get_config().image_variant_widths)
+
+
+def get_variant_formats() -> List[str]:
+    """Output formats (IMAGE_VARIANT_FORMATS) that this Pillow build can write"""
+    return [
+        fmt for fmt in get_config().image_variant_formats
+        if fmt in FORMAT_OPTIONS and features.check(FORMAT_FEATURES[fmt])
+    ]
+
+
+def variant_name(stem: str, width: int, fmt: str) -> str:
+    return f"{stem}-{width}w.{fmt}"
+
+
+def manifest_path(variants_dir: Path, stem: str) -> Path:
+    return variants_dir / f"{stem}.json"
+
+
+def generate_variants(source: str, variants_dir: str, widths: List[int], formats: List[str]) -> Optional[dict]:
+    """
+    Write resized copies of source in each format (runs in a worker process).
+
+    Widths at or above the original are skipped; the original width itself
+    is always included so the srcset covers full size in modern formats.
+
+    Args:
+        source: Path of the uploaded image
+        variants_dir: Directory for the variant files and manifest
+        widths: Target widths in pixels
+        formats: Output formats ('webp', 'avif')
+
+    Returns:
+        Variant manifest, or None if the image cannot be decoded
+    """
+    source_path = Path(source)
+    out_dir = Path(variants_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stem = source_path.stem
+
+    try:
+        with Image.open(source_path) as opened:
+            image = ImageOps.exif_transpose(opened)
+            image.load()
+    except (OSError, Image.DecompressionBombError) as e:
+        logger.warning(f"Cannot create variants for {source_path.name}: {e}")
+        return None
+
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+
+    width, height = image.size
+    targets = [w for w in widths if w < width] + [width]
+
+    variants = []
+    for target in targets:
+        resized = image if target == width else image.resize(
+            (target, max(1, round(height * target / width))), Image.LANCZOS, reducing_gap=3.0
+        )
+        for fmt in formats:
+            name = variant_name(stem, target, fmt)
+            tmp = out_dir / f".{name}.part"
+            resized.save(tmp, **FORMAT_OPTIONS[fmt])
+            os.replace(tmp, out_dir / name)
+            variants.append({
+                "filename": name,
+                "width": target,
+                "height": resized.size[1],
+                "format": fmt,
+                "size": (out_dir / name).stat().st_size,
+            })
+
+    manifest = {"width": width, "height": height, "variants": variants}
+    tmp = out_dir / f".{stem}.json.part"
+    tmp.write_text(json.dumps(manifest))
+    os.replace(tmp, manifest_path(out_dir, stem))
+    return manifest
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Process pool for image work, created on first use (IMAGE_WORKERS processes)"""
+    global _executor
+    if _executor is None:
+        workers = get_config().image_workers or max(1, (os.cpu_count() or 2) // 2)
+        _executor = ProcessPoolExecutor(max_workers=workers)
+    return _executor
+
+
+def shutdown_executor() -> None:
+    """Stop the worker processes (called on application shutdown)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def build_variants(source: Path) -> Optional[dict]:
+    """
+    Generate the variants of an uploaded image in the process pool.
+
+    Args:
+        source: Path of the uploaded image
+
+    Returns:
+        Variant manifest, or None for formats that get no variants
+    """
+    formats = get_variant_formats()
+    if source.suffix.lower() not in RESIZABLE_EXTENSIONS or not formats:
+        return None
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(), generate_variants,
+        str(source), str(source.parent / VARIANTS_DIRNAME), get_variant_widths(), formats,
+    )
+
+
+def read_manifest(upload_dir: Path, stem: str) -> Optional[dict]:
+    """Stored variant manifest of an upload, if any (blocking; use the threadpool)"""
+    try:
+        return json.loads(manifest_path(upload_dir / VARIANTS_DIRNAME, stem).read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def delete_variants(upload_dir: Path, stem: str) -> None:
+    """Remove an upload's variant files and manifest (blocking; use the threadpool)"""
+    variants_dir = upload_dir / VARIANTS_DIRNAME
+    manifest = read_manifest(upload_dir, stem)
+    for variant in (manifest or {}).get("variants", []):
+        (variants_dir / variant["filename"]).unlink(missing_ok=True)
+    manifest_path(variants_dir, stem).unlink(missing_ok=True)
+
+
+def describe_variants(manifest: Optional[dict], base_url: str) -> Dict[str, object]:
+    """
+    Public form of a manifest: variant URLs plus one srcset per media type.
+
+    Args:
+        manifest: Stored manifest (or None)
+        base_url: URL prefix the variant file names are appended to
+
+    Returns:
+        {"variants": [...], "srcset": {"image/avif": "... 320w, ...", ...}}
+    """
+    if not manifest:
+        return {"variants": [], "srcset": {}}
+
+    variants, srcset = [], {}
+    for variant in manifest["variants"]:
+        url = f"{base_url}/{variant['filename']}"
+        variants.append({**variant, "url": url})
+        srcset.setdefault(MEDIA_TYPES[variant["format"]], []).append(f"{url} {variant['width']}w")
+
+    return {
+        "width": manifest["width"],
+        "height": manifest["height"],
+        "variants": variants,
+        "srcset": {media_type: ", ".join(entries) for media_type, entries in srcset.items()},
+    }
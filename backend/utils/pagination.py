@@ -0,0 +1,94 @@
+"""
+Keyset (cursor) pagination for MongoDB listings
+Pages continue after the last returned sort key instead of skipping rows,
+so every page costs one index range scan however deep the client goes
+"""
+import base64
+import binascii
+from typing import Any, List, Optional, Sequence, Tuple
+
+from bson import json_util
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Opaque cursor for the sort key of the last item of a page"""
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> List[Any]:
+    """
+    Sort key stored in a cursor.
+
+    Args:
+        cursor: Value from a previous page's nextCursor
+        types: Type of each value the cursor must hold; anything else (such
+            as an operator document like {"$ne": null}) is rejected
+
+    Returns:
+        Sort key values (datetimes and ObjectIds restored)
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error):
+        values = None
+    if not isinstance(values, list) or len(values) != len(types) or not all(
+        isinstance(value, kind) and not isinstance(value, bool) for value, kind in zip(values, types)
+    ):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return values
+
+
+def keyset_query(
+    query: dict, field: str, types: Sequence[type], direction: int, cursor: Optional[str]
+) -> Tuple[dict, list]:
+    """
+    Filter and sort for one page ordered by field, with _id as tie-breaker.
+
+    Args:
+        query: Base filter
+        field: Sort field ("_id" to sort by id only)
+        types: Type of field's values, then of _id (only one when field is _id)
+        direction: ASCENDING or DESCENDING
+        cursor: Cursor of the previous page, or None for the first page
+
+    Returns:
+        (filter, sort) for find()
+    """
+    sort = [(field, direction)] if field == "_id" else [(field, direction), ("_id", direction)]
+    if cursor is None:
+        return query, sort
+
+    op = "$gt" if direction == ASCENDING else "$lt"
+    values = decode_cursor(cursor, types)
+    if field == "_id":
+        after = {"_id": {op: values[0]}}
+    else:
+        after = {"$or": [{field: {op: values[0]}}, {field: values[0], "_id": {op: values[1]}}]}
+    return ({"$and": [query, after]} if query else after), sort
+
+
+async def fetch_page(collection, query: dict, field: str, types: Sequence[type], direction: int,
+                     cursor: Optional[str], limit: int, projection: Optional[dict] = None) -> Tuple[list, Optional[str]]:
+    """
+    Read one page of a keyset-paginated listing.
+
+    Returns:
+        (documents, nextCursor); nextCursor is None on the last page
+    """
+    page_filter, sort = keyset_query(query, field, types, direction, cursor)
+    docs = await collection.find(page_filter, projection).sort(sort).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor([last.get(name) for name, _ in sort])
+    return docs, next_cursor
+
+
+def sort_direction(order: str) -> int:
+    """ASCENDING for "asc", DESCENDING otherwise"""
+    return ASCENDING if order == "asc" else DESCENDING
@@ -0,0 +1,254 @@
+"""
+Local mirror of remote images
+Product images may point at third-party hosts; the mirror downloads them into
+upload storage and revalidates them with conditional requests (ETag /
+Last-Modified), so visitors load them from our own origin
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable, List, Optional, Tuple
+
+import httpx
+from pymongo import ReturnDocument
+from starlette.concurrency import run_in_threadpool
+
+from utils.content_store import upload_from_url
+from utils.safe_fetch import public_client
+from utils.upload_stream import SNIFF_BYTES, ReceivedUpload, sniff_image_type
+
+logger = logging.getLogger(__name__)
+
+# One document per mirrored URL, holding one reference to the stored file:
+# {_id: <remote url>, filename, etag, lastModified, checkedAt, failedAt}
+REMOTE_IMAGES_COLLECTION = "remote_images"
+
+FETCH_TIMEOUT = 15.0
+
+
+class RemoteImageError(Exception):
+    """A remote image could not be downloaded or is not a supported image"""
+
+
+def is_remote_url(url: str) -> bool:
+    """Whether an image URL points at another host (not one of our uploads)"""
+    return url.startswith(("http://", "https://")) and upload_from_url(url) is None
+
+
+async def download_image(
+    client: httpx.AsyncClient, url: str, dest_dir: Path, max_size: int, headers: Optional[dict] = None
+) -> Tuple[Optional[ReceivedUpload], httpx.Headers]:
+    """
+    Stream a remote image into a temporary file in dest_dir.
+
+    Args:
+        client: HTTP client (see safe_fetch.public_client)
+        url: Image URL
+        dest_dir: Directory of the final file
+        max_size: Maximum size in bytes
+        headers: Extra request headers (e.g. conditional request headers)
+
+    Returns:
+        The downloaded file (None on 304 Not Modified) and the response
+        headers; raises RemoteImageError on failure
+    """
+    file, tmp_name = None, None
+    digest = hashlib.sha256()
+    head = bytearray()
+    size, extension = 0, None
+
+    def write(data: bytes) -> None:
+        file.write(data)
+        digest.update(data)
+
+    try:
+        async with client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304:
+                return None, response.headers
+            if response.status_code != 200:
+                raise RemoteImageError(f"HTTP {response.status_code}")
+
+            fd, tmp_name = await run_in_threadpool(
+                tempfile.mkstemp, dir=dest_dir, prefix=".mirror-", suffix=".part"
+            )
+            file = os.fdopen(fd, "wb")
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if size > max_size:
+                    raise RemoteImageError(f"larger than {max_size} bytes")
+                if extension is None and len(head) < SNIFF_BYTES:
+                    head.extend(chunk[:SNIFF_BYTES - len(head)])
+                    if len(head) >= SNIFF_BYTES:
+                        extension = sniff_image_type(bytes(head))
+                        if extension is None:
+                            raise RemoteImageError("not a supported image")
+                await run_in_threadpool(write, chunk)
+
+        if extension is None:
+            extension = sniff_image_type(bytes(head))
+            if extension is None:
+                raise RemoteImageError("not a supported image")
+
+        await run_in_threadpool(file.close)
+        file = None
+        await run_in_threadpool(os.chmod, tmp_name, 0o644)
+        name = Path(httpx.URL(url).path).name or "remote"
+        return ReceivedUpload(Path(tmp_name), name, size, extension, digest.hexdigest()), response.headers
+    except BaseException as e:
+        if file is not None:
+            file.close()
+        if tmp_name is not None:
+            try:
+                os.unlink(tmp_name)
+            except FileNotFoundError:
+                pass
+        if isinstance(e, httpx.HTTPError):
+            raise RemoteImageError(str(e) or type(e).__name__) from e
+        raise
+
+
+class RemoteMirror:
+    """
+    Keeps local copies of remote images.
+
+    `store` stores a downloaded file and counts a reference to it, returning
+    its file name; `release` drops one reference. Every mirrored URL holds
+    exactly one reference to its current copy. A background task runs a
+    sync job every `interval` seconds, or sooner when woken.
+    """
+
+    def __init__(
+        self,
+        dest_dir: Path,
+        max_size: int,
+        store: Callable[[ReceivedUpload], Awaitable[str]],
+        release: Callable[[str], Awaitable[int]],
+    ):
+        self.dest_dir = dest_dir
+        self.max_size = max_size
+        self.store = store
+        self.release = release
+        self.interval = 3600.0
+        self._sync: Optional[Callable[[], Awaitable[None]]] = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self, db, url: str, max_age: timedelta) -> Optional[str]:
+        """
+        Local file name of a remote image, downloading it (or revalidating
+        the copy with a conditional request) when last checked over max_age ago.
+
+        Args:
+            db: Motor database
+            url: Remote image URL
+            max_age: How long a copy is used without asking the origin
+
+        Returns:
+            File name of the local copy, or None if the image has never been
+            downloaded successfully. When the origin fails, the previous
+            copy is kept.
+        """
+        collection = db[REMOTE_IMAGES_COLLECTION]
+        state = await collection.find_one({"_id": url}) or {}
+        filename = state.get("filename")
+        now = datetime.utcnow()
+        attempts = [state[key] for key in ("checkedAt", "failedAt") if state.get(key)]
+        if attempts and max(attempts) > now - max_age:
+            return filename
+
+        headers = {}
+        if filename and state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if filename and state.get("lastModified"):
+            headers["If-Modified-Since"] = state["lastModified"]
+        try:
+            async with public_client(FETCH_TIMEOUT) as client:
+                upload, response_headers = await download_image(client, url, self.dest_dir, self.max_size, headers)
+        except RemoteImageError as e:
+            logger.warning(f"Could not mirror {url}: {e}")
+            await collection.update_one({"_id": url}, {"$set": {"failedAt": now}}, upsert=True)
+            return filename
+
+        if upload is None:
+            await collection.update_one({"_id": url}, {"$set": {"checkedAt": now}, "$unset": {"failedAt": ""}})
+            return filename
+
+        stored = await self.store(upload)
+        previous = await collection.find_one_and_update(
+            {"_id": url},
+            {
+                "$set": {
+                    "filename": stored,
+                    "etag": response_headers.get("etag"),
+                    "lastModified": response_headers.get("last-modified"),
+                    "checkedAt": now,
+                },
+                "$unset": {"failedAt": ""},
+            },
+            upsert=True,
+            return_document=ReturnDocument.BEFORE,
+        )
+        # store() counted a new reference; give back the one held so far
+        if previous and previous.get("filename"):
+            await self.release(previous["filename"])
+        return stored
+
+    async def lookup(self, db, url: str) -> Optional[str]:
+        """File name of the local copy of url, if it has one"""
+        state = await db[REMOTE_IMAGES_COLLECTION].find_one({"_id": url}, {"filename": 1})
+        return (state or {}).get("filename")
+
+    async def prune(self, db, in_use: Iterable[str]) -> List[str]:
+        """
+        Forget mirrored URLs that are no longer used, releasing their copies.
+
+        Returns:
+            The URLs dropped
+        """
+        collection = db[REMOTE_IMAGES_COLLECTION]
+        dropped = []
+        async for state in collection.find({"_id": {"$nin": list(in_use)}}, {"_id": 1}):
+            removed = await collection.find_one_and_delete({"_id": state["_id"]})
+            if removed is None:
+                continue
+            dropped.append(removed["_id"])
+            if removed.get("filename"):
+                await self.release(removed["filename"])
+        return dropped
+
+    def start(self, sync: Callable[[], Awaitable[None]], interval: float) -> None:
+        """Run sync in the background every interval seconds (and when woken)"""
+        self._sync = sync
+        self.interval = interval
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def wake(self) -> None:
+        """Run the sync job soon (e.g. after a new remote URL was saved)"""
+        self._wake.set()
+
+    async def stop(self) -> None:
+        """Stop the background task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                await self._sync()
+            except Exception as e:
+                logger.warning(f"Remote image mirror failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
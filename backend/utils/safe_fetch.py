@@ -0,0 +1,101 @@
+"""
+Fetching admin-supplied URLs
+Image URLs are downloaded by the server itself, so a URL must not reach
+services on the internal network (SSRF). Clients from public_client()
+resolve every host once, refuse it unless all its addresses are public,
+and connect to the checked address itself, so a host cannot resolve to a
+public address for the check and an internal one for the connection (DNS
+rebinding). Redirect targets open their own connections and are checked
+the same way.
+"""
+import asyncio
+import ipaddress
+import socket
+from typing import List, Optional
+
+import httpcore
+import httpx
+
+from config import get_config
+
+MAX_REDIRECTS = 5
+
+
+class BlockedURLError(httpx.RequestError):
+    """The URL points at a private, loopback or otherwise non-public address"""
+
+
+def is_public_address(address: str) -> bool:
+    """Whether an IP address is routable on the public internet"""
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def resolve_public(host: str, port: int, timeout: Optional[float] = None) -> List[str]:
+    """
+    Addresses of a host, all of them public.
+
+    Args:
+        host: Host name or IP literal
+        port: TCP port
+        timeout: Seconds to wait for the resolver
+
+    Returns:
+        The addresses, in resolver order
+
+    Raises:
+        BlockedURLError: Any address is not public
+        httpcore.ConnectError: The host does not resolve
+    """
+    try:
+        infos = await asyncio.wait_for(
+            asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM), timeout
+        )
+    except (socket.gaierror, asyncio.TimeoutError) as e:
+        raise httpcore.ConnectError(f"{host}: {e or 'resolver timed out'}") from e
+    addresses = list(dict.fromkeys(info[4][0] for info in infos))
+    if not addresses or not all(is_public_address(address) for address in addresses):
+        raise BlockedURLError(f"{host} is not a public address")
+    return addresses
+
+
+class PublicNetworkBackend(httpcore.AsyncNetworkBackend):
+    """Opens TCP connections only to checked public addresses"""
+
+    def __init__(self):
+        self._backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        addresses = await resolve_public(host, port, timeout)
+        for address in addresses[:-1]:
+            try:
+                return await self._backend.connect_tcp(address, port, timeout, local_address, socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout):
+                continue
+        return await self._backend.connect_tcp(addresses[-1], port, timeout, local_address, socket_options)
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        raise BlockedURLError("unix sockets are not allowed")
+
+    async def sleep(self, seconds):
+        await self._backend.sleep(seconds)
+
+
+def public_client(timeout: float) -> httpx.AsyncClient:
+    """
+    HTTP client for admin-supplied URLs: follows up to MAX_REDIRECTS
+    redirects and connects to public addresses only (any address with
+    REMOTE_FETCH_ALLOW_PRIVATE).
+
+    Args:
+        timeout: Request timeout in seconds
+    """
+    transport = httpx.AsyncHTTPTransport()
+    if not get_config().remote_fetch_allow_private:
+        # httpx has no option for the network backend of its connection pool
+        transport._pool._network_backend = PublicNetworkBackend()
+    return httpx.AsyncClient(
+        transport=transport, timeout=timeout, follow_redirects=True, max_redirects=MAX_REDIRECTS
+    )
@@ -0,0 +1,38 @@
+"""
+Fast JSON serialization (orjson) shared by the API responses and caches
+"""
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def _default(obj: Any) -> Any:
+    """Encode types orjson does not handle natively"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json", by_alias=True)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serialize content to JSON bytes.
+
+    datetime, Enum and UUID are encoded natively by orjson; ObjectId is
+    encoded as its hex string.
+    """
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """Default response class of the app, rendering with orjson"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,40 @@
+"""
+Helpers for single-document collections (settings, product_images)
+Each collection holds one document per tenant, keyed by the tenant id
+"""
+import logging
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Key of the pre-tenancy singleton document (the default tenant's document);
+# upserts on _id cannot create duplicates
+SINGLETON_ID = "default"
+
+
+async def migrate_singleton(collection) -> None:
+    """
+    Move a legacy singleton document (ObjectId _id) under SINGLETON_ID.
+
+    Older versions inserted the document with a generated _id and read it
+    with find_one(). The first such document is copied to the fixed key and
+    any other ObjectId-keyed leftovers are removed; tenant documents are
+    left alone. Safe to run concurrently from several workers.
+
+    Args:
+        collection: Motor collection holding the singleton
+    """
+    legacy = await collection.find_one({"_id": {"$type": "objectId"}})
+    if not legacy:
+        return
+
+    if not await collection.find_one({"_id": SINGLETON_ID}, {"_id": 1}):
+        legacy["_id"] = SINGLETON_ID
+        try:
+            await collection.insert_one(legacy)
+        except DuplicateKeyError:
+            pass
+
+    result = await collection.delete_many({"_id": {"$type": "objectId"}})
+    logger.info(f"Migrated {collection.name} to singleton key (removed {result.deleted_count} legacy documents)")
@@ -0,0 +1,203 @@
+"""
+Static JSON snapshots of the storefront content
+Written into SNAPSHOT_DIR on every save so nginx can serve landing-page
+content without reaching Python; the API stays available as the fallback
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymongo.errors import PyMongoError
+from starlette.concurrency import run_in_threadpool
+
+from config import get_config
+from utils.serialization import dumps
+from utils.tenancy import DEFAULT_TENANT, TENANTS_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+# Superseded content files are kept this long (seconds) for clients that
+# still hold the previous manifest
+SNAPSHOT_RETENTION = 3600
+
+MANIFEST_NAME = "manifest.json"
+
+# Layout under SNAPSHOT_DIR:
+#   tenants/<tenant>/manifest.json            -> {"settings": "settings.<hash>.json", ...}
+#   tenants/<tenant>/<kind>.<hash>.json       immutable content files
+#   hosts/<host> -> ../tenants/<tenant>       one link per tenant host, for nginx
+SAFE_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+CONTENT_FILE_RE = re.compile(r"^[a-z]+\.[0-9a-f]{16}\.json$")
+
+# Loads a tenant's document / renders it into {kind: encoded JSON}
+Loader = Callable[[str], Awaitable[dict]]
+Renderer = Callable[[dict], Dict[str, bytes]]
+
+
+def get_snapshot_dir() -> Optional[Path]:
+    """Snapshot root from SNAPSHOT_DIR; None disables publishing"""
+    return get_config().snapshot_dir
+
+
+def content_name(kind: str, body: bytes) -> str:
+    """File name of a content snapshot, derived from its bytes"""
+    return f"{kind}.{hashlib.sha256(body).hexdigest()[:16]}.json"
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Write data to path so readers see either the old or the new file"""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # mkstemp creates 0600 files; nginx must be able to read them
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def link_atomic(link: Path, target: str) -> None:
+    """Point the symlink at target, replacing any existing link"""
+    if link.is_symlink() and os.readlink(link) == target:
+        return
+    tmp = link.with_name(f".tmp-{link.name}")
+    try:
+        tmp.unlink()
+    except FileNotFoundError:
+        pass
+    os.symlink(target, tmp)
+    os.replace(tmp, link)
+
+
+def write_snapshot(root: Path, tenant: str, files: Dict[str, bytes], hosts: Iterable[str]) -> dict:
+    """
+    Write a tenant's content files, then its manifest, then its host links.
+
+    Content files are named by their hash and never modified, so they can
+    be cached forever; only the manifest changes between saves.
+
+    Args:
+        root: Snapshot root directory
+        tenant: Tenant id
+        files: Encoded JSON per content kind
+        hosts: Host names that resolve to the tenant
+
+    Returns:
+        The manifest that was written
+    """
+    tenant_dir = root / "tenants" / tenant
+    tenant_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest = {}
+    for kind, body in files.items():
+        name = content_name(kind, body)
+        if not (tenant_dir / name).exists():
+            write_atomic(tenant_dir / name, body)
+        manifest[kind] = name
+    manifest["generatedAt"] = datetime.now(timezone.utc).isoformat()
+    write_atomic(tenant_dir / MANIFEST_NAME, dumps(manifest))
+
+    hosts_dir = root / "hosts"
+    hosts_dir.mkdir(exist_ok=True)
+    for host in hosts:
+        if SAFE_NAME_RE.match(host):
+            link_atomic(hosts_dir / host, f"../tenants/{tenant}")
+
+    # Drop superseded content files once no recent manifest can point at them
+    current = set(manifest.values())
+    cutoff = time.time() - SNAPSHOT_RETENTION
+    for path in tenant_dir.iterdir():
+        if CONTENT_FILE_RE.match(path.name) and path.name not in current and path.stat().st_mtime < cutoff:
+            path.unlink(missing_ok=True)
+
+    return manifest
+
+
+class SnapshotPublisher:
+    """
+    Publishes a tenant's storefront content as static files.
+
+    Routers register a source per document (a loader plus a renderer that
+    turns the document into one or more encoded files). Every publish
+    re-reads all sources from the database, so the manifest always matches
+    the stored content even when another process wrote part of it.
+    """
+
+    def __init__(self):
+        self.sources: List[Tuple[Loader, Renderer]] = []
+        self._db = None
+        self._lock = asyncio.Lock()
+
+    def add_source(self, loader: Loader, render: Renderer) -> None:
+        """Register a document to include in every snapshot"""
+        self.sources.append((loader, render))
+
+    def start(self, db) -> None:
+        """Use db to look up tenant hosts"""
+        self._db = db
+
+    async def _tenant_hosts(self, tenant: str) -> List[str]:
+        if self._db is None:
+            return []
+        doc = await self._db[TENANTS_COLLECTION].find_one({"_id": tenant}, {"hosts": 1})
+        return [host.strip().lower() for host in (doc or {}).get("hosts") or []]
+
+    async def publish(self, tenant: str) -> Optional[dict]:
+        """
+        Write the current snapshot of tenant's content.
+
+        Failures are logged and swallowed: the API keeps serving the content.
+
+        Args:
+            tenant: Tenant id
+
+        Returns:
+            The manifest, or None if publishing is disabled or failed
+        """
+        root = get_snapshot_dir()
+        if root is None:
+            return None
+        if not SAFE_NAME_RE.match(tenant):
+            logger.warning(f"Not publishing snapshot for tenant with unsafe id {tenant!r}")
+            return None
+
+        # Serialized so the last manifest written reflects the last save
+        async with self._lock:
+            try:
+                files = {}
+                for loader, render in self.sources:
+                    files.update(render(await loader(tenant)))
+                hosts = await self._tenant_hosts(tenant)
+                return await run_in_threadpool(write_snapshot, root, tenant, files, hosts)
+            except (OSError, PyMongoError) as e:
+                logger.warning(f"Snapshot publish failed for tenant {tenant}: {e}")
+                return None
+
+    async def publish_all(self) -> None:
+        """Publish every known tenant (run at startup to heal missing snapshots)"""
+        if get_snapshot_dir() is None or self._db is None:
+            return
+        tenants = [DEFAULT_TENANT]
+        try:
+            async for doc in self._db[TENANTS_COLLECTION].find({}, {"_id": 1}):
+                if doc["_id"] != DEFAULT_TENANT:
+                    tenants.append(doc["_id"])
+        except PyMongoError as e:
+            logger.warning(f"Could not list tenants for snapshots: {e}")
+        for tenant in tenants:
+            await self.publish(tenant)
+
+
+snapshot_publisher = SnapshotPublisher()
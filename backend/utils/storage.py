@@ -0,0 +1,212 @@
+"""
+Storage backends for uploaded images
+The upload directory is always the local working copy (variants and
+transformations are computed from it); the backend decides where files are
+kept for good and how clients download them. With S3 every instance shares
+one bucket and image bytes go straight from the bucket to the browser.
+"""
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from config import AppConfig
+
+# Multipart upload to S3 kicks in above this size, in parts of this size
+MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class StoredObject:
+    """Listing entry of a stored file"""
+    size: int
+    modified: float
+
+
+class LocalStorage:
+    """Files stay in the upload directory and are served by the API/nginx"""
+    name = "local"
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    async def save(self, key: str, source: Path, media_type: str, cache_control: str) -> None:
+        """Keep a finished file under key (source is usually already in place)"""
+        dest = self.root / key
+        if source != dest:
+            def move():
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(source, dest)
+            await run_in_threadpool(move)
+
+    async def exists(self, key: str) -> bool:
+        return await run_in_threadpool((self.root / key).is_file)
+
+    async def fetch(self, key: str, dest: Path) -> bool:
+        """Make sure dest holds the file; False if it is not stored"""
+        return await run_in_threadpool((self.root / key).is_file)
+
+    async def delete(self, key: str) -> None:
+        await run_in_threadpool((self.root / key).unlink, missing_ok=True)
+
+    async def move(self, key: str, dest_key: str) -> None:
+        """Rename a stored file (e.g. into quarantine)"""
+        dest = self.root / dest_key
+        def move():
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(self.root / key, dest)
+        await run_in_threadpool(move)
+
+    async def list(self) -> Dict[str, StoredObject]:
+        """Top-level stored files (not variants or cached transformations)"""
+        def scan():
+            objects = {}
+            for entry in os.scandir(self.root):
+                if entry.is_file() and not entry.name.startswith("."):
+                    stat = entry.stat()
+                    objects[entry.name] = StoredObject(stat.st_size, stat.st_mtime)
+            return objects
+        return await run_in_threadpool(scan)
+
+    def download_url(self, key: str) -> Optional[str]:
+        """Direct download URL, or None when the API serves the file itself"""
+        return None
+
+
+class S3Storage:
+    """
+    Files are kept in an S3-compatible bucket (AWS S3, MinIO, R2, ...).
+
+    Uploads use multipart transfers for large files; downloads are
+    redirected to pre-signed URLs (or to public_url, e.g. a CDN in front
+    of the bucket). boto3 is only needed when this backend is configured.
+    """
+    name = "s3"
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None,
+                 region: Optional[str] = None, access_key_id: Optional[str] = None,
+                 secret_access_key: Optional[str] = None, public_url: str = "", url_expires: int = 3600):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config
+            from botocore.exceptions import ClientError
+        except ModuleNotFoundError:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires boto3 (pip install boto3)")
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.public_url = public_url.rstrip("/")
+        self.url_expires = url_expires
+        # Path-style addressing works for MinIO and custom endpoints
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key_id or None,
+            aws_secret_access_key=secret_access_key or None,
+            config=Config(s3={"addressing_style": "path"} if endpoint_url else {}, retries={"max_attempts": 3}),
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_CHUNK_SIZE, multipart_chunksize=MULTIPART_CHUNK_SIZE
+        )
+        self._client_error = ClientError
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def _missing(self, error) -> bool:
+        return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    async def save(self, key: str, source: Path, media_type: str, cache_control: str) -> None:
+        """Upload a local file (multipart above MULTIPART_CHUNK_SIZE); the local copy is kept"""
+        await run_in_threadpool(
+            self.client.upload_file, str(source), self.bucket, self._key(key),
+            ExtraArgs={"ContentType": media_type, "CacheControl": cache_control},
+            Config=self.transfer_config,
+        )
+
+    async def exists(self, key: str) -> bool:
+        try:
+            await run_in_threadpool(self.client.head_object, Bucket=self.bucket, Key=self._key(key))
+            return True
+        except self._client_error as e:
+            if self._missing(e):
+                return False
+            raise
+
+    async def fetch(self, key: str, dest: Path) -> bool:
+        """Download the file to dest unless a local copy exists; False if it is not stored"""
+        if await run_in_threadpool(dest.is_file):
+            return True
+        tmp = dest.with_name(f".{dest.name}.{os.getpid()}.part")
+        try:
+            await run_in_threadpool(
+                self.client.download_file, self.bucket, self._key(key), str(tmp), Config=self.transfer_config
+            )
+        except self._client_error as e:
+            await run_in_threadpool(tmp.unlink, missing_ok=True)
+            if self._missing(e):
+                return False
+            raise
+        await run_in_threadpool(os.replace, tmp, dest)
+        return True
+
+    async def delete(self, key: str) -> None:
+        await run_in_threadpool(self.client.delete_object, Bucket=self.bucket, Key=self._key(key))
+
+    async def move(self, key: str, dest_key: str) -> None:
+        """Copy an object to dest_key and delete the original"""
+        await run_in_threadpool(
+            self.client.copy_object,
+            Bucket=self.bucket, Key=self._key(dest_key),
+            CopySource={"Bucket": self.bucket, "Key": self._key(key)},
+        )
+        await self.delete(key)
+
+    async def list(self) -> Dict[str, StoredObject]:
+        """Top-level stored files (not variants)"""
+        def scan():
+            objects = {}
+            paginator = self.client.get_paginator("list_objects_v2")
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix, Delimiter="/"):
+                for item in page.get("Contents", []):
+                    name = item["Key"][len(self.prefix):]
+                    objects[name] = StoredObject(item["Size"], item["LastModified"].timestamp())
+            return objects
+        return await run_in_threadpool(scan)
+
+    def download_url(self, key: str) -> Optional[str]:
+        """Public URL if configured, else a pre-signed GET URL valid for url_expires seconds"""
+        if self.public_url:
+            return f"{self.public_url}/{self._key(key)}"
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": self._key(key)}, ExpiresIn=self.url_expires
+        )
+
+
+def create_storage(config: AppConfig, local_root: Path):
+    """
+    Storage backend selected by STORAGE_BACKEND.
+
+    Args:
+        config: Application configuration
+        local_root: Upload directory (the local working copy)
+
+    Returns:
+        LocalStorage or S3Storage
+    """
+    if config.storage_backend == "s3":
+        return S3Storage(
+            bucket=config.s3_bucket,
+            prefix=config.s3_prefix,
+            endpoint_url=config.s3_endpoint_url,
+            region=config.s3_region,
+            access_key_id=config.s3_access_key_id,
+            secret_access_key=config.s3_secret_access_key,
+            public_url=config.s3_public_url,
+            url_expires=config.s3_url_expires,
+        )
+    return LocalStorage(local_root)
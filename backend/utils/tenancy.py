@@ -0,0 +1,161 @@
+"""
+Host-based tenant resolution for the whitelabel storefronts
+One backend process serves every brand; the request host selects the tenant
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from fastapi import Request
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure, PyMongoError
+
+from utils.singletons import SINGLETON_ID
+
+logger = logging.getLogger(__name__)
+
+# Requests from unknown hosts (and all data created before tenancy) belong
+# to the default tenant, whose settings live under the legacy singleton key
+DEFAULT_TENANT = SINGLETON_ID
+
+# One document per tenant: {_id: <tenant id>, name: <label>, hosts: [<host>, ...]}
+TENANTS_COLLECTION = "tenants"
+
+# Seconds between reloads of the host -> tenant map
+TENANT_REFRESH_INTERVAL = 30
+
+# Tenant-scoped collections; every query on them filters by tenantId first
+TENANT_INDEXES = {
+    "orders": [
+        # Admin listing: newest first, keyset on (createdAt, _id), one
+        # index per filter with the equality fields ahead of the sort key
+        [("tenantId", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)],
+        [("tenantId", ASCENDING), ("status", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)],
+        [("tenantId", ASCENDING), ("state", ASCENDING), ("city", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)],
+        [("tenantId", ASCENDING), ("utmSource", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)],
+        [("tenantId", ASCENDING), ("orderNumber", ASCENDING)],
+        [("tenantId", ASCENDING), ("email", ASCENDING), ("status", ASCENDING), ("createdAt", DESCENDING)],
+    ],
+    "pageviews": [
+        [("tenantId", ASCENDING), ("timestamp", DESCENDING)],
+    ],
+    "sessions": [
+        [("tenantId", ASCENDING), ("visitor_id", ASCENDING), ("last_activity", DESCENDING)],
+        [("tenantId", ASCENDING), ("last_activity", DESCENDING)],
+        [("tenantId", ASCENDING), ("started_at", DESCENDING)],
+    ],
+    "actions": [
+        [("tenantId", ASCENDING), ("timestamp", DESCENDING)],
+    ],
+}
+
+# Indexes replaced by the ones above; the migration drops them
+SUPERSEDED_INDEXES = {
+    "orders": [
+        # Admin listing before keyset pagination added _id to the sort
+        [("tenantId", ASCENDING), ("createdAt", DESCENDING)],
+    ],
+}
+
+
+def normalize_host(host: str) -> str:
+    """Lower-case host name without port or trailing dot"""
+    host = (host or "").strip().lower()
+    if host.startswith("["):
+        # IPv6 literal, e.g. [::1]:8000
+        host = host[1:].split("]", 1)[0]
+    else:
+        host = host.split(":", 1)[0]
+    return host.rstrip(".")
+
+
+class TenantResolver:
+    """
+    Maps request hosts to tenant ids.
+
+    The map is loaded from the tenants collection and refreshed at most every
+    TENANT_REFRESH_INTERVAL seconds, so resolving a request costs a dict
+    lookup. If the collection cannot be read, the last known map is kept.
+    """
+
+    def __init__(self, refresh_interval: float = TENANT_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.hosts: Dict[str, str] = {}
+        self._db = None
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def start(self, db) -> None:
+        """Resolve hosts against db's tenants collection"""
+        self._db = db
+        self._loaded_at = None
+
+    def _stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_interval
+
+    async def refresh(self) -> None:
+        """Reload the host -> tenant map"""
+        hosts = {}
+        async for tenant in self._db[TENANTS_COLLECTION].find({}, {"hosts": 1}):
+            for host in tenant.get("hosts") or []:
+                hosts[normalize_host(host)] = tenant["_id"]
+        self.hosts = hosts
+
+    async def resolve(self, host: str) -> str:
+        """
+        Return the tenant id serving host.
+
+        Args:
+            host: Host header value (port is ignored)
+
+        Returns:
+            Tenant id, DEFAULT_TENANT for unknown hosts
+        """
+        if self._db is not None and self._stale():
+            async with self._lock:
+                if self._stale():
+                    try:
+                        await self.refresh()
+                    except PyMongoError as e:
+                        logger.warning(f"Tenant map refresh failed: {e}")
+                    self._loaded_at = time.monotonic()
+
+        return self.hosts.get(normalize_host(host), DEFAULT_TENANT)
+
+
+tenant_resolver = TenantResolver()
+
+
+async def get_tenant(request: Request) -> str:
+    """FastAPI dependency returning the tenant of the request host"""
+    return await tenant_resolver.resolve(request.headers.get("host", ""))
+
+
+async def migrate_tenant_data(db) -> None:
+    """
+    Assign pre-tenancy documents to the default tenant, create the
+    tenant-prefixed indexes and drop superseded ones. Idempotent; runs on
+    every startup.
+
+    Args:
+        db: Motor database
+    """
+    await db[TENANTS_COLLECTION].create_index("hosts", unique=True, sparse=True)
+
+    for name, indexes in TENANT_INDEXES.items():
+        result = await db[name].update_many(
+            {"tenantId": {"$exists": False}},
+            {"$set": {"tenantId": DEFAULT_TENANT}}
+        )
+        if result.modified_count:
+            logger.info(f"Assigned {result.modified_count} {name} documents to tenant '{DEFAULT_TENANT}'")
+
+        for keys in indexes:
+            await db[name].create_index(keys)
+        for keys in SUPERSEDED_INDEXES.get(name, []):
+            try:
+                await db[name].drop_index(keys)
+                logger.info(f"Dropped superseded index {keys} on {name}")
+            except OperationFailure:
+                pass  # already dropped
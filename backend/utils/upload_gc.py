@@ -0,0 +1,221 @@
+"""
+Garbage collection of unused uploads (mark and sweep)
+Mark: every upload URL found in the settings and product_images documents,
+plus the copies held by the remote image mirror, is in use. Sweep: stored
+uploads that are not, and have not been touched within the grace period,
+are moved to quarantine (or deleted). Quarantined files are deleted for
+good after QUARANTINE_RETENTION and restored if they are used again before.
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, List, Set
+
+from pymongo.errors import DuplicateKeyError
+from starlette.concurrency import run_in_threadpool
+
+from utils.content_store import UPLOADS_COLLECTION, drop_record, mark_deleting, upload_from_url
+from utils.remote_mirror import REMOTE_IMAGES_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+# Collections whose documents may hold upload URLs (at any depth)
+REFERENCE_COLLECTIONS = ("settings", "product_images")
+
+# One document per quarantined file: {_id: <filename>, record, bytes, quarantinedAt}
+QUARANTINE_COLLECTION = "upload_quarantine"
+QUARANTINE_PREFIX = "quarantine/"
+
+# Uploads this recent are kept even if unused (e.g. uploaded in the admin
+# but not saved yet)
+GC_GRACE = timedelta(hours=24)
+QUARANTINE_RETENTION = timedelta(days=7)
+
+# Temporary files (.upload-*.part, .mirror-*.part, .<name>.<pid>.part) left
+# by interrupted uploads, mirror downloads and storage fetches
+TEMP_SUFFIX = ".part"
+
+
+def collect_upload_urls(value, found: Set[str]) -> None:
+    """Add the upload file names referenced anywhere in a document to found"""
+    if isinstance(value, str):
+        filename = upload_from_url(value)
+        if filename:
+            found.add(filename)
+    elif isinstance(value, dict):
+        for item in value.values():
+            collect_upload_urls(item, found)
+    elif isinstance(value, list):
+        for item in value:
+            collect_upload_urls(item, found)
+
+
+async def mark_referenced(db) -> Set[str]:
+    """File names of every upload in use"""
+    referenced: Set[str] = set()
+    for name in REFERENCE_COLLECTIONS:
+        async for doc in db[name].find({}):
+            collect_upload_urls(doc, referenced)
+    async for state in db[REMOTE_IMAGES_COLLECTION].find({"filename": {"$ne": None}}, {"filename": 1}):
+        referenced.add(state["filename"])
+    return referenced
+
+
+def _variants_size(record: dict) -> int:
+    return sum(variant.get("size", 0) for variant in record.get("variants") or [])
+
+
+def _stale_local_files(upload_dir: Path, stored: Set[str], cutoff: float, include_copies: bool) -> List[os.DirEntry]:
+    """Leftover temporary files and (for remote storage) local copies of files no longer stored"""
+    entries = []
+    for entry in os.scandir(upload_dir):
+        if not entry.is_file() or entry.stat().st_mtime > cutoff:
+            continue
+        if entry.name.startswith(".") and entry.name.endswith(TEMP_SUFFIX):
+            entries.append(entry)
+        elif include_copies and not entry.name.startswith(".") and entry.name not in stored:
+            entries.append(entry)
+    return entries
+
+
+async def collect_garbage(
+    db,
+    storage,
+    discard_derived: Callable[[str, list], Awaitable[None]],
+    upload_dir: Path,
+    allowed_extensions: set,
+    grace: timedelta = GC_GRACE,
+    retention: timedelta = QUARANTINE_RETENTION,
+    delete: bool = False,
+    dry_run: bool = False,
+) -> dict:
+    """
+    Quarantine (or delete) uploads nothing refers to.
+
+    Args:
+        db: Motor database
+        storage: Storage backend holding the uploads
+        discard_derived: Removes an upload's variants and local copies,
+            given its file name and variant list
+        upload_dir: Local working directory
+        allowed_extensions: Extensions that count as uploads
+        grace: Unused uploads touched more recently than this are kept
+        retention: Quarantined files older than this are deleted for good
+        delete: Delete at once instead of quarantining
+        dry_run: Only report what would be done
+
+    Returns:
+        Report: file names per action and the bytes reclaimed
+    """
+    now = datetime.utcnow()
+    cutoff = now - grace
+    collection = db[UPLOADS_COLLECTION]
+    quarantine = db[QUARANTINE_COLLECTION]
+    report = {
+        "dryRun": dry_run,
+        "referenced": 0,
+        "quarantined": [],
+        "deleted": [],
+        "restored": [],
+        "purged": [],
+        "localFiles": [],
+        "reclaimedBytes": 0,
+        "quarantinedBytes": 0,
+    }
+
+    referenced = await mark_referenced(db)
+    report["referenced"] = len(referenced)
+
+    # Quarantined files in use again go back
+    async for entry in quarantine.find({"_id": {"$in": list(referenced)}}):
+        name = entry["_id"]
+        report["restored"].append(name)
+        if dry_run:
+            continue
+        await storage.move(f"{QUARANTINE_PREFIX}{name}", name)
+        # Variants were deleted; the record is restored without them
+        record = {"refCount": 1, **entry["record"], "variants": [], "updatedAt": now}
+        try:
+            await collection.insert_one(record)
+        except DuplicateKeyError:
+            pass  # uploaded again meanwhile
+        await quarantine.delete_one({"_id": name})
+
+    # Sweep
+    stored = {
+        name: item for name, item in (await storage.list()).items()
+        if Path(name).suffix.lower() in allowed_extensions
+    }
+    records = {}
+    async for record in collection.find({}):
+        records[record["_id"]] = record
+
+    for name, item in stored.items():
+        if name in referenced:
+            continue
+        record = records.get(name)
+        if record is not None:
+            touched = max(filter(None, [record.get("createdAt"), record.get("updatedAt")]), default=None)
+            if touched is not None and touched > cutoff:
+                continue
+        elif datetime.utcfromtimestamp(item.modified) > cutoff:
+            continue
+
+        size = item.size + _variants_size(record or {})
+        report["deleted" if delete else "quarantined"].append(name)
+        report["reclaimedBytes" if delete else "quarantinedBytes"] += size
+        if dry_run:
+            continue
+
+        # Marked before the file goes, so an identical upload waits for it;
+        # one uploaded since the listing touched the record: keep the file
+        if not await mark_deleting(db, name, record):
+            report["deleted" if delete else "quarantined"].remove(name)
+            report["reclaimedBytes" if delete else "quarantinedBytes"] -= size
+            continue
+
+        if delete:
+            await storage.delete(name)
+        else:
+            await storage.move(name, f"{QUARANTINE_PREFIX}{name}")
+            await quarantine.replace_one(
+                {"_id": name},
+                {"record": record or {"_id": name, "size": item.size}, "bytes": item.size, "quarantinedAt": now},
+                upsert=True,
+            )
+        await discard_derived(name, (record or {}).get("variants") or [])
+        await drop_record(db, name)
+
+    # Quarantine past retention is deleted for good
+    async for entry in quarantine.find({"quarantinedAt": {"$lte": now - retention}}):
+        name = entry["_id"]
+        report["purged"].append(name)
+        report["reclaimedBytes"] += entry.get("bytes", 0)
+        if not dry_run:
+            await storage.delete(f"{QUARANTINE_PREFIX}{name}")
+            await quarantine.delete_one({"_id": name})
+
+    # Local leftovers: temporary files and, with remote storage, copies of
+    # files that are no longer stored (the upload directory is the storage
+    # itself otherwise)
+    swept = set(report["quarantined"]) | set(report["deleted"])
+    local = await run_in_threadpool(
+        _stale_local_files, upload_dir, set(stored) - swept, cutoff.timestamp(), storage.name != "local"
+    )
+    for entry in local:
+        report["localFiles"].append(entry.name)
+        report["reclaimedBytes"] += entry.stat().st_size
+        if not dry_run:
+            if entry.name.startswith("."):
+                await run_in_threadpool(Path(entry.path).unlink, missing_ok=True)
+            else:
+                await discard_derived(entry.name, [])
+
+    logger.info(
+        f"Upload GC{' (dry run)' if dry_run else ''}: {len(referenced)} referenced, "
+        f"{len(report['quarantined'])} quarantined, {len(report['deleted'])} deleted, "
+        f"{len(report['restored'])} restored, {len(report['purged'])} purged, "
+        f"{len(report['localFiles'])} local files, {report['reclaimedBytes']} bytes reclaimed"
+    )
+    return report
@@ -0,0 +1,381 @@
+"""
+Streaming multipart upload receiver
+Writes the uploaded file to disk chunk by chunk, so memory use per upload
+stays constant and oversized or non-image uploads are rejected early
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple, Union
+
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Allowance for boundaries and part headers when checking Content-Length
+MULTIPART_OVERHEAD = 16 * 1024
+
+# Bytes collected before sniffing the file type (SVG may start with a
+# long XML prolog or comment)
+SNIFF_BYTES = 2048
+
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+]
+
+# Media type of each canonical extension
+IMAGE_MEDIA_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".svg": "image/svg+xml",
+}
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """
+    Detect the image format from the first bytes of a file.
+
+    Args:
+        head: Leading bytes of the file (SNIFF_BYTES or the whole file)
+
+    Returns:
+        Canonical extension ('.jpg', '.png', '.gif', '.webp', '.svg'),
+        or None if the content is not a supported image
+    """
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+
+    text = head.lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    if text.startswith((b"<?xml", b"<svg", b"<!--", b"<!doctype svg")) and b"<svg" in text:
+        return ".svg"
+    return None
+
+
+class ReceivedUpload:
+    """An uploaded file stored in a temporary file next to its destination"""
+    __slots__ = ("path", "filename", "size", "extension", "sha256")
+
+    def __init__(self, path: Path, filename: str, size: int, extension: str, sha256: str):
+        self.path = path
+        self.filename = filename
+        self.size = size
+        self.extension = extension
+        self.sha256 = sha256
+
+    def discard(self) -> None:
+        """Remove the temporary file"""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class _MultipartEvents:
+    """Parser callbacks that queue events for the async consumer"""
+
+    def __init__(self):
+        self.events: List[Tuple[str, object]] = []
+        self._field = bytearray()
+        self._value = bytearray()
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": lambda: self.events.append(("begin", None)),
+            "on_header_field": lambda data, start, end: self._field.extend(data[start:end]),
+            "on_header_value": lambda data, start, end: self._value.extend(data[start:end]),
+            "on_header_end": self._header_end,
+            "on_headers_finished": lambda: self.events.append(("headers", None)),
+            "on_part_data": lambda data, start, end: self.events.append(("data", bytes(data[start:end]))),
+            "on_part_end": lambda: self.events.append(("end", None)),
+        }
+
+    def _header_end(self) -> None:
+        self.events.append(("header", (bytes(self._field).lower(), bytes(self._value))))
+        self._field.clear()
+        self._value.clear()
+
+
+def _too_large(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Arquivo muito grande. Máximo: {max_size // 1024 // 1024}MB"
+    )
+
+
+def _not_allowed(allowed_extensions: set) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"Tipo de arquivo não permitido. Use: {', '.join(sorted(allowed_extensions))}"
+    )
+
+
+def _not_an_image() -> HTTPException:
+    return HTTPException(status_code=400, detail="O arquivo não é uma imagem válida")
+
+
+class _IncomingFile:
+    """One file part being written to a temporary file, checked as it arrives"""
+
+    def __init__(self, filename: str, max_size: int):
+        self.filename = filename
+        self.max_size = max_size
+        self.size = 0
+        self.extension: Optional[str] = None
+        self.head = bytearray()
+        self.digest = hashlib.sha256()
+        self.file = None
+        self.tmp_name: Optional[str] = None
+
+    async def open(self, dest_dir: Path) -> None:
+        fd, self.tmp_name = await run_in_threadpool(
+            tempfile.mkstemp, dir=dest_dir, prefix=".upload-", suffix=".part"
+        )
+        self.file = os.fdopen(fd, "wb")
+
+    def check(self, data: bytes) -> None:
+        """Count a received chunk; raises HTTPException once the file is too large or not an image"""
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise _too_large(self.max_size)
+        if self.extension is None and len(self.head) < SNIFF_BYTES:
+            self.head.extend(data[:SNIFF_BYTES - len(self.head)])
+            if len(self.head) >= SNIFF_BYTES:
+                self.extension = sniff_image_type(bytes(self.head))
+                if self.extension is None:
+                    raise _not_an_image()
+
+    def _write(self, data: bytes) -> None:
+        self.file.write(data)
+        self.digest.update(data)
+
+    async def write(self, data: bytes) -> None:
+        await run_in_threadpool(self._write, data)
+
+    async def finish(self) -> ReceivedUpload:
+        if self.extension is None:
+            self.extension = sniff_image_type(bytes(self.head))
+            if self.extension is None:
+                raise _not_an_image()
+        await run_in_threadpool(self.file.close)
+        self.file = None
+        # mkstemp creates 0600 files; uploads are served by nginx too
+        await run_in_threadpool(os.chmod, self.tmp_name, 0o644)
+        return ReceivedUpload(Path(self.tmp_name), self.filename, self.size, self.extension, self.digest.hexdigest())
+
+    def discard(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.tmp_name is not None:
+            try:
+                os.unlink(self.tmp_name)
+            except FileNotFoundError:
+                pass
+            self.tmp_name = None
+
+
+def _multipart_parser(request: Request, max_body: int) -> Tuple[_MultipartEvents, MultipartParser]:
+    """Parser for a multipart/form-data request; rejects other bodies and oversized Content-Length"""
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Envie o arquivo como multipart/form-data")
+
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > max_body + MULTIPART_OVERHEAD:
+        raise _too_large(max_body)
+
+    events = _MultipartEvents()
+    return events, MultipartParser(boundary, events.callbacks())
+
+
+def _file_field(headers: dict) -> Tuple[str, Optional[str]]:
+    """Form field name and file name (None for plain fields) of a part"""
+    _, options = parse_options_header(headers.get(b"content-disposition", b""))
+    name = options.get(b"name", b"").decode("utf-8", "replace")
+    filename = options.get(b"filename")
+    return name, filename.decode("utf-8", "replace") if filename is not None else None
+
+
+async def receive_upload(
+    request: Request,
+    dest_dir: Path,
+    max_size: int,
+    allowed_extensions: set,
+    field_name: str = "file",
+) -> ReceivedUpload:
+    """
+    Stream a multipart file field into a temporary file in dest_dir.
+
+    The request is rejected before reading the body when Content-Length is
+    already over the limit, as soon as the file crosses max_size, and as
+    soon as its first bytes show it is not a supported image. Writes (and
+    the SHA-256 of the content) run in the threadpool, one per received
+    chunk.
+
+    Args:
+        request: Incoming multipart/form-data request
+        dest_dir: Directory of the final file (the temporary file is created
+            there so it can be renamed into place atomically)
+        max_size: Maximum file size in bytes
+        allowed_extensions: Accepted file name extensions
+        field_name: Form field holding the file
+
+    Returns:
+        ReceivedUpload; the caller renames or discards its temporary file
+    """
+    events, parser = _multipart_parser(request, max_size)
+
+    headers = {}
+    in_target = False
+    target_done = False
+    incoming: Optional[_IncomingFile] = None
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            pending: List[bytes] = []
+
+            for kind, value in events.events:
+                if kind == "begin":
+                    headers = {}
+                elif kind == "header":
+                    headers[value[0]] = value[1]
+                elif kind == "headers":
+                    name, filename = _file_field(headers)
+                    in_target = name == field_name and filename is not None and not target_done
+                    if in_target:
+                        if Path(filename).suffix.lower() not in allowed_extensions:
+                            raise _not_allowed(allowed_extensions)
+                        incoming = _IncomingFile(filename, max_size)
+                        await incoming.open(dest_dir)
+                elif kind == "data" and in_target:
+                    incoming.check(value)
+                    pending.append(value)
+                elif kind == "end" and in_target:
+                    in_target = False
+                    target_done = True
+            events.events.clear()
+
+            if pending:
+                await incoming.write(b"".join(pending))
+
+        parser.finalize()
+
+        if not target_done:
+            raise HTTPException(status_code=400, detail="Nenhum arquivo enviado")
+        return await incoming.finish()
+    except BaseException:
+        if incoming is not None:
+            incoming.discard()
+        raise
+
+
+async def receive_uploads(
+    request: Request,
+    dest_dir: Path,
+    max_size: int,
+    allowed_extensions: set,
+    max_files: int,
+    field_name: str = "files",
+) -> AsyncIterator[Tuple[int, str, Union[ReceivedUpload, HTTPException]]]:
+    """
+    Stream every file of a multipart field into temporary files in dest_dir.
+
+    Each file is yielded as soon as its part has been received, while the
+    rest of the body is still streaming, so the caller can start processing
+    it right away. A file that fails the checks of receive_upload (or comes
+    after the first max_files) is yielded with the error instead and the
+    rest of its part is skipped; the other files are not affected.
+
+    Args:
+        request: Incoming multipart/form-data request
+        dest_dir: Directory of the final files
+        max_size: Maximum size of each file in bytes
+        allowed_extensions: Accepted file name extensions
+        max_files: Maximum number of files stored per request
+        field_name: Form field holding the files (repeated once per file)
+
+    Returns:
+        (index, client file name, ReceivedUpload or HTTPException) per file,
+        in the order of the body; the caller renames or discards each
+        temporary file
+    """
+    events, parser = _multipart_parser(request, (max_size + MULTIPART_OVERHEAD) * max_files)
+
+    headers = {}
+    index = -1
+    incoming: Optional[_IncomingFile] = None
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            pending: List[bytes] = []
+
+            for kind, value in events.events:
+                if kind == "begin":
+                    headers = {}
+                elif kind == "header":
+                    headers[value[0]] = value[1]
+                elif kind == "headers":
+                    name, filename = _file_field(headers)
+                    if name != field_name or filename is None:
+                        continue
+                    index += 1
+                    if index >= max_files:
+                        yield index, filename, HTTPException(
+                            status_code=400, detail=f"Envie no máximo {max_files} arquivos por vez"
+                        )
+                    elif Path(filename).suffix.lower() not in allowed_extensions:
+                        yield index, filename, _not_allowed(allowed_extensions)
+                    else:
+                        incoming = _IncomingFile(filename, max_size)
+                        await incoming.open(dest_dir)
+                elif kind == "data" and incoming is not None:
+                    try:
+                        incoming.check(value)
+                    except HTTPException as e:
+                        # Skip the rest of this part
+                        pending.clear()
+                        incoming.discard()
+                        filename, incoming = incoming.filename, None
+                        yield index, filename, e
+                        continue
+                    pending.append(value)
+                elif kind == "end" and incoming is not None:
+                    if pending:
+                        await incoming.write(b"".join(pending))
+                        pending.clear()
+                    try:
+                        result = await incoming.finish()
+                    except HTTPException as e:
+                        incoming.discard()
+                        result = e
+                    filename, incoming = incoming.filename, None
+                    yield index, filename, result
+            events.events.clear()
+
+            if pending:
+                await incoming.write(b"".join(pending))
+
+        parser.finalize()
+
+        if index < 0:
+            raise HTTPException(status_code=400, detail="Nenhum arquivo enviado")
+    finally:
+        if incoming is not None:
+            incoming.discard()
@@ -4,3 +4,27 @@ import { twMerge } from "tailwind-merge"
 export function cn(...inputs) {
   return twMerge(clsx(inputs));
 }
+
+// Props that show an image's inline placeholder (blurred preview) and reserve
+// its box until it loads; placeholders come from imagesApi.get()
+export function imagePlaceholder(images, field) {
+  const placeholder = images?.placeholders?.[field];
+  if (!placeholder || placeholder.url !== images[field]) return {};
+
+  const props = {};
+  if (placeholder.width && placeholder.height) {
+    props.width = placeholder.width;
+    props.height = placeholder.height;
+  }
+  if (placeholder.src) {
+    props.style = {
+      backgroundImage: `url(${placeholder.src})`,
+      backgroundSize: 'cover',
+      backgroundPosition: 'center',
+    };
+    props.onLoad = (event) => {
+      event.currentTarget.style.backgroundImage = 'none';
+    };
+  }
+  return props;
+}
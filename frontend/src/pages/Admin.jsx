@@ -23,12 +23,19 @@ const Admin = () => {
   const [settings, setSettings] = useState(null);
   const [images, setImages] = useState(null);
   const [orders, setOrders] = useState([]);
+  const [ordersCursor, setOrdersCursor] = useState(null);
+  const [ordersTotal, setOrdersTotal] = useState(null);
+  const [ordersLoading, setOrdersLoading] = useState(false);
+  const [orderSummary, setOrderSummary] = useState(null);
+  // Only the latest orders request may update the list
+  const ordersRequest = useRef(0);
   const [isSaving, setIsSaving] = useState(false);
   const [loading, setLoading] = useState(true);
   const [activeTab, setActiveTab] = useState("brand");
   const [currentUser, setCurrentUser] = useState(null);
-  const [orderFilter, setOrderFilter] = useState('all'); // 'all', 'paid', 'pending'
+  const [orderFilter, setOrderFilter] = useState('all'); // 'all' or an order status
   const [orderSort, setOrderSort] = useState('newest'); // 'newest', 'oldest'
+  const [orderSearch, setOrderSearch] = useState({ dateFrom: '', dateTo: '', state: '', city: '', utmSource: '' });
 
   useEffect(() => {
     // Check authentication
@@ -55,14 +62,12 @@ const Admin = () => {
 
   const loadData = async () => {
     try {
-      const [settingsData, imagesData, ordersList] = await Promise.all([
-        settingsApi.get(),
-        imagesApi.get(),
-        ordersApi.list()
+      const [settingsData, imagesData] = await Promise.all([
+        settingsApi.getAdmin(),
+        imagesApi.get()
       ]);
       setSettings(settingsData);
       setImages(imagesData);
-      setOrders(ordersList);
     } catch (error) {
       console.error('Error loading data:', error);
       toast.error('Erro ao carregar dados');
@@ -71,6 +76,56 @@ const Admin = () => {
     }
   };
 
+  // Orders are filtered and paginated by the API; cursor continues the current list
+  const loadOrders = async (cursor = null) => {
+    const request = ++ordersRequest.current;
+    setOrdersLoading(true);
+    try {
+      const params = { order: orderSort === 'oldest' ? 'asc' : 'desc', limit: 50 };
+      if (orderFilter !== 'all') params.status = orderFilter;
+      // Whole days in the admin's time zone
+      if (orderSearch.dateFrom) params.date_from = new Date(`${orderSearch.dateFrom}T00:00:00`).toISOString();
+      if (orderSearch.dateTo) params.date_to = new Date(`${orderSearch.dateTo}T23:59:59.999`).toISOString();
+      if (orderSearch.state.trim()) params.state = orderSearch.state.trim().toUpperCase();
+      if (orderSearch.city.trim()) params.city = orderSearch.city.trim();
+      if (orderSearch.utmSource.trim()) params.utm_source = orderSearch.utmSource.trim();
+      if (cursor) {
+        params.cursor = cursor;
+      } else {
+        params.include_total = true;
+      }
+
+      const [page, summary] = await Promise.all([
+        ordersApi.list(params),
+        cursor ? null : ordersApi.summary()
+      ]);
+      if (request !== ordersRequest.current) return;
+      setOrders(prev => (cursor ? [...prev, ...page.orders] : page.orders));
+      setOrdersCursor(page.nextCursor);
+      if (!cursor) {
+        setOrdersTotal(page.totalCapped ? `${page.total}+` : page.total);
+        setOrderSummary(summary);
+      }
+    } catch (error) {
+      console.error('Error loading orders:', error);
+      toast.error('Erro ao carregar pedidos');
+    } finally {
+      if (request === ordersRequest.current) setOrdersLoading(false);
+    }
+  };
+
+  useEffect(() => {
+    if (!currentUser) return;
+    // Typing in the text filters reloads once the user pauses
+    const timer = setTimeout(() => loadOrders(), 300);
+    return () => clearTimeout(timer);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [currentUser, orderFilter, orderSort, orderSearch]);
+
+  const handleOrderSearchChange = (field, value) => {
+    setOrderSearch(prev => ({ ...prev, [field]: value }));
+  };
+
   const handleLogout = () => {
     authApi.logout();
     toast.success('Logout realizado com sucesso');
@@ -1075,7 +1130,7 @@ const Admin = () => {
                 <div className="flex flex-col sm:flex-row sm:items-center justify-between gap-4">
                   <CardTitle className="flex items-center gap-2">
                     <Package className="w-5 h-5 text-emerald-600" /> 
-                    Pedidos ({orders.length})
+                    Pedidos ({ordersTotal ?? orders.length})
                   </CardTitle>
                   
                   {/* Filters */}
@@ -1088,6 +1143,8 @@ const Admin = () => {
                       <option value="all">Todos</option>
                       <option value="paid">Pagos</option>
                       <option value="pending">Pendentes</option>
+                      <option value="shipped">Enviados</option>
+                      <option value="delivered">Entregues</option>
                     </select>
                     <select
                       value={orderSort}
@@ -1099,30 +1156,65 @@ const Admin = () => {
                     </select>
                   </div>
                 </div>
+                <div className="grid grid-cols-2 sm:grid-cols-5 gap-2 pt-2">
+                  <Input
+                    type="date"
+                    value={orderSearch.dateFrom}
+                    onChange={(e) => handleOrderSearchChange('dateFrom', e.target.value)}
+                    title="De"
+                    className="h-9 text-sm"
+                  />
+                  <Input
+                    type="date"
+                    value={orderSearch.dateTo}
+                    onChange={(e) => handleOrderSearchChange('dateTo', e.target.value)}
+                    title="Até"
+                    className="h-9 text-sm"
+                  />
+                  <Input
+                    value={orderSearch.state}
+                    onChange={(e) => handleOrderSearchChange('state', e.target.value)}
+                    placeholder="UF"
+                    maxLength={2}
+                    className="h-9 text-sm"
+                  />
+                  <Input
+                    value={orderSearch.city}
+                    onChange={(e) => handleOrderSearchChange('city', e.target.value)}
+                    placeholder="Cidade"
+                    className="h-9 text-sm"
+                  />
+                  <Input
+                    value={orderSearch.utmSource}
+                    onChange={(e) => handleOrderSearchChange('utmSource', e.target.value)}
+                    placeholder="Origem (utm_source)"
+                    className="h-9 text-sm"
+                  />
+                </div>
               </CardHeader>
               <CardContent>
-                {/* Summary Cards */}
-                {orders.length > 0 && (
+                {/* Summary Cards (all orders, regardless of filters) */}
+                {orderSummary?.total > 0 && (
                   <div className="grid grid-cols-2 sm:grid-cols-4 gap-3 mb-6">
                     <div className="p-4 bg-slate-50 rounded-xl text-center">
-                      <p className="text-2xl font-bold text-slate-900">{orders.length}</p>
+                      <p className="text-2xl font-bold text-slate-900">{orderSummary.total}</p>
                       <p className="text-xs text-slate-500">Total Pedidos</p>
                     </div>
                     <div className="p-4 bg-emerald-50 rounded-xl text-center">
                       <p className="text-2xl font-bold text-emerald-600">
-                        {orders.filter(o => o.status === 'paid').length}
+                        {orderSummary.byStatus.paid}
                       </p>
                       <p className="text-xs text-emerald-600">Pagos</p>
                     </div>
                     <div className="p-4 bg-amber-50 rounded-xl text-center">
                       <p className="text-2xl font-bold text-amber-600">
-                        {orders.filter(o => o.status === 'pending').length}
+                        {orderSummary.byStatus.pending}
                       </p>
                       <p className="text-xs text-amber-600">Pendentes</p>
                     </div>
                     <div className="p-4 bg-gradient-to-br from-emerald-500 to-teal-600 rounded-xl text-center">
                       <p className="text-2xl font-bold text-white">
-                        R$ {orders.filter(o => o.status === 'paid').reduce((sum, o) => sum + (o.totalPrice || 0), 0).toFixed(2)}
+                        R$ {orderSummary.paidTotal.toFixed(2)}
                       </p>
                       <p className="text-xs text-emerald-100">Total Vendas</p>
                     </div>
@@ -1131,33 +1223,25 @@ const Admin = () => {
 
                 {/* Orders List */}
                 {(() => {
-                  // Filter orders
-                  let filteredOrders = [...orders];
-                  if (orderFilter === 'paid') {
-                    filteredOrders = filteredOrders.filter(o => o.status === 'paid');
-                  } else if (orderFilter === 'pending') {
-                    filteredOrders = filteredOrders.filter(o => o.status === 'pending');
-                  }
-                  
-                  // Sort orders
-                  filteredOrders.sort((a, b) => {
-                    const dateA = new Date(a.createdAt);
-                    const dateB = new Date(b.createdAt);
-                    return orderSort === 'newest' ? dateB - dateA : dateA - dateB;
-                  });
-
-                  if (filteredOrders.length === 0) {
+                  // Filtered and sorted by the API
+                  if (orders.length === 0) {
                     return (
                       <div className="text-center py-12 text-slate-500">
                         <Package className="w-12 h-12 mx-auto mb-4 opacity-50" />
-                        <p>{orderFilter === 'all' ? 'Nenhum pedido ainda' : `Nenhum pedido ${orderFilter === 'paid' ? 'pago' : 'pendente'}`}</p>
+                        <p>{ordersLoading ? 'Carregando pedidos...' : 'Nenhum pedido encontrado'}</p>
                       </div>
                     );
                   }
 
+                  // Numbered oldest first, as long as the total is exact
+                  const orderPosition = (index) => {
+                    if (typeof ordersTotal !== 'number') return index + 1;
+                    return orderSort === 'newest' ? ordersTotal - index : index + 1;
+                  };
+
                   return (
                     <div className="space-y-3">
-                      {filteredOrders.map((order, index) => (
+                      {orders.map((order, index) => (
                         <div 
                           key={order._id} 
                           className={`p-4 border rounded-xl transition-all hover:shadow-md ${
@@ -1168,7 +1252,7 @@ const Admin = () => {
                         >
                           <div className="flex flex-col sm:flex-row sm:items-center justify-between gap-2 mb-3">
                             <div className="flex items-center gap-3">
-                              <span className="text-slate-400 text-sm font-mono">#{filteredOrders.length - index}</span>
+                              <span className="text-slate-400 text-sm font-mono">#{orderPosition(index)}</span>
                               <div>
                                 <span className="font-semibold text-slate-900">{order.orderNumber}</span>
                                 <span className="text-slate-400 text-sm ml-2">
@@ -1218,7 +1302,7 @@ const Admin = () => {
                                   try {
                                     await paymentsApi.simulatePayment(order._id);
                                     toast.success('Pagamento confirmado!');
-                                    loadData();
+                                    loadOrders();
                                   } catch (error) {
                                     toast.error('Erro ao confirmar pagamento');
                                   }
@@ -1232,12 +1316,24 @@ const Admin = () => {
                           )}
                         </div>
                       ))}
+                      {ordersCursor && (
+                        <div className="pt-2 text-center">
+                          <Button
+                            variant="outline"
+                            onClick={() => loadOrders(ordersCursor)}
+                            disabled={ordersLoading}
+                          >
+                            {ordersLoading && <Loader2 className="w-4 h-4 mr-2 animate-spin" />}
+                            Carregar mais
+                          </Button>
+                        </div>
+                      )}
                     </div>
                   );
                 })()}
 
                 {/* Total Sales Summary */}
-                {orders.length > 0 && (
+                {orderSummary?.total > 0 && (
                   <div className="mt-6 pt-6 border-t border-slate-200">
                     <div className="flex flex-col sm:flex-row justify-between items-start sm:items-center gap-4 p-4 bg-slate-900 rounded-xl text-white">
                       <div>
@@ -1246,10 +1342,10 @@ const Admin = () => {
                       </div>
                       <div className="text-right">
                         <p className="text-3xl font-bold text-emerald-400">
-                          R$ {orders.filter(o => o.status === 'paid').reduce((sum, o) => sum + (o.totalPrice || 0), 0).toFixed(2)}
+                          R$ {orderSummary.paidTotal.toFixed(2)}
                         </p>
                         <p className="text-slate-400 text-sm">
-                          {orders.filter(o => o.status === 'paid').length} pedido(s) confirmado(s)
+                          {orderSummary.byStatus.paid} pedido(s) confirmado(s)
                         </p>
                       </div>
                     </div>
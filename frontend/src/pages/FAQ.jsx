@@ -17,7 +17,7 @@ const FAQ = () => {
   useEffect(() => {
     const loadSettings = async () => {
       try {
-        const data = await settingsApi.get();
+        const data = await settingsApi.get(['faq', 'productName', 'whatsapp']);
         setSettings(data);
       } catch (error) {
         console.error('Error loading settings:', error);
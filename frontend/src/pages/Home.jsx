@@ -4,6 +4,7 @@ import { Brain, Zap, Shield, Clock, Star, ArrowRight, CheckCircle2, Loader2 } fr
 import { Button } from '../components/ui/button';
 import { Card, CardContent } from '../components/ui/card';
 import { settingsApi, imagesApi } from '../services/api';
+import { imagePlaceholder } from '../lib/utils';
 
 const iconMap = { Brain, Zap, Shield, Clock, Star };
 
@@ -95,6 +96,7 @@ const Home = () => {
               <div className="relative bg-white rounded-2xl sm:rounded-3xl shadow-2xl p-4 sm:p-6 lg:p-8 mx-auto max-w-sm sm:max-w-md lg:max-w-none transform hover:scale-105 transition-transform duration-500">
                 <img
                   src={images?.main || ''}
+                  {...imagePlaceholder(images, 'main')}
                   alt={settings?.productName || 'Produto'}
                   className="w-full h-auto rounded-xl sm:rounded-2xl object-cover"
                 />
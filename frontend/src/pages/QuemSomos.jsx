@@ -4,6 +4,7 @@ import { Target, Eye, Heart, Award, Users, Leaf, ArrowRight, Loader2 } from 'luc
 import { Button } from '../components/ui/button';
 import { Card, CardContent } from '../components/ui/card';
 import { settingsApi, imagesApi } from '../services/api';
+import { imagePlaceholder } from '../lib/utils';
 
 const QuemSomos = () => {
   const [settings, setSettings] = useState(null);
@@ -14,7 +15,7 @@ const QuemSomos = () => {
     const loadData = async () => {
       try {
         const [settingsData, imagesData] = await Promise.all([
-          settingsApi.get(),
+          settingsApi.get(['productName', 'siteName', 'hero', 'aboutMission', 'aboutVision', 'aboutHistory', 'aboutValues']),
           imagesApi.get()
         ]);
         setSettings(settingsData);
@@ -72,6 +73,7 @@ const QuemSomos = () => {
             <div className="relative">
               <img
                 src={images?.secondary || ''}
+                {...imagePlaceholder(images, 'secondary')}
                 alt={`Sobre ${siteName}`}
                 className="relative w-full h-auto rounded-3xl shadow-2xl"
               />
@@ -7,6 +7,7 @@ import { Input } from '../components/ui/input';
 import { Label } from '../components/ui/label';
 import { toast } from 'sonner';
 import { settingsApi, imagesApi, ordersApi, analyticsApi } from '../services/api';
+import { imagePlaceholder } from '../lib/utils';
 import SEOHead from '../components/SEOHead';
 import { 
   trackViewContent, 
@@ -452,6 +453,7 @@ const Vendas = () => {
                   </div>
                   <img
                     src={images?.main || ''}
+                    {...imagePlaceholder(images, 'main')}
                     alt={productName}
                     className="w-full h-auto rounded-xl"
                   />
@@ -61,13 +61,63 @@ export const authApi = {
   }
 };
 
+// Storefront data inlined into index.html by the backend (/api/storefront/index.html),
+// so the first render needs no API round-trip
+const readBootstrap = () => {
+  const element = document.getElementById('storefront-bootstrap');
+  if (!element) return {};
+  try {
+    return JSON.parse(element.textContent) || {};
+  } catch (e) {
+    console.warn('Invalid storefront bootstrap payload:', e);
+    return {};
+  }
+};
+
+const bootstrap = readBootstrap();
+
+// Static JSON snapshots published by the backend on every save and served by
+// nginx from /content/. The manifest points at the current content-hashed files;
+// when it is unavailable (e.g. in development) the API is used instead.
+const FAQ_SNAPSHOT_FIELDS = ['faq', 'productName', 'whatsapp'];
+let manifestRequest = null;
+
+const getSnapshot = async (name) => {
+  try {
+    if (!manifestRequest) {
+      manifestRequest = axios.get('/content/manifest.json').then((response) => response.data);
+    }
+    const manifest = await manifestRequest;
+    const file = manifest && typeof manifest === 'object' ? manifest[name] : null;
+    if (!file) return null;
+    const response = await axios.get(`/content/${file}`);
+    return response.data && typeof response.data === 'object' ? response.data : null;
+  } catch (e) {
+    manifestRequest = null;
+    return null;
+  }
+};
+
 // Settings API
 export const settingsApi = {
-  get: async () => {
-    const response = await axios.get(`${API}/settings`);
+  // Pass a list of fields (e.g. ['faq', 'whatsapp']) to fetch only what the page uses
+  get: async (fields = null) => {
+    if (bootstrap.settings) return bootstrap.settings;
+    const snapshotName = !fields ? 'settings'
+      : fields.every((field) => FAQ_SNAPSHOT_FIELDS.includes(field)) ? 'faq' : null;
+    const snapshot = snapshotName && await getSnapshot(snapshotName);
+    if (snapshot) return snapshot;
+    const params = fields ? { fields: fields.join(',') } : {};
+    const response = await axios.get(`${API}/settings`, { params });
+    return response.data;
+  },
+  getAdmin: async () => {
+    const response = await apiClient.get('/settings/admin');
     return response.data;
   },
   update: async (data) => {
+    delete bootstrap.settings;
+    manifestRequest = null;
     const response = await apiClient.put('/settings', data);
     return response.data;
   }
@@ -76,10 +126,15 @@ export const settingsApi = {
 // Images API
 export const imagesApi = {
   get: async () => {
+    if (bootstrap.images) return bootstrap.images;
+    const snapshot = await getSnapshot('images');
+    if (snapshot) return snapshot;
     const response = await axios.get(`${API}/images`);
     return response.data;
   },
   update: async (data) => {
+    delete bootstrap.images;
+    manifestRequest = null;
     const response = await apiClient.put('/images', data);
     return response.data;
   }
@@ -91,8 +146,14 @@ export const ordersApi = {
     const response = await axios.post(`${API}/orders`, orderData);
     return response.data;
   },
-  list: async () => {
-    const response = await axios.get(`${API}/orders`);
+  list: async (params = {}) => {
+    // { limit, cursor, order, status, date_from, date_to, state, city, utm_source, include_total };
+    // pass nextCursor back as cursor
+    const response = await apiClient.get('/orders', { params });
+    return response.data;
+  },
+  summary: async () => {
+    const response = await apiClient.get('/orders/summary');
     return response.data;
   },
   get: async (orderId) => {
@@ -135,8 +196,18 @@ export const uploadsApi = {
     });
     return response.data;
   },
-  listImages: async () => {
-    const response = await apiClient.get('/uploads/list');
+  uploadImages: async (files) => {
+    // One result per file, in order: { name, success, url, ... } or { name, success: false, error }
+    const formData = new FormData();
+    files.forEach((file) => formData.append('files', file));
+    const response = await apiClient.post('/uploads/images', formData, {
+      headers: { 'Content-Type': 'multipart/form-data' }
+    });
+    return response.data;
+  },
+  listImages: async (params = {}) => {
+    // { limit, cursor, sort, order }; pass nextCursor back as cursor
+    const response = await apiClient.get('/uploads/list', { params });
     return response.data;
   },
   deleteImage: async (filename) => {
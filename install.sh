@@ -304,6 +304,9 @@ requests>=2.31.0
 qrcode[pil]>=7.4
 email-validator>=2.0.0
 bcrypt==4.0.1
+orjson>=3.8.0
+Pillow>=11.2.0
+boto3>=1.28.0
 REQEOF
     
     # Instalar dependências
@@ -317,6 +320,8 @@ DB_NAME=${APP_NAME}_db
 CORS_ORIGINS=https://${DOMAIN}
 ORIONPAY_API_KEY=${ORIONPAY_KEY}
 JWT_SECRET_KEY=${JWT_SECRET}
+SNAPSHOT_DIR=${APP_DIR}/backend/snapshots
+UPLOADS_ACCEL_REDIRECT=/_uploads/
 EOF
     
     deactivate
@@ -424,6 +429,20 @@ server {
         proxy_connect_timeout 300;
     }
     
+    # Snapshots de conteúdo (JSON estático gerado pelo backend a cada alteração)
+    location = /content/manifest.json {
+        root ${APP_DIR}/backend/snapshots;
+        try_files /hosts/\$host/manifest.json /tenants/default/manifest.json =404;
+        add_header Cache-Control "public, no-cache";
+    }
+    
+    location ~ ^/content/(?<snapshot>[a-z]+\.[0-9a-f]{16}\.json)$ {
+        root ${APP_DIR}/backend/snapshots;
+        try_files /hosts/\$host/\$snapshot /tenants/default/\$snapshot =404;
+        expires 1y;
+        add_header Cache-Control "public, immutable";
+    }
+    
     # Uploads
     location /uploads/ {
         alias ${APP_DIR}/backend/uploads/;
@@ -431,9 +450,40 @@ server {
         add_header Cache-Control "public";
     }
     
+    # Uploads em quarentena (coleta de lixo de uploads) não são servidos
+    location ^~ /uploads/quarantine/ {
+        return 404;
+    }
+    
+    # Arquivos de upload entregues pelo nginx a pedido da API (X-Accel-Redirect)
+    location /_uploads/ {
+        internal;
+        alias ${APP_DIR}/backend/uploads/;
+        etag off;
+        add_header ETag \$upstream_http_etag;
+        add_header X-Content-Type-Options "nosniff" always;
+    }
+    
+    # SPA: index.html renderizado pelo backend com configurações e SEO embutidos
+    location @storefront {
+        rewrite ^ /api/storefront/index.html break;
+        proxy_pass http://127.0.0.1:${BACKEND_PORT};
+        proxy_set_header Host \$host;
+        proxy_intercept_errors on;
+        error_page 502 503 504 = @static_index;
+    }
+    
+    location @static_index {
+        try_files /index.html =404;
+    }
+    
+    location = /index.html {
+        try_files /nonexistent @storefront;
+    }
+    
     # SPA fallback
     location / {
-        try_files \$uri \$uri/ /index.html;
+        try_files \$uri @storefront;
     }
 }
 EOF
@@ -512,14 +562,59 @@ server {
         proxy_set_header X-Forwarded-Proto \$scheme;
     }
     
+    # Snapshots de conteúdo (JSON estático gerado pelo backend a cada alteração)
+    location = /content/manifest.json {
+        root ${APP_DIR}/backend/snapshots;
+        try_files /hosts/\$host/manifest.json /tenants/default/manifest.json =404;
+        add_header Cache-Control "public, no-cache";
+    }
+    
+    location ~ ^/content/(?<snapshot>[a-z]+\.[0-9a-f]{16}\.json)$ {
+        root ${APP_DIR}/backend/snapshots;
+        try_files /hosts/\$host/\$snapshot /tenants/default/\$snapshot =404;
+        expires 1y;
+        add_header Cache-Control "public, immutable";
+    }
+    
     # Uploads
     location /uploads/ {
         alias ${APP_DIR}/backend/uploads/;
     }
     
+    # Uploads em quarentena (coleta de lixo de uploads) não são servidos
+    location ^~ /uploads/quarantine/ {
+        return 404;
+    }
+    
+    # Arquivos de upload entregues pelo nginx a pedido da API (X-Accel-Redirect)
+    location /_uploads/ {
+        internal;
+        alias ${APP_DIR}/backend/uploads/;
+        etag off;
+        add_header ETag \$upstream_http_etag;
+        add_header X-Content-Type-Options "nosniff" always;
+    }
+    
+    # SPA: index.html renderizado pelo backend com configurações e SEO embutidos
+    location @storefront {
+        rewrite ^ /api/storefront/index.html break;
+        proxy_pass http://127.0.0.1:${BACKEND_PORT};
+        proxy_set_header Host \$host;
+        proxy_intercept_errors on;
+        error_page 502 503 504 = @static_index;
+    }
+    
+    location @static_index {
+        try_files /index.html =404;
+    }
+    
+    location = /index.html {
+        try_files /nonexistent @storefront;
+    }
+    
     # SPA fallback
     location / {
-        try_files \$uri \$uri/ /index.html;
+        try_files \$uri @storefront;
     }
 }
 EOF